@@ -1,137 +1,459 @@
-import os
-import urllib.request
-import random
-import pydub
-import speech_recognition
+import asyncio
+import logging
 import time
-from typing import Optional
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Union
 from DrissionPage import ChromiumPage
+from DrissionPage.items import ChromiumTab
+import audio_pipeline
+from metrics import timed
+from speech_backends import GoogleBackend, RecognitionBackend
+from transcript_cache import TranscriptCache, audio_fingerprint, content_key
+
+logger = logging.getLogger(__name__)
 
 
 class RecaptchaSolver:
     """A class to solve reCAPTCHA challenges using audio recognition."""
 
     # Constants
-    TEMP_DIR = os.getenv("TEMP") if os.name == "nt" else "/tmp"
     TIMEOUT_STANDARD = 20
     TIMEOUT_SHORT = 1
     TIMEOUT_DETECTION = 0.05
+    POLL_INTERVAL = 0.05
 
-    def __init__(self, driver: ChromiumPage) -> None:
+    def __init__(self, driver: Union[ChromiumPage, ChromiumTab],
+                 backend: Optional[RecognitionBackend] = None,
+                 cache: Optional[TranscriptCache] = None,
+                 timeouts: Optional[Dict[str, float]] = None, retries: int = 0) -> None:
         """Initialize the solver with a ChromiumPage driver.
 
         Args:
-            driver: ChromiumPage instance for browser interaction
+            driver: ChromiumPage instance, or a single tab of a shared browser
+                (e.g. one leased from an isolated browser context)
+            backend: Speech-recognition backend (default: Google Web Speech API)
+            cache: Optional transcript cache shared between solves
+            timeouts: Seconds to wait per step name (e.g. 'anchor_iframe',
+                'checkbox_result'), overriding TIMEOUT_STANDARD
+            retries: Fresh audio clips to try, via the challenge's reload button,
+                after a transcript is rejected
         """
         self.driver = driver
+        self.backend = backend or GoogleBackend()
+        self.cache = cache
+        self.timeouts = dict(timeouts or {})
+        self.retries = retries
+        # Transcripts submitted in the last solve
+        self.attempts = 0
+        self.timings: Dict[str, float] = {}
+        # Steps whose wait ran out of time in the last solve
+        self.expired: List[str] = []
+        self.outcome: Optional[str] = None
+        self.transcript_cached = False
+        self._audio_keys: List[str] = []
 
     def solveCaptcha(self) -> None:
         """Attempt to solve the reCAPTCHA challenge.
 
+        Every step waits on a page condition and continues as soon as it holds;
+        the time spent in each step is recorded in ``self.timings``, and
+        a rejected transcript is retried ``self.retries`` times with a reloaded
+        clip in the same session. ``self.attempts`` counts submitted transcripts;
+        the timings of repeated steps are those of the last attempt.
+        ``self.outcome`` ends up as 'checkbox', 'audio', 'bot_detected', 'no_widget'
+        (the anchor frame never appeared) or 'failed'.
+
         Raises:
             Exception: If captcha solving fails or bot is detected
         """
-        
+        self.timings = {}
+        self.expired = []
+        self.attempts = 0
+        self.outcome = 'failed'
+        self.transcript_cached = False
+        self._audio_keys = []
+
         # Handle main reCAPTCHA iframe
-        self.driver.wait.ele_displayed(
-            "@title=reCAPTCHA", timeout=self.TIMEOUT_STANDARD
-        )
-        time.sleep(0.1)
-        iframe_inner = self.driver("@title=reCAPTCHA")
+        with self._timed('anchor_iframe'):
+            shown = self._waited('anchor_iframe', self.driver.wait.ele_displayed(
+                "@title=reCAPTCHA", timeout=self._timeout('anchor_iframe')
+            ) or None)
+            iframe_inner = self.driver("@title=reCAPTCHA") if shown else None
+        if not iframe_inner:
+            self.outcome = 'no_widget'
+            raise Exception("reCAPTCHA widget not found")
 
         # Click the checkbox
-        iframe_inner.wait.ele_displayed(
-            ".rc-anchor-content", timeout=self.TIMEOUT_STANDARD
-        )
-        iframe_inner(".rc-anchor-content", timeout=self.TIMEOUT_SHORT).click()
+        with self._timed('checkbox_click'):
+            self._waited('checkbox_click', iframe_inner.wait.ele_displayed(
+                ".rc-anchor-content", timeout=self._timeout('checkbox_click')
+            ) or None)
+            iframe_inner(".rc-anchor-content", timeout=self.TIMEOUT_SHORT).click()
 
-        # Check if solved by just clicking
-        is_solved = self.is_solved();
+        # Check if solved by just clicking: wait until the checkmark appears or
+        # the challenge pops up, whichever comes first
         print("Checking if captcha is solved by clicking...")
-        print(f"Is solved - {is_solved}")
+        with self._timed('checkbox_result'):
+            is_solved = self._waited('checkbox_result', self._poll(
+                self._checkbox_outcome, self._timeout('checkbox_result')
+            ))
+        print(f"Is solved - {bool(is_solved)}")
         if is_solved:
+            self.outcome = 'checkbox'
             return
 
         # Handle audio challenge
         iframe = self.driver("xpath://iframe[contains(@title, 'recaptcha')]")
-        iframe.wait.ele_displayed(
-            "#recaptcha-audio-button", timeout=self.TIMEOUT_STANDARD
-        )
-        iframe("#recaptcha-audio-button", timeout=self.TIMEOUT_SHORT).click()
-        time.sleep(0.3)
+        with self._timed('audio_button'):
+            self._waited('audio_button', iframe.wait.ele_displayed(
+                "#recaptcha-audio-button", timeout=self._timeout('audio_button')
+            ) or None)
+            iframe("#recaptcha-audio-button", timeout=self.TIMEOUT_SHORT).click()
 
-        if self.is_detected():
-            raise Exception("Captcha detected bot behavior")
+        # Wait for the audio source, or for the bot-detection notice
+        with self._timed('audio_source'):
+            outcome = self._waited('audio_source', self._poll(
+                lambda: self._audio_source_outcome(iframe), self._timeout('audio_source')
+            ))
+        if outcome != 'ready':
+            if outcome == 'detected' or self.is_detected():
+                self.outcome = 'bot_detected'
+                raise Exception("Captcha detected bot behavior")
+            raise Exception("Audio challenge did not load")
 
-        # Download and process audio
-        iframe.wait.ele_displayed("#audio-source", timeout=self.TIMEOUT_STANDARD)
-        # Take a screenshot of the page to ensure the audio source is loaded
-        self.driver.get_screenshot(path="recaptcha_screenshot.png")
         src = iframe("#audio-source").attrs["src"]
 
         try:
-            text_response = self._process_audio_challenge(src)
-            iframe("#audio-response").input(text_response.lower())
-            iframe("#recaptcha-verify-button").click()
-            time.sleep(1)
+            while True:
+                text_response = self._process_audio_challenge(src)
+                with self._timed('answer_submit'):
+                    iframe("#audio-response").input(text_response.lower(), clear=True)
+                    iframe("#recaptcha-verify-button").click()
+                self.attempts += 1
+
+                with self._timed('verify'):
+                    is_solved = self._waited('verify', self._poll(
+                        lambda: self._verify_outcome(iframe, src if self.attempts > 1 else None),
+                        self._timeout('verify')
+                    ))
+                if self._record_verdict(is_solved):
+                    return
+
+                # Same browser and session, new clip (unless the challenge already served one)
+                with self._timed('reload'):
+                    if self._reload_outcome(iframe, src) is None:
+                        iframe("#recaptcha-reload-button", timeout=self.TIMEOUT_SHORT).click()
+                    outcome = self._waited('reload', self._poll(
+                        lambda: self._reload_outcome(iframe, src), self._timeout('audio_source')
+                    ))
+                self._check_reload(outcome)
+                src = iframe("#audio-source").attrs["src"]
+
+        except Exception as e:
+            raise Exception(f"Audio challenge failed: {str(e)}")
+
+    async def asolve_captcha(self) -> None:
+        """Awaitable counterpart of solveCaptcha.
+
+        Page conditions are probed without blocking (timeout=0) and the waits
+        between probes are ``asyncio.sleep``, while the audio download, decode
+        and recognition run in the loop's default executor. One event loop
+        thread can therefore interleave many solves, since each spends most of
+        its time waiting on the page or the network.
+
+        Raises:
+            Exception: If captcha solving fails or bot is detected
+        """
+        self.timings = {}
+        self.expired = []
+        self.attempts = 0
+        self.outcome = 'failed'
+        self.transcript_cached = False
+        self._audio_keys = []
+
+        with self._timed('anchor_iframe'):
+            iframe_inner = self._waited('anchor_iframe', await self._apoll(
+                lambda: self._displayed(self.driver, "@title=reCAPTCHA"), self._timeout('anchor_iframe')
+            ))
+        if not iframe_inner:
+            self.outcome = 'no_widget'
+            raise Exception("reCAPTCHA widget not found")
+
+        with self._timed('checkbox_click'):
+            checkbox = self._waited('checkbox_click', await self._apoll(
+                lambda: self._displayed(iframe_inner, ".rc-anchor-content"), self._timeout('checkbox_click')
+            ))
+            if not checkbox:
+                raise Exception("reCAPTCHA checkbox not found")
+            checkbox.click()
+
+        with self._timed('checkbox_result'):
+            is_solved = self._waited('checkbox_result', await self._apoll(
+                self._checkbox_outcome, self._timeout('checkbox_result')
+            ))
+        if is_solved:
+            self.outcome = 'checkbox'
+            return
+
+        iframe = self.driver("xpath://iframe[contains(@title, 'recaptcha')]", timeout=0)
+        if not iframe:
+            raise Exception("Challenge frame not found")
+        with self._timed('audio_button'):
+            audio_button = self._waited('audio_button', await self._apoll(
+                lambda: self._displayed(iframe, "#recaptcha-audio-button"), self._timeout('audio_button')
+            ))
+            if not audio_button:
+                raise Exception("Audio challenge button not found")
+            audio_button.click()
+
+        with self._timed('audio_source'):
+            outcome = self._waited('audio_source', await self._apoll(
+                lambda: self._audio_source_outcome(iframe), self._timeout('audio_source')
+            ))
+        if outcome != 'ready':
+            if outcome == 'detected' or self.is_detected(timeout=0):
+                self.outcome = 'bot_detected'
+                raise Exception("Captcha detected bot behavior")
+            raise Exception("Audio challenge did not load")
+
+        src = iframe("#audio-source", timeout=0).attrs["src"]
+
+        try:
+            while True:
+                text_response = await asyncio.get_running_loop().run_in_executor(
+                    None, self._process_audio_challenge, src
+                )
+                with self._timed('answer_submit'):
+                    iframe("#audio-response", timeout=0).input(text_response.lower(), clear=True)
+                    iframe("#recaptcha-verify-button", timeout=0).click()
+                self.attempts += 1
+
+                with self._timed('verify'):
+                    is_solved = self._waited('verify', await self._apoll(
+                        lambda: self._verify_outcome(iframe, src if self.attempts > 1 else None),
+                        self._timeout('verify')
+                    ))
+                if self._record_verdict(is_solved):
+                    return
 
-            if not self.is_solved():
-                raise Exception("Failed to solve the captcha")
+                with self._timed('reload'):
+                    if self._reload_outcome(iframe, src) is None:
+                        reload_button = iframe("#recaptcha-reload-button", timeout=0)
+                        if not reload_button:
+                            raise Exception("Challenge reload button not found")
+                        reload_button.click()
+                    outcome = self._waited('reload', await self._apoll(
+                        lambda: self._reload_outcome(iframe, src), self._timeout('audio_source')
+                    ))
+                self._check_reload(outcome)
+                src = iframe("#audio-source", timeout=0).attrs["src"]
 
         except Exception as e:
             raise Exception(f"Audio challenge failed: {str(e)}")
 
+    def _record_verdict(self, is_solved: Optional[bool]) -> bool:
+        """Record the verification result of the submitted transcript.
+
+        Returns:
+            bool: True if it was accepted, False if it was rejected and
+            another clip may be tried
+
+        Raises:
+            Exception: If the transcript was not accepted and no retry is left,
+                the verdict timed out, or bot detection showed
+        """
+        # A timeout says nothing about the transcript; only a verdict is recorded
+        if self.cache is not None and is_solved is not None:
+            self.cache.mark(self._audio_keys, is_solved)
+        if is_solved:
+            self.outcome = 'audio'
+            return True
+        if self.is_detected():
+            self.outcome = 'bot_detected'
+            raise Exception("Failed to solve the captcha")
+        if is_solved is None or self.attempts > self.retries:
+            raise Exception("Failed to solve the captcha")
+        logger.info(f"Transcript rejected, retrying with a new clip ({self.attempts}/{self.retries})")
+        return False
+
+    def _check_reload(self, outcome: Optional[str]) -> None:
+        """Raise unless the reloaded challenge is ready (see ``_reload_outcome``)."""
+        if outcome == 'ready':
+            return
+        if outcome == 'detected':
+            self.outcome = 'bot_detected'
+            raise Exception("Captcha detected bot behavior")
+        raise Exception("Challenge did not reload")
+
     def _process_audio_challenge(self, audio_url: str) -> str:
         """Process the audio challenge and return the recognized text.
 
+        The clip is downloaded into memory and decoded in-process, so nothing
+        touches disk and concurrent solves cannot clobber each other's files.
+        It is then resampled to 16 kHz, trimmed and normalised before recognition.
+        With a cache, a clip seen before (same bytes, or the same loudness
+        fingerprint once decoded) is answered without recognition.
+
         Args:
             audio_url: URL of the audio file to process
 
         Returns:
             str: Recognized text from the audio file
         """
-        mp3_path = os.path.join(self.TEMP_DIR, f"{random.randrange(1,1000)}.mp3")
-        wav_path = os.path.join(self.TEMP_DIR, f"{random.randrange(1,1000)}.wav")
+        with self._timed('audio_download'):
+            data = audio_pipeline.fetch_audio(audio_url)
+        self._audio_keys = [content_key(data)]
+        if self.cache is not None:
+            cached = self.cache.get(self._audio_keys[0])
+            if cached is not None:
+                self.transcript_cached = True
+                return cached
 
-        try:
-            urllib.request.urlretrieve(audio_url, mp3_path)
-            sound = pydub.AudioSegment.from_mp3(mp3_path)
-            sound.export(wav_path, format="wav")
+        with self._timed('audio_decode'):
+            pcm, sample_rate = audio_pipeline.preprocess(*audio_pipeline.decode_audio(data))
+        if self.cache is not None:
+            fingerprint = audio_fingerprint(pcm, sample_rate)
+            if fingerprint is not None:
+                self._audio_keys.append(fingerprint)
+                cached = self.cache.get(fingerprint)
+                if cached is not None:
+                    self.transcript_cached = True
+                    self.cache.alias(self._audio_keys[0], fingerprint)
+                    return cached
 
-            recognizer = speech_recognition.Recognizer()
-            with speech_recognition.AudioFile(wav_path) as source:
-                audio = recognizer.record(source)
-
-            return recognizer.recognize_google(audio)
-
-        finally:
-            for path in (mp3_path, wav_path):
-                if os.path.exists(path):
-                    try:
-                        os.remove(path)
-                    except OSError:
-                        pass
+        with self._timed('recognition'):
+            text = self.backend.transcribe(audio_pipeline.to_audio_data(pcm, sample_rate)).text
+        if self.cache is not None:
+            self.cache.put(self._audio_keys, text)
+        return text
 
     def is_solved(self) -> bool:
         """Check if the captcha has been solved by looking for the style attribute in .recaptcha-checkbox-checkmark inside the reCAPTCHA iframe."""
         try:
-            time.sleep(1)
-            iframe = self.driver("@title=reCAPTCHA")
+            iframe = self.driver("@title=reCAPTCHA", timeout=self.TIMEOUT_SHORT)
             checkmark = iframe.ele('.recaptcha-checkbox-checkmark', timeout=self.TIMEOUT_SHORT)
-            if checkmark is not None and "style" in checkmark.attrs:
+            if checkmark and "style" in checkmark.attrs:
                 return True
             return False
         except Exception:
             return False
 
-    def is_detected(self) -> bool:
+    async def ais_solved(self, timeout: float = TIMEOUT_SHORT) -> bool:
+        """Awaitable is_solved: wait up to ``timeout`` seconds for the checkmark without blocking."""
+        return bool(await self._apoll(lambda: self._checkmark_shown() or None, timeout))
+
+    def wait_until_solved(self, timeout: float = TIMEOUT_STANDARD) -> bool:
+        """Poll until the checkmark appears or ``timeout`` seconds pass."""
+        return bool(self._poll(lambda: self._checkmark_shown() or None, timeout))
+
+    def _checkmark_shown(self) -> bool:
+        """Non-blocking variant of is_solved, for use inside polling loops."""
+        try:
+            iframe = self.driver("@title=reCAPTCHA", timeout=0)
+            checkmark = iframe.ele('.recaptcha-checkbox-checkmark', timeout=0) if iframe else None
+            return bool(checkmark) and "style" in checkmark.attrs
+        except Exception:
+            return False
+
+    def _displayed(self, container: Any, selector: str) -> Any:
+        """The element matching ``selector`` if it is displayed, else None (non-blocking)."""
+        try:
+            element = container(selector, timeout=0)
+            return element if element and element.states.is_displayed else None
+        except Exception:
+            return None
+
+    def _audio_source_outcome(self, iframe) -> Optional[str]:
+        """'detected' once bot detection shows, 'ready' once the audio source exists, else None."""
+        if self.is_detected(timeout=0):
+            return 'detected'
+        return 'ready' if iframe("#audio-source", timeout=0) else None
+
+    def _reload_outcome(self, iframe, previous_src: str) -> Optional[str]:
+        """'detected' once bot detection shows, 'ready' once a new clip replaced ``previous_src``, else None."""
+        if self.is_detected(timeout=0):
+            return 'detected'
+        try:
+            source = iframe("#audio-source", timeout=0)
+            return 'ready' if source and source.attrs.get("src") not in (None, previous_src) else None
+        except Exception:
+            return None
+
+    def _checkbox_outcome(self) -> Optional[bool]:
+        """True once the checkbox is ticked, False once the challenge is shown, else None."""
+        if self._checkmark_shown():
+            return True
+        try:
+            challenge = self.driver("xpath://iframe[contains(@title, 'recaptcha')]", timeout=0)
+            if challenge and challenge.states.is_displayed:
+                return False
+        except Exception:
+            pass
+        return None
+
+    def _verify_outcome(self, iframe, submitted_src: Optional[str] = None) -> Optional[bool]:
+        """True once the checkbox is ticked, False once the challenge reports an error, else None.
+
+        On a retry the previous rejection is still displayed; with ``submitted_src``
+        an error only counts once a new clip has replaced the submitted one.
+        """
+        if self._checkmark_shown():
+            return True
+        if self.is_detected(timeout=0):
+            return False
+        try:
+            error = iframe(".rc-audiochallenge-error-message", timeout=0)
+            if error and error.states.is_displayed and error.text.strip():
+                if submitted_src is None or self._reload_outcome(iframe, submitted_src) == 'ready':
+                    return False
+        except Exception:
+            pass
+        return None
+
+    def _poll(self, condition: Callable[[], Any], timeout: float) -> Any:
+        """Evaluate ``condition`` every POLL_INTERVAL until it returns a value other than None.
+
+        Args:
+            condition: Callable returning None while the page is not ready
+            timeout: Seconds before giving up
+
+        Returns:
+            The first non-None value, or None on timeout
+        """
+        deadline = time.time() + timeout
+        while True:
+            value = condition()
+            if value is not None or time.time() >= deadline:
+                return value
+            time.sleep(self.POLL_INTERVAL)
+
+    async def _apoll(self, condition: Callable[[], Any], timeout: float) -> Any:
+        """Awaitable _poll: yields to the event loop between evaluations of ``condition``."""
+        deadline = time.time() + timeout
+        while True:
+            value = condition()
+            if value is not None or time.time() >= deadline:
+                return value
+            await asyncio.sleep(self.POLL_INTERVAL)
+
+    def _timeout(self, step: str) -> float:
+        """Seconds to wait in a solve step."""
+        return self.timeouts.get(step, self.TIMEOUT_STANDARD)
+
+    def _waited(self, step: str, value: Any) -> Any:
+        """Pass on the result of a step's wait, noting the step in ``self.expired`` if it is None."""
+        if value is None:
+            self.expired.append(step)
+        return value
+
+    def _timed(self, step: str) -> ContextManager[None]:
+        """Record the wall time of a solve step in ``self.timings``."""
+        return timed(self.timings, step)
+
+    def is_detected(self, timeout: float = TIMEOUT_DETECTION) -> bool:
         """Check if the bot has been detected."""
         try:
-            return (
-                self.driver.ele("Try again later", timeout=self.TIMEOUT_DETECTION)
-                .states()
-                .is_displayed
-            )
+            notice = self.driver.ele("Try again later", timeout=timeout)
+            return bool(notice) and notice.states.is_displayed
         except Exception:
             return False
 
@@ -145,6 +467,10 @@ class RecaptchaSolver:
         except Exception:
             return None
 
+    async def aget_token(self, timeout: float = TIMEOUT_SHORT) -> Optional[str]:
+        """Awaitable get_token: wait up to ``timeout`` seconds for the token to be written."""
+        return await self._apoll(self.get_token, timeout)
+
     def get_response_token(self) -> Optional[str]:
         """Get the reCAPTCHA response token - alias for get_token for API compatibility."""
         return self.get_token()
\ No newline at end of file
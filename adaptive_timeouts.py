@@ -0,0 +1,126 @@
+import logging
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# RecaptchaSolver steps that wait on a page condition
+WAIT_STEPS = ('anchor_iframe', 'checkbox_click', 'checkbox_result', 'audio_button', 'audio_source', 'verify')
+
+
+class TimeoutController:
+    """Deadlines for the solver's waits, set from how long each wait really takes.
+
+    Every wait step keeps a rolling window of its durations. Its deadline is
+    the observed ``percentile`` plus ``margin`` seconds, kept between
+    ``floor`` and ``ceiling``; until ``min_samples`` durations are known it
+    is the ceiling. A hung step then fails after a few seconds instead of
+    the fixed 20, returning its browser to the pool sooner.
+
+    A wait that runs out is recorded at its deadline. While more than
+    ``100 - percentile`` % of a step's recent waits expire, its deadline
+    therefore keeps growing by ``margin``, so slow proxies are not cut off
+    for good.
+    """
+
+    # Defaults
+    DEFAULT_PERCENTILE = 99.0
+    DEFAULT_MARGIN = 2.0
+    DEFAULT_FLOOR = 2.0
+    DEFAULT_CEILING = 20.0
+    DEFAULT_MIN_SAMPLES = 20
+    # Durations kept per step
+    WINDOW = 500
+
+    def __init__(self, percentile: float = DEFAULT_PERCENTILE, margin: float = DEFAULT_MARGIN,
+                 floor: float = DEFAULT_FLOOR, ceiling: float = DEFAULT_CEILING,
+                 min_samples: int = DEFAULT_MIN_SAMPLES, steps: Sequence[str] = WAIT_STEPS) -> None:
+        """Configure the deadlines.
+
+        Args:
+            percentile: Percentile (0-100) of observed durations a deadline covers
+            margin: Seconds added to the percentile
+            floor: Shortest deadline
+            ceiling: Longest deadline, used until a step has ``min_samples`` durations
+            min_samples: Durations needed before a step's deadline adapts
+            steps: Step names to manage
+        """
+        if not 0 < percentile <= 100:
+            raise ValueError("percentile must be in (0, 100]")
+        if not 0 < floor <= ceiling:
+            raise ValueError("Need 0 < floor <= ceiling")
+
+        self.percentile = percentile
+        self.margin = margin
+        self.floor = floor
+        self.ceiling = ceiling
+        self.min_samples = min_samples
+        self.steps = tuple(steps)
+
+        self._lock = threading.Lock()
+        self._durations: Dict[str, Deque[float]] = {step: deque(maxlen=self.WINDOW) for step in self.steps}
+        self._counts = {step: {'waits': 0, 'expired': 0} for step in self.steps}
+
+    def timeout(self, step: str) -> float:
+        """Current deadline of a step, in seconds."""
+        with self._lock:
+            return self._deadline(step)
+
+    def timeouts(self) -> Dict[str, float]:
+        """Current deadline of every step, as RecaptchaSolver ``timeouts``."""
+        with self._lock:
+            return {step: self._deadline(step) for step in self.steps}
+
+    def record(self, timings: Dict[str, float], expired: Iterable[str] = ()) -> None:
+        """Learn from the step timings of a solve.
+
+        Args:
+            timings: Seconds per step (RecaptchaSolver.timings)
+            expired: Steps whose wait ran out (RecaptchaSolver.expired)
+        """
+        expired = set(expired)
+        with self._lock:
+            for step in self.steps:
+                if step not in timings:
+                    continue
+                self._durations[step].append(timings[step])
+                self._counts[step]['waits'] += 1
+                if step in expired:
+                    self._counts[step]['expired'] += 1
+        for step in expired & set(self.steps):
+            logger.info(f"Wait for {step} ran out after {timings.get(step, 0.0):.1f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the deadline, p50/p95 and expiry count of every step."""
+        with self._lock:
+            steps = {}
+            for step in self.steps:
+                steps[step] = {
+                    'timeout': self._deadline(step),
+                    'p50': self._observed(step, 50),
+                    'p95': self._observed(step, 95),
+                    **self._counts[step]
+                }
+            return {
+                'percentile': self.percentile,
+                'margin': self.margin,
+                'floor': self.floor,
+                'ceiling': self.ceiling,
+                'steps': steps
+            }
+
+    def _deadline(self, step: str) -> float:
+        """Deadline of a step. Caller holds the lock."""
+        observed = self._observed(step, self.percentile)
+        if observed is None:
+            return self.ceiling
+        return round(min(max(observed + self.margin, self.floor), self.ceiling), 2)
+
+    def _observed(self, step: str, percentile: float) -> Optional[float]:
+        """Observed duration percentile, or None before ``min_samples``. Caller holds the lock."""
+        durations = sorted(self._durations.get(step, ()))
+        if len(durations) < self.min_samples:
+            return None
+        index = min(len(durations) - 1, int(round(percentile / 100 * (len(durations) - 1))))
+        return round(durations[index], 3)
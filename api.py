@@ -1,9 +1,26 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from DrissionPage import ChromiumPage, ChromiumOptions
 from RecaptchaSolver import RecaptchaSolver
+from adaptive_timeouts import TimeoutController
+from browser_pool import BrowserPool, ContextPool, KeyedBrowserPool, mask_proxy
+from captcha_detection import DETECTION_TIMEOUT, SOLVABLE_TYPES, detect_captcha
+from jobs import JobManager, QueueFullError
+from token_pool import TokenPool
+from prefetch_scheduler import PrefetchScheduler
+from proxy_health import CircuitOpenError, ProxyHealth
+from rate_scheduler import RateLimitedError, RateScheduler
+from resource_policy import PAGE_TRANSFER_SCRIPT, ResourceBlocker, ResourcePolicy
+from site_profiles import SiteProfiles
+from speech_backends import HedgedBackend, RecognitionBackend, create_backend
+from transcript_cache import TranscriptCache
+import metrics
+from metrics import timed
+import json
 import time
 import logging
-from typing import Dict, List, Optional, Any
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Any, Tuple
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -11,6 +28,18 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
+# Worker pool behind the asynchronous job endpoints, created by init_job_manager()
+job_manager: Optional[JobManager] = None
+_job_manager_lock = threading.Lock()
+
+# Pre-solved token reservoir, created by init_token_pool()
+token_pool: Optional[TokenPool] = None
+_token_pool_lock = threading.Lock()
+
+# Limits for POST /solve-captcha/batch
+BATCH_MAX_SIZE = 100
+BATCH_MAX_CONCURRENCY = 8
+
 class CaptchaAPI:
     """API class for solving reCAPTCHA challenges."""
     
@@ -33,21 +62,55 @@ class CaptchaAPI:
         "--no-sandbox"
     ]
 
+    # Seconds to wait for the target document to finish loading
+    PAGE_LOAD_TIMEOUT = 15
+
+    # Cookie fields accepted from and returned to clients (CDP Network.Cookie names)
+    COOKIE_FIELDS = ('name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'expires', 'sameSite')
+
+    # Speech-recognition backend shared by all solves, set with set_recognition_backend()
+    recognition_backend: Optional[RecognitionBackend] = None
+
+    # Fresh audio clips tried in the same session after a rejected transcript
+    challenge_retries = 0
+
+    # Transcripts of previously seen audio clips, enabled with enable_transcript_cache()
+    transcript_cache: Optional[TranscriptCache] = None
+    # Learned widget type and waits per target page, enabled with enable_site_profiles()
+    site_profiles: Optional[SiteProfiles] = None
+    # Solver wait deadlines from observed latencies, enabled with enable_adaptive_timeouts()
+    timeout_controller: Optional[TimeoutController] = None
+
+    # Warm browser pool, enabled with enable_browser_pool()
+    browser_pool: Optional[BrowserPool] = None
+    # Shared browser with isolated contexts, enabled with enable_context_pool()
+    context_pool: Optional[ContextPool] = None
+    # Browsers per (proxy, user agent, headless), enabled with enable_keyed_pool()
+    keyed_pool: Optional[KeyedBrowserPool] = None
+    # Circuit breaker per proxy, enabled with enable_proxy_health()
+    proxy_health: Optional[ProxyHealth] = None
+    # Token-bucket pacing per domain and proxy, enabled with enable_rate_scheduler()
+    rate_scheduler: Optional[RateScheduler] = None
+
     @staticmethod
     def create_driver(proxy: Optional[str] = None, user_agent: Optional[str] = None, 
-                  headless: bool = False) -> ChromiumPage:
+                  headless: bool = False, auto_port: bool = False) -> ChromiumPage:
         """Create a ChromiumPage driver with specified options.
         
         Args:
             proxy: Optional proxy string in format 'ip:port' or 'username:password@ip:port'
             user_agent: Optional custom user agent string
             headless: Whether to run browser in headless mode (default: False for visible mode)
+            auto_port: Launch a separate browser on a free port instead of reusing the default one
             
         Returns:
             ChromiumPage: Configured browser driver
         """
         options = ChromiumOptions()
 
+        if auto_port:
+            options.auto_port()
+
         # ✅ Ruta explícita al binario de Chromium (en Colab)
         options.set_paths(browser_path='/usr/bin/chromium-browser')
 
@@ -85,98 +148,431 @@ class CaptchaAPI:
         
         return ChromiumPage(addr_or_opts=options)
 
+    @staticmethod
+    def set_recognition_backend(name: str, **options: Any) -> RecognitionBackend:
+        """Select the speech-recognition backend used by every solve.
+        
+        Args:
+            name: Backend name ('google', 'vosk' or 'hedged')
+            **options: Backend options, e.g. model_path and workers for 'vosk',
+                or the backends to race for 'hedged'
+            
+        Returns:
+            RecognitionBackend: The backend
+        """
+        backend = create_backend(name, **options)
+        if CaptchaAPI.recognition_backend is not None:
+            CaptchaAPI.recognition_backend.close()
+        CaptchaAPI.recognition_backend = backend
+        logger.info(f"Using '{name}' speech recognition")
+        return backend
+
+    @staticmethod
+    def enable_transcript_cache(max_entries: int = TranscriptCache.DEFAULT_MAX_ENTRIES,
+                                path: Optional[str] = None) -> TranscriptCache:
+        """Reuse transcripts of audio clips that were already recognised.
+        
+        Args:
+            max_entries: Transcripts kept in memory
+            path: Optional SQLite file persisting transcripts across restarts
+            
+        Returns:
+            TranscriptCache: The cache
+        """
+        if CaptchaAPI.transcript_cache is not None:
+            CaptchaAPI.transcript_cache.close()
+        CaptchaAPI.transcript_cache = TranscriptCache(max_entries=max_entries, path=path)
+        logger.info(f"Transcript cache enabled ({max_entries} entries{', persisted to ' + path if path else ''})")
+        return CaptchaAPI.transcript_cache
+
+    @staticmethod
+    def enable_site_profiles(max_entries: int = SiteProfiles.DEFAULT_MAX_ENTRIES,
+                             path: Optional[str] = None,
+                             min_samples: int = SiteProfiles.DEFAULT_MIN_SAMPLES) -> SiteProfiles:
+        """Learn each target page's widget and timings to skip detection and size waits.
+        
+        Args:
+            max_entries: Profiles kept in memory
+            path: Optional SQLite file persisting profiles across restarts
+            min_samples: Solves of a page before its profile is used
+            
+        Returns:
+            SiteProfiles: The profile store
+        """
+        if CaptchaAPI.site_profiles is not None:
+            CaptchaAPI.site_profiles.close()
+        CaptchaAPI.site_profiles = SiteProfiles(max_entries=max_entries, path=path, min_samples=min_samples)
+        logger.info(f"Site profiles enabled ({max_entries} pages{', persisted to ' + path if path else ''})")
+        return CaptchaAPI.site_profiles
+
+    @staticmethod
+    def enable_adaptive_timeouts(percentile: float = TimeoutController.DEFAULT_PERCENTILE,
+                                 margin: float = TimeoutController.DEFAULT_MARGIN,
+                                 floor: float = TimeoutController.DEFAULT_FLOOR,
+                                 ceiling: float = TimeoutController.DEFAULT_CEILING) -> TimeoutController:
+        """Set the solver's wait deadlines from the latencies observed so far.
+        
+        Args:
+            percentile: Percentile of observed durations a deadline covers
+            margin: Seconds added to the percentile
+            floor: Shortest deadline
+            ceiling: Longest deadline
+            
+        Returns:
+            TimeoutController: The controller
+        """
+        CaptchaAPI.timeout_controller = TimeoutController(percentile=percentile, margin=margin,
+                                                          floor=floor, ceiling=ceiling)
+        logger.info(f"Adaptive timeouts enabled: p{percentile:g} + {margin:g}s within {floor:g}-{ceiling:g}s")
+        return CaptchaAPI.timeout_controller
+
+    @staticmethod
+    def run_solver(solver: RecaptchaSolver,
+                   report: Optional[Dict[str, Any]] = None) -> Tuple[Optional[str], bool, float]:
+        """Solve the widget on the solver's page and read the token.
+        
+        Args:
+            solver: Solver attached to the page
+            report: Optional dict; the solver's step timings and expired waits
+                are appended to its 'waits' list
+            
+        Returns:
+            Tuple of (token, solved, seconds spent); failures are logged, and
+            their reason is left in ``solver.outcome``
+        """
+        token = None
+        is_solved = False
+        logger.info("Attempting to solve reCAPTCHA...")
+        captcha_start_time = time.time()
+        try:
+            solver.solveCaptcha()
+            logger.info("Captcha solved")
+            
+            logger.info("Get Captcha Token")
+            with timed(solver.timings, 'token'):
+                # Get the token
+                token = solver.get_token()
+                
+                # Check if solved
+                is_solved = solver.is_solved()
+            
+        except Exception as e:
+            logger.error(f"Error solving reCAPTCHA: {str(e)}")
+        if CaptchaAPI.timeout_controller is not None:
+            CaptchaAPI.timeout_controller.record(solver.timings, solver.expired)
+        if report is not None:
+            report.setdefault('waits', []).append({'timings': dict(solver.timings),
+                                                   'expired': list(solver.expired)})
+        return token, is_solved, time.time() - captcha_start_time
+
+    @staticmethod
+    def enable_browser_pool(size: int = BrowserPool.DEFAULT_SIZE,
+                            max_uses: int = BrowserPool.DEFAULT_MAX_USES,
+                            max_age: float = BrowserPool.DEFAULT_MAX_AGE) -> BrowserPool:
+        """Pre-launch a pool of browsers used by requests without proxy or user agent.
+        
+        Args:
+            size: Number of browsers kept warm
+            max_uses: Solves served by a browser before it is recycled
+            max_age: Seconds a browser may live before it is recycled
+            
+        Returns:
+            BrowserPool: The started pool
+        """
+        if CaptchaAPI.browser_pool is not None:
+            CaptchaAPI.browser_pool.shutdown()
+
+        pool = BrowserPool(
+            factory=lambda: CaptchaAPI.create_driver(headless=True, auto_port=True),
+            size=size,
+            max_uses=max_uses,
+            max_age=max_age
+        )
+        pool.start()
+        CaptchaAPI.browser_pool = pool
+        logger.info(f"Browser pool started with {size} browser(s)")
+        return pool
+
+    @staticmethod
+    def shutdown_pools() -> None:
+        """Quit the browsers of every pool; solves fall back to dedicated browsers."""
+        for name in ('browser_pool', 'context_pool', 'keyed_pool'):
+            pool = getattr(CaptchaAPI, name)
+            if pool is not None:
+                setattr(CaptchaAPI, name, None)
+                pool.shutdown()
+
+    @staticmethod
+    def enable_context_pool(max_contexts: int = ContextPool.DEFAULT_MAX_CONTEXTS,
+                            max_uses: int = ContextPool.DEFAULT_MAX_USES) -> ContextPool:
+        """Run concurrent solves in isolated contexts of one shared browser.
+        
+        Takes precedence over the browser pool for requests without proxy or user agent.
+        
+        Args:
+            max_contexts: Maximum number of concurrent solves in the browser
+            max_uses: Solves served before the shared browser is relaunched
+            
+        Returns:
+            ContextPool: The started pool
+        """
+        if CaptchaAPI.context_pool is not None:
+            CaptchaAPI.context_pool.shutdown()
+
+        pool = ContextPool(
+            factory=lambda: CaptchaAPI.create_driver(headless=True, auto_port=True),
+            max_contexts=max_contexts,
+            max_uses=max_uses
+        )
+        pool.start()
+        CaptchaAPI.context_pool = pool
+        logger.info(f"Context pool started with up to {max_contexts} concurrent context(s)")
+        return pool
+
+    @staticmethod
+    def enable_keyed_pool(capacity: int = KeyedBrowserPool.DEFAULT_CAPACITY,
+                          max_uses: int = KeyedBrowserPool.DEFAULT_MAX_USES,
+                          max_age: float = KeyedBrowserPool.DEFAULT_MAX_AGE) -> KeyedBrowserPool:
+        """Pool browsers per proxy and user agent for requests that set them.
+        
+        Args:
+            capacity: Maximum number of browsers alive at once, across keys
+            max_uses: Solves served by a browser before it is recycled
+            max_age: Seconds a browser may live before it is recycled
+            
+        Returns:
+            KeyedBrowserPool: The pool; browsers are launched on demand
+        """
+        if CaptchaAPI.keyed_pool is not None:
+            CaptchaAPI.keyed_pool.shutdown()
+
+        pool = KeyedBrowserPool(
+            factory=lambda key: CaptchaAPI.create_driver(proxy=key[0], user_agent=key[1], headless=key[2],
+                                                         auto_port=True),
+            capacity=capacity,
+            max_uses=max_uses,
+            max_age=max_age
+        )
+        CaptchaAPI.keyed_pool = pool
+        logger.info(f"Keyed browser pool enabled for up to {capacity} browser(s)")
+        return pool
+
+    @staticmethod
+    def enable_proxy_health(proxies: Optional[List[str]] = None,
+                            failure_threshold: int = ProxyHealth.DEFAULT_FAILURE_THRESHOLD,
+                            base_cooldown: float = ProxyHealth.DEFAULT_BASE_COOLDOWN,
+                            max_cooldown: float = ProxyHealth.DEFAULT_MAX_COOLDOWN) -> ProxyHealth:
+        """Fail fast on proxies that keep getting bot-detected.
+        
+        Args:
+            proxies: Proxies to route requests without a 'proxy' through
+            failure_threshold: Consecutive failures that open a proxy's circuit
+            base_cooldown: Seconds a circuit stays open after its first trip
+            max_cooldown: Upper bound of the doubling cool-down
+            
+        Returns:
+            ProxyHealth: The circuit breaker
+        """
+        CaptchaAPI.proxy_health = ProxyHealth(proxies=proxies or [], failure_threshold=failure_threshold,
+                                              base_cooldown=base_cooldown, max_cooldown=max_cooldown)
+        logger.info(f"Proxy circuit breaker enabled ({len(proxies or [])} routable proxies)")
+        return CaptchaAPI.proxy_health
+
+    @staticmethod
+    def enable_rate_scheduler(domain_rate: float = RateScheduler.DEFAULT_DOMAIN_RATE,
+                              domain_burst: int = RateScheduler.DEFAULT_DOMAIN_BURST,
+                              proxy_rate: float = RateScheduler.DEFAULT_PROXY_RATE,
+                              proxy_burst: int = RateScheduler.DEFAULT_PROXY_BURST,
+                              domain_limits: Optional[Dict[str, Tuple[float, int]]] = None,
+                              max_wait: Optional[float] = None) -> RateScheduler:
+        """Pace solves per target domain and per proxy.
+        
+        Args:
+            domain_rate: Solves per minute per target domain
+            domain_burst: Solves a domain may start back to back
+            proxy_rate: Solves per minute per proxy
+            proxy_burst: Solves a proxy may start back to back
+            domain_limits: (rate, burst) overrides per domain
+            max_wait: Seconds a solve may wait for its turn (None: no limit)
+            
+        Returns:
+            RateScheduler: The scheduler
+        """
+        CaptchaAPI.rate_scheduler = RateScheduler(
+            domain_rate=domain_rate, domain_burst=domain_burst, proxy_rate=proxy_rate,
+            proxy_burst=proxy_burst, domain_limits=domain_limits, max_wait=max_wait
+        )
+        logger.info(f"Rate scheduler enabled: {domain_rate}/min per domain, {proxy_rate}/min per proxy")
+        return CaptchaAPI.rate_scheduler
+
+    @staticmethod
+    def admit_request(url: str, proxy: Optional[str], stages: Dict[str, float]) -> Optional[str]:
+        """Apply the proxy circuit breaker and the rate scheduler to a solve.
+        
+        Pinned proxies are checked against the breaker before queueing. Unpinned
+        requests go through the configured proxy whose turn comes first among
+        the healthy ones, waiting in line for it; if that proxy's circuit
+        opens meanwhile, the tokens are returned and the request is refused.
+        
+        Args:
+            url: Target URL
+            proxy: Proxy requested by the client, or None
+            stages: Stage timings; the wait is recorded as 'rate_limit'
+            
+        Returns:
+            The proxy to solve through (None for a direct connection)
+            
+        Raises:
+            CircuitOpenError: If the proxy, or every configured proxy, is cooling down
+            RateLimitedError: If the solve would wait longer than the scheduler allows
+        """
+        health = CaptchaAPI.proxy_health
+        scheduler = CaptchaAPI.rate_scheduler
+        routed = proxy is None and health is not None and bool(health.proxies)
+        
+        if scheduler is None or not routed:
+            if health is not None:
+                proxy = health.acquire(proxy)
+            if scheduler is not None:
+                try:
+                    with timed(stages, 'rate_limit'):
+                        proxy, _, _ = scheduler.acquire(url, proxy)
+                except RateLimitedError:
+                    if health is not None:
+                        health.record(proxy, 'rate_limited')  # Ends a half-open trial
+                    raise
+            return proxy
+        
+        candidates = health.routable()
+        if not candidates:
+            return health.acquire(None)  # Raises CircuitOpenError with the shortest cool-down
+        with timed(stages, 'rate_limit'):
+            proxy, _, spent = scheduler.acquire(url, None, candidates)
+        try:
+            return health.acquire(proxy)
+        except CircuitOpenError:
+            # The circuit opened while the solve waited for its turn; it never starts
+            scheduler.refund(spent)
+            raise
+
+    @staticmethod
+    async def aadmit_request(url: str, proxy: Optional[str], stages: Dict[str, float]) -> Optional[str]:
+        """Awaitable admit_request: a solve waiting for its turn costs a coroutine, not a thread."""
+        health = CaptchaAPI.proxy_health
+        scheduler = CaptchaAPI.rate_scheduler
+        routed = proxy is None and health is not None and bool(health.proxies)
+        
+        if scheduler is None or not routed:
+            if health is not None:
+                proxy = health.acquire(proxy)
+            if scheduler is not None:
+                try:
+                    with timed(stages, 'rate_limit'):
+                        proxy, _, _ = await scheduler.aacquire(url, proxy)
+                except RateLimitedError:
+                    if health is not None:
+                        health.record(proxy, 'rate_limited')
+                    raise
+            return proxy
+        
+        candidates = health.routable()
+        if not candidates:
+            return health.acquire(None)
+        with timed(stages, 'rate_limit'):
+            proxy, _, spent = await scheduler.aacquire(url, None, candidates)
+        try:
+            return health.acquire(proxy)
+        except CircuitOpenError:
+            scheduler.refund(spent)
+            raise
+
+    @staticmethod
+    def rejected_result(url: str, error: Exception, stages: Dict[str, float],
+                        total_time: float) -> Dict[str, Any]:
+        """Build the result of a solve refused by ``admit_request``.
+        
+        Args:
+            url: Target URL
+            error: The CircuitOpenError or RateLimitedError raised
+            stages: Stage timings recorded so far
+            total_time: Seconds spent before the refusal
+            
+        Returns:
+            Dict with outcome 'circuit_open' or 'rate_limited' and 'retry_after'
+        """
+        return {
+            'success': False,
+            'captcha_found': False,
+            'error': str(error),
+            'cookies': [],
+            'outcome': 'circuit_open' if isinstance(error, CircuitOpenError) else 'rate_limited',
+            'retry_after': round(error.retry_after, 1),
+            'stage_timings': stages,
+            'total_time': round(total_time, 3),
+            'url': url
+        }
+
     @staticmethod
     def set_cookies(driver: ChromiumPage, cookies: List[Dict[str, Any]], domain: str) -> None:
-        """Set cookies for the browser session.
+        """Set cookies for the browser session in one CDP call.
+        
+        No page has to be loaded first, so this runs before the first navigation.
         
         Args:
             driver: ChromiumPage driver instance
             cookies: List of cookie dictionaries
-            domain: Domain to set cookies for
+            domain: Domain for cookies that do not name one
         """
-        # Navigate to domain first to set cookies
-        driver.get(f"https://{domain}")
-        
+        params = []
         for cookie in cookies:
-            try:
-                # Ensure required cookie fields
-                cookie_data = {
-                    'name': cookie.get('name', ''),
-                    'value': cookie.get('value', ''),
-                    'domain': cookie.get('domain', domain),
-                    'path': cookie.get('path', '/'),
-                    'secure': cookie.get('secure', False),
-                    'httpOnly': cookie.get('httpOnly', False)
-                }
-                
-                # Add optional fields if present
-                if 'expires' in cookie:
-                    cookie_data['expires'] = cookie['expires']
-                if 'sameSite' in cookie:
-                    cookie_data['sameSite'] = cookie['sameSite']
-                
-                # Use the correct DrissionPage method to set cookies
-                driver.set.cookies(cookie_data)
-                logger.info(f"Set cookie: {cookie_data['name']}")
-                
-            except Exception as e:
-                logger.warning(f"Failed to set cookie {cookie.get('name', 'unknown')}: {str(e)}")
-                # Try alternative method if the first one fails
+            if not cookie.get('name'):
+                logger.warning("Skipping cookie without a name")
+                continue
+            param = {field: cookie[field] for field in CaptchaAPI.COOKIE_FIELDS if field in cookie}
+            param.setdefault('value', '')
+            param.setdefault('domain', domain)
+            param.setdefault('path', '/')
+            params.append(param)
+        if not params:
+            return
+        
+        try:
+            driver.run_cdp('Network.setCookies', cookies=params)
+            logger.info(f"Set {len(params)} cookie(s)")
+        except Exception as e:
+            # One malformed cookie fails the whole batch; keep the valid ones
+            logger.warning(f"Failed to set cookies in bulk, retrying one by one: {str(e)}")
+            for param in params:
                 try:
-                    driver.set.cookie(
-                        name=cookie.get('name', ''),
-                        value=cookie.get('value', ''),
-                        domain=cookie.get('domain', domain),
-                        path=cookie.get('path', '/'),
-                        secure=cookie.get('secure', False),
-                        http_only=cookie.get('httpOnly', False)
-                    )
-                    logger.info(f"Set cookie (alternative method): {cookie.get('name', '')}")
+                    driver.run_cdp('Network.setCookies', cookies=[param])
                 except Exception as e2:
-                    logger.error(f"Failed to set cookie with both methods {cookie.get('name', 'unknown')}: {str(e2)}")
+                    logger.error(f"Failed to set cookie {param['name']}: {str(e2)}")
 
     @staticmethod
     def get_all_cookies(driver: ChromiumPage) -> List[Dict[str, Any]]:
-        """Extract all cookies from the current browser session.
+        """Extract all cookies of the current page in one CDP call.
         
         Args:
             driver: ChromiumPage driver instance
             
         Returns:
-            List of cookie dictionaries
+            List of cookie dictionaries; 'expires' is omitted for session cookies
         """
         try:
-            all_cookies = []
-            # Use the correct DrissionPage method to get cookies
-            cookies = driver.cookies()
-            
-            for cookie in cookies:
-                cookie_data = {
-                    'name': cookie.get('name', ''),
-                    'value': cookie.get('value', ''),
-                    'domain': cookie.get('domain', ''),
-                    'path': cookie.get('path', '/'),
-                    'secure': cookie.get('secure', False),
-                    'httpOnly': cookie.get('httpOnly', False)
-                }
-                
-                # Add optional fields if present
-                if 'expires' in cookie:
-                    cookie_data['expires'] = cookie['expires']
-                if 'sameSite' in cookie:
-                    cookie_data['sameSite'] = cookie['sameSite']
-                
-                all_cookies.append(cookie_data)
-            
-            return all_cookies
+            cookies = driver.run_cdp('Network.getCookies')['cookies']
         except Exception as e:
             logger.warning(f"Failed to extract cookies: {str(e)}")
             return []
+        return [{field: value for field, value in cookie.items()
+                 if field in CaptchaAPI.COOKIE_FIELDS and not (field == 'expires' and cookie.get('session'))}
+                for cookie in cookies]
 
     @staticmethod
     def solve_captcha_on_page(url: str, cookies: Optional[List[Dict[str, Any]]] = None, 
                              proxy: Optional[str] = None, user_agent: Optional[str] = None,
-                             headless: bool = False) -> Dict[str, Any]:
+                             headless: bool = False, resource_policy: Any = None,
+                             timeouts: Optional[Dict[str, float]] = None,
+                             report: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Solve reCAPTCHA on a given page.
         
         Args:
@@ -185,59 +581,109 @@ class CaptchaAPI:
             proxy: Optional proxy configuration
             user_agent: Optional custom user agent
             headless: Whether to run browser in headless mode (default: False for visible mode)
+            resource_policy: Resources to block while loading (see ResourcePolicy.from_request);
+                None applies the default policy, False loads everything
+            timeouts: Solver wait deadlines to use instead of the adaptive
+                controller's, when the caller keeps the controller itself
+            report: Optional dict filled for callers that keep the proxy breaker
+                or the timeout controller themselves: 'proxy_outcome' is the
+                outcome to record against the proxy, 'waits' the solver runs
             
         Returns:
             Dict containing success status, token, cookies, and timing information
         """
         driver = None
+        pooled = None
+        context_pool = None
+        keyed_pool = None
+        blocker = None
+        outcome = 'failed'
         start_time = time.time()
+        # Seconds per stage, in execution order; solver steps are merged in after 'detection'
+        stages: Dict[str, float] = {}
+        
+        # Refuse burned proxies and pace bursts before spending a browser
+        health = CaptchaAPI.proxy_health
+        try:
+            proxy = CaptchaAPI.admit_request(url, proxy, stages)
+        except (CircuitOpenError, RateLimitedError) as e:
+            logger.warning(str(e))
+            result = CaptchaAPI.rejected_result(url, e, stages, time.time() - start_time)
+            metrics.record_solve(result['outcome'], result['total_time'], stages)
+            return result
         
         try:
-            # Create driver with specified options
-            driver = CaptchaAPI.create_driver(proxy=proxy, user_agent=user_agent, headless=headless)
+            # Lease an isolated tab or a warm browser when possible; proxy and user
+            # agent are launch arguments, so those requests need a browser of their own
+            pool = CaptchaAPI.browser_pool
+            shareable = not proxy and not user_agent
+            with timed(stages, 'browser_launch'):
+                if shareable and CaptchaAPI.context_pool is not None:
+                    context_pool = CaptchaAPI.context_pool
+                    driver = context_pool.acquire()
+                elif shareable and pool is not None:
+                    pooled = pool.acquire()
+                    driver = pooled.driver
+                elif CaptchaAPI.keyed_pool is not None:
+                    keyed_pool = CaptchaAPI.keyed_pool
+                    pooled = keyed_pool.acquire((proxy, user_agent, headless))
+                    driver = pooled.driver
+                else:
+                    driver = CaptchaAPI.create_driver(proxy=proxy, user_agent=user_agent, headless=headless)
             
-            # Set cookies if provided
+            # Skip images, fonts, trackers etc. while the page loads
+            policy = ResourcePolicy.from_request(resource_policy)
+            if policy is not None:
+                blocker = ResourceBlocker(driver, policy)
+                blocker.start()
+            
+            # Set cookies if provided; they are in the jar before the first request
             if cookies:
                 from urllib.parse import urlparse
-                domain = urlparse(url).netloc
-                CaptchaAPI.set_cookies(driver, cookies, domain)
+                domain = urlparse(url).hostname
+                with timed(stages, 'cookies'):
+                    CaptchaAPI.set_cookies(driver, cookies, domain)
             
             # Navigate to target URL
             logger.info(f"Navigating to: {url}")
-            driver.get(url)
-            
-            # Wait for page to load completely
-            time.sleep(3)
-            
-            # Check if reCAPTCHA is present on the page
-            captcha_found = False
-            try:
-                # Look for reCAPTCHA iframe or elements
-                iframe_selectors = [
-                    "@title=reCAPTCHA",
-                    "iframe[src*='recaptcha']",
-                    ".g-recaptcha",
-                    "#recaptcha"
-                ]
+            with timed(stages, 'navigation'):
+                driver.get(url)
                 
-                for selector in iframe_selectors:
-                    try:
-                        element = driver.ele(selector, timeout=2)
-                        if element:
-                            captcha_found = True
-                            logger.info(f"Found reCAPTCHA using selector: {selector}")
-                            break
-                    except:
-                        continue
-                        
-                if not captcha_found:
-                    logger.warning("No reCAPTCHA found on the page")
-                    
-            except Exception as e:
-                logger.warning(f"Error checking for reCAPTCHA: {str(e)}")
-            
-            # Initialize reCAPTCHA solver
-            recaptcha_solver = RecaptchaSolver(driver)
+                # Wait for the document to finish loading; the widget probes below
+                # wait for the iframe themselves, so no fixed settle delay is needed
+                driver.wait.doc_loaded(timeout=CaptchaAPI.PAGE_LOAD_TIMEOUT)
+            
+            # A page that kept showing the same widget skips the generic scan and
+            # waits for it directly, with waits sized from its own history
+            profiles = CaptchaAPI.site_profiles
+            plan = profiles.plan(url, SOLVABLE_TYPES) if profiles is not None else None
+            profiled = bool(plan and plan['captcha_type'])
+            if profiled:
+                detection = {'found': True, 'type': plan['captcha_type'], 'sitekey': plan['sitekey'],
+                             'solvable': True}
+            else:
+                # Detect the widget in one JS evaluation per poll; returns as soon as
+                # it renders, or shortly after load when the page has none
+                with timed(stages, 'detection'):
+                    detection = detect_captcha(driver, timeout=(plan or {}).get('detection_timeout')
+                                               or DETECTION_TIMEOUT)
+            captcha_type = detection['type']
+            captcha_found = detection['solvable']
+            if captcha_type:
+                logger.info(f"{'Expecting' if profiled else 'Found'} {captcha_type} widget "
+                            f"(sitekey: {detection['sitekey']})")
+            else:
+                logger.warning("No reCAPTCHA found on the page")
+            
+            # Initialize reCAPTCHA solver; waits use the deadlines learnt across
+            # all solves, refined by the page's own profile
+            if timeouts is None:
+                controller = CaptchaAPI.timeout_controller
+                timeouts = controller.timeouts() if controller is not None else {}
+            recaptcha_solver = RecaptchaSolver(driver, backend=CaptchaAPI.recognition_backend,
+                                               cache=CaptchaAPI.transcript_cache,
+                                               timeouts={**timeouts, **(plan['timeouts'] if plan else {})},
+                                               retries=CaptchaAPI.challenge_retries)
             
             # Solve the captcha if found
             token = None
@@ -245,39 +691,69 @@ class CaptchaAPI:
             captcha_solve_time = 0
             
             if captcha_found:
-                logger.info("Attempting to solve reCAPTCHA...")
-                captcha_start_time = time.time()
+                token, is_solved, captcha_solve_time = CaptchaAPI.run_solver(recaptcha_solver, report)
+                if profiled and recaptcha_solver.outcome == 'no_widget':
+                    # The page changed since its profile was learnt: detect it again
+                    profiles.mismatch(url)
+                    # Keep the direct attempt's waits apart from the retry's
+                    stages.update({f'profiled_{step}': seconds
+                                   for step, seconds in recaptcha_solver.timings.items()})
+                    with timed(stages, 'detection'):
+                        detection = detect_captcha(driver)
+                    captcha_type = detection['type']
+                    captcha_found = detection['solvable']
+                    recaptcha_solver = RecaptchaSolver(driver, backend=CaptchaAPI.recognition_backend,
+                                                       cache=CaptchaAPI.transcript_cache, timeouts=timeouts,
+                                                       retries=CaptchaAPI.challenge_retries)
+                    if captcha_found:
+                        token, is_solved, captcha_solve_time = CaptchaAPI.run_solver(recaptcha_solver, report)
+            stages.update(recaptcha_solver.timings)
+            
+            resources = None
+            if blocker:
                 try:
-                    recaptcha_solver.solveCaptcha()
-                    logger.info("Captcha solved");
-                    captcha_solve_time = time.time() - captcha_start_time
-                    
-                    logger.info("Get Captcha Token");
-                    # Get the token
-                    token = recaptcha_solver.get_token()
-                    
-                    # Check if solved
-                    is_solved = recaptcha_solver.is_solved()
-                    
+                    resources = blocker.stats(driver.run_js(PAGE_TRANSFER_SCRIPT))
                 except Exception as e:
-                    logger.error(f"Error solving reCAPTCHA: {str(e)}")
-                    captcha_solve_time = time.time() - captcha_start_time
+                    logger.warning(f"Failed to measure page transfer: {str(e)}")
+                    resources = blocker.stats()
             
             # Extract all cookies from the current session
-            extracted_cookies = CaptchaAPI.get_all_cookies(driver)
+            with timed(stages, 'cookie_extract'):
+                extracted_cookies = CaptchaAPI.get_all_cookies(driver)
             
             total_time = time.time() - start_time
+            if not captcha_type:
+                outcome = 'no_captcha'
+            elif not captcha_found:
+                outcome = 'unsupported'
+            elif is_solved:
+                outcome = 'checkbox' if recaptcha_solver.outcome == 'checkbox' else 'audio'
+            else:
+                outcome = 'bot_detected' if recaptcha_solver.outcome == 'bot_detected' else 'failed'
+            metrics.record_solve(outcome, total_time, stages)
+            if profiles is not None:
+                profiles.record(url, captcha_type, detection['sitekey'], stages, outcome)
             
             result = {
-                'success': is_solved if captcha_found else True,  # True if no captcha found
+                'success': is_solved if captcha_type else True,  # True if no captcha found
                 'captcha_found': captcha_found,
+                'captcha_type': captcha_type,
+                'sitekey': detection['sitekey'],
                 'token': token,
                 'cookies': extracted_cookies,
+                'outcome': outcome,
                 'captcha_solve_time': round(captcha_solve_time, 2),
+                'stage_timings': stages,
+                'transcript_cached': recaptcha_solver.transcript_cached,
+                'attempts': recaptcha_solver.attempts,
+                'resources': resources,
+                'profiled': profiled,
+                'proxy': mask_proxy(proxy),
                 'total_time': round(total_time, 2),
                 'url': url,
                 'message': ('reCAPTCHA solved successfully' if is_solved 
-                           else 'No reCAPTCHA found on page' if not captcha_found 
+                           else 'No reCAPTCHA found on page' if not captcha_type
+                           else f'Unsupported captcha type: {captcha_type}' if not captcha_found
                            else 'Failed to solve reCAPTCHA')
             }
             
@@ -296,23 +772,277 @@ class CaptchaAPI:
                 except:
                     pass
             
+            total_time = time.time() - start_time
+            outcome = 'failed'
+            metrics.record_solve(outcome, total_time, stages)
             return {
                 'success': False,
                 'captcha_found': False,
                 'error': error_message,
                 'cookies': extracted_cookies,
-                'total_time': round(time.time() - start_time, 2),
+                'outcome': 'failed',
+                'stage_timings': stages,
+                'total_time': round(total_time, 2),
                 'url': url
             }
         
         finally:
-            if driver:
+            # Errors before a browser was obtained say nothing about the proxy
+            proxy_outcome = outcome if driver else 'no_browser'
+            if report is not None:
+                report['proxy_outcome'] = proxy_outcome
+            if health is not None:
+                health.record(proxy, proxy_outcome)
+            if blocker:
+                blocker.stop()
+            if context_pool and driver:
+                context_pool.release(driver)
+            elif keyed_pool and pooled:
+                keyed_pool.release(pooled, outcome)
+            elif pooled:
+                pool.release(pooled)
+            elif driver:
                 try:
                     driver.close()
                 except Exception as e:
                     logger.warning(f"Error closing driver: {str(e)}")
 
 
+# HTTP status of solves refused before a browser was used
+REJECTED_STATUS = {'circuit_open': 503, 'rate_limited': 429}
+
+
+def parse_solve_request(data: Any) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Validate a solve request payload.
+    
+    Args:
+        data: Decoded JSON body
+        
+    Returns:
+        Tuple of (keyword arguments for solve_captcha_on_page, error message);
+        exactly one of them is None
+    """
+    if not data or not isinstance(data, dict):
+        return None, 'No JSON data provided'
+    
+    # Validate required fields
+    url = data.get('url')
+    if not url:
+        return None, 'URL is required'
+    
+    # Validate cookies format if provided
+    cookies = data.get('cookies', [])
+    if cookies and not isinstance(cookies, list):
+        return None, 'Cookies must be a list of objects'
+    
+    # Validate the resource policy if provided
+    resource_policy = data.get('resource_policy')
+    try:
+        ResourcePolicy.from_request(resource_policy)
+    except ValueError as e:
+        return None, str(e)
+    
+    return {
+        'url': url,
+        'cookies': cookies,
+        'proxy': data.get('proxy'),
+        'user_agent': data.get('user_agent'),
+        'headless': data.get('headless', False),  # Default to visible mode
+        'resource_policy': resource_policy
+    }, None
+
+
+def parse_job_timeout(data: Dict[str, Any]) -> Tuple[Optional[float], Optional[str]]:
+    """Validate the optional "timeout" of a job request.
+    
+    Args:
+        data: Decoded JSON body, already accepted by parse_solve_request
+        
+    Returns:
+        Tuple of (timeout in seconds or None for the default, error message)
+    """
+    timeout = data.get('timeout')
+    if timeout is None:
+        return None, None
+    if isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or not 0 < timeout < float('inf'):
+        return None, 'Timeout must be a positive number of seconds'
+    return float(timeout), None
+
+
+def configure_solver(pool_size: int = 0, pool_max_uses: int = BrowserPool.DEFAULT_MAX_USES,
+                     pool_max_age: float = BrowserPool.DEFAULT_MAX_AGE, contexts: int = 0,
+                     keyed_pool: int = 0, proxy_breaker: bool = False, proxies: Optional[List[str]] = None,
+                     proxy_failures: int = ProxyHealth.DEFAULT_FAILURE_THRESHOLD,
+                     proxy_cooldown: float = ProxyHealth.DEFAULT_BASE_COOLDOWN,
+                     domain_rate: Optional[float] = None,
+                     domain_burst: int = RateScheduler.DEFAULT_DOMAIN_BURST,
+                     proxy_rate: float = RateScheduler.DEFAULT_PROXY_RATE,
+                     proxy_burst: int = RateScheduler.DEFAULT_PROXY_BURST,
+                     domain_limits: Optional[Dict[str, Tuple[float, int]]] = None,
+                     max_rate_wait: Optional[float] = None,
+                     recognizer: str = 'google', vosk_model: Optional[str] = None,
+                     recognizer_workers: Optional[int] = None,
+                     min_confidence: float = HedgedBackend.DEFAULT_MIN_CONFIDENCE,
+                     hedge_percentile: Optional[float] = None,
+                     recognizer_concurrency: Optional[int] = None, transcript_cache: int = 0,
+                     transcript_cache_path: Optional[str] = None, site_profiles: int = 0,
+                     site_profiles_path: Optional[str] = None,
+                     profile_min_samples: int = SiteProfiles.DEFAULT_MIN_SAMPLES,
+                     adaptive_timeouts: bool = False,
+                     timeout_percentile: float = TimeoutController.DEFAULT_PERCENTILE,
+                     timeout_margin: float = TimeoutController.DEFAULT_MARGIN,
+                     timeout_floor: float = TimeoutController.DEFAULT_FLOOR,
+                     timeout_ceiling: float = TimeoutController.DEFAULT_CEILING,
+                     challenge_retries: int = 0) -> None:
+    """Set up the browser pools, recognition backend, caches and limits of this process.
+    
+    Args:
+        pool_size: Warm browsers to keep (0 disables the pool)
+        pool_max_uses: Solves served by a pooled browser before it is recycled
+        pool_max_age: Seconds a pooled browser may live before it is recycled
+        contexts: Concurrent isolated contexts in one shared browser (0 disables)
+        keyed_pool: Browsers pooled per proxy and user agent (0 disables)
+        proxy_breaker: Open a circuit on proxies that keep getting bot-detected
+        proxies: Proxies to route requests without one through (enables the breaker)
+        proxy_failures: Consecutive failures that open a proxy's circuit
+        proxy_cooldown: Seconds a circuit stays open after its first trip
+        domain_rate: Solves per minute per target domain (None disables pacing)
+        domain_burst: Solves a domain may start back to back
+        proxy_rate: Solves per minute per proxy
+        proxy_burst: Solves a proxy may start back to back
+        domain_limits: (rate, burst) overrides per domain
+        max_rate_wait: Seconds a solve may wait for its turn (None: no limit)
+        recognizer: Backend name, or comma-separated names to race them
+        vosk_model: Vosk model directory, for the 'vosk' backend
+        recognizer_workers: Worker processes of offline backends
+        min_confidence: Confidence accepted from a single backend when racing several
+        hedge_percentile: Stagger raced backends by this latency percentile
+        recognizer_concurrency: Clips raced at once when racing several backends
+            (default: the browsers the pools can run at once)
+        transcript_cache: Transcripts kept in memory (0 disables the cache)
+        transcript_cache_path: SQLite file persisting the transcript cache
+        site_profiles: Target pages profiled in memory (0 disables profiles)
+        site_profiles_path: SQLite file persisting the site profiles
+        profile_min_samples: Solves of a page before its profile is used
+        adaptive_timeouts: Set solver wait deadlines from observed latencies
+        timeout_percentile: Percentile of observed durations a deadline covers
+        timeout_margin: Seconds added to the percentile
+        timeout_floor: Shortest adaptive deadline
+        timeout_ceiling: Longest adaptive deadline
+        challenge_retries: Fresh audio clips tried in the same browser after a rejected transcript
+    """
+    CaptchaAPI.challenge_retries = challenge_retries
+    names = recognizer.split(',')
+    backend_options = {'vosk': {'model_path': vosk_model, 'workers': recognizer_workers}}
+    if len(names) > 1:
+        CaptchaAPI.set_recognition_backend(
+            'hedged',
+            backends=[create_backend(name, **backend_options.get(name, {})) for name in names],
+            min_confidence=min_confidence,
+            hedge_percentile=hedge_percentile,
+            concurrency=(recognizer_concurrency or pool_size + contexts + keyed_pool
+                         or HedgedBackend.DEFAULT_CONCURRENCY)
+        )
+    elif names[0] != 'google':
+        CaptchaAPI.set_recognition_backend(names[0], **backend_options.get(names[0], {}))
+    if transcript_cache:
+        CaptchaAPI.enable_transcript_cache(max_entries=transcript_cache, path=transcript_cache_path)
+    if site_profiles:
+        CaptchaAPI.enable_site_profiles(max_entries=site_profiles, path=site_profiles_path,
+                                        min_samples=profile_min_samples)
+    if adaptive_timeouts:
+        CaptchaAPI.enable_adaptive_timeouts(percentile=timeout_percentile, margin=timeout_margin,
+                                            floor=timeout_floor, ceiling=timeout_ceiling)
+    if pool_size:
+        CaptchaAPI.enable_browser_pool(size=pool_size, max_uses=pool_max_uses, max_age=pool_max_age)
+    if contexts:
+        CaptchaAPI.enable_context_pool(max_contexts=contexts)
+    if keyed_pool:
+        CaptchaAPI.enable_keyed_pool(capacity=keyed_pool)
+    if proxy_breaker or proxies:
+        CaptchaAPI.enable_proxy_health(proxies=proxies, failure_threshold=proxy_failures,
+                                       base_cooldown=proxy_cooldown)
+    if domain_rate:
+        CaptchaAPI.enable_rate_scheduler(domain_rate=domain_rate, domain_burst=domain_burst,
+                                         proxy_rate=proxy_rate, proxy_burst=proxy_burst,
+                                         domain_limits=domain_limits, max_wait=max_rate_wait)
+
+
+def init_job_manager(workers: int = JobManager.DEFAULT_WORKERS,
+                     max_queue: int = JobManager.DEFAULT_MAX_QUEUE,
+                     job_timeout: float = JobManager.DEFAULT_JOB_TIMEOUT) -> JobManager:
+    """Create the worker pool used by the asynchronous job endpoints.
+    
+    Args:
+        workers: Number of solves executed concurrently
+        max_queue: Maximum number of jobs waiting for a worker
+        job_timeout: Seconds a job may take from submission to result
+        
+    Returns:
+        JobManager: The job manager
+    """
+    global job_manager
+    job_manager = JobManager(
+        handler=CaptchaAPI.solve_captcha_on_page,
+        workers=workers,
+        max_queue=max_queue,
+        job_timeout=job_timeout
+    )
+    logger.info(f"Job manager started with {workers} worker(s), queue size {max_queue}")
+    return job_manager
+
+
+def init_token_pool(fill_workers: int = TokenPool.DEFAULT_FILL_WORKERS,
+                    adaptive: bool = False) -> TokenPool:
+    """Create and start the pre-solved token pool.
+    
+    Args:
+        fill_workers: Maximum number of background solves running at once
+        adaptive: Size each target from forecast demand; registered depths become ceilings
+        
+    Returns:
+        TokenPool: The started token pool
+    """
+    global token_pool
+    if token_pool is not None:
+        token_pool.stop()
+    scheduler = None
+    if adaptive:
+        scheduler = PrefetchScheduler(token_lifetime=TokenPool.TOKEN_TTL - TokenPool.SAFETY_MARGIN)
+    token_pool = TokenPool(solver=CaptchaAPI.solve_captcha_on_page, fill_workers=fill_workers,
+                           scheduler=scheduler)
+    token_pool.start()
+    logger.info(f"Token pool started with {fill_workers} fill worker(s)"
+                f"{', adaptive depth' if adaptive else ''}")
+    return token_pool
+
+
+def get_token_pool() -> TokenPool:
+    """Return the token pool, creating one with default settings on first use."""
+    with _token_pool_lock:
+        return token_pool or init_token_pool()
+
+
+def take_pooled_token(params: Dict[str, Any], sitekey: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Return a pre-solved result for a request, or None on a miss.
+    
+    Only requests without their own session (cookies, proxy or user agent)
+    can be served from the pool, since pooled tokens are minted in a fresh one.
+    """
+    if token_pool is None or params['cookies'] or params['proxy'] or params['user_agent']:
+        return None
+    result = token_pool.take(params['url'], sitekey=sitekey)
+    if result is not None:
+        metrics.record_solve('token_pool', 0.0, {})
+    return result
+
+
+def get_job_manager() -> JobManager:
+    """Return the job manager, creating one with default settings on first use."""
+    with _job_manager_lock:
+        return job_manager or init_job_manager()
+
+
 @app.route('/solve-captcha', methods=['POST'])
 def solve_captcha_endpoint():
     """API endpoint to solve reCAPTCHA on a given page.
@@ -335,45 +1065,29 @@ def solve_captcha_endpoint():
     }
     """
     try:
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({
-                'success': False,
-                'error': 'No JSON data provided'
-            }), 400
-        
-        # Validate required fields
-        url = data.get('url')
-        if not url:
+        start_time = time.time()
+        data = request.get_json(silent=True)
+        params, error = parse_solve_request(data)
+        if error:
             return jsonify({
                 'success': False,
-                'error': 'URL is required'
+                'error': error
             }), 400
         
-        # Extract optional parameters
-        cookies = data.get('cookies', [])
-        proxy = data.get('proxy')
-        user_agent = data.get('user_agent')
-        headless = data.get('headless', False)  # Default to visible mode
-        
-        # Validate cookies format if provided
-        if cookies and not isinstance(cookies, list):
-            return jsonify({
-                'success': False,
-                'error': 'Cookies must be a list of objects'
-            }), 400
+        # Serve a pre-solved token when the pool has one in stock
+        pooled = take_pooled_token(params, sitekey=data.get('sitekey'))
+        if pooled:
+            pooled['token_pool_hit'] = True
+            pooled['total_time'] = round(time.time() - start_time, 3)
+            return jsonify(pooled), 200
         
         # Solve the captcha
-        result = CaptchaAPI.solve_captcha_on_page(
-            url=url,
-            cookies=cookies,
-            proxy=proxy,
-            user_agent=user_agent,
-            headless=headless
-        )
+        result = CaptchaAPI.solve_captcha_on_page(**params)
         
         # Return appropriate HTTP status code
+        if result.get('outcome') in REJECTED_STATUS:
+            return (jsonify(result), REJECTED_STATUS[result['outcome']],
+                    {'Retry-After': str(int(result['retry_after']) + 1)})
         status_code = 200 if result.get('success') else 500
         return jsonify(result), status_code
         
@@ -385,14 +1099,201 @@ def solve_captcha_endpoint():
         }), 500
 
 
+@app.route('/solve-captcha/jobs', methods=['POST'])
+def submit_job_endpoint():
+    """Queue a solve and return its job id immediately.
+    
+    Accepts the same JSON payload as POST /solve-captcha plus an optional
+    positive "timeout" in seconds. Poll GET /solve-captcha/jobs/<job_id> for
+    the result.
+    """
+    try:
+        data = request.get_json(silent=True)
+        params, error = parse_solve_request(data)
+        if not error:
+            timeout, error = parse_job_timeout(data)
+        if error:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 400
+        
+        job = get_job_manager().submit(params, timeout=timeout)
+        return jsonify({'success': True, **job}), 202
+        
+    except QueueFullError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'queue_depth': job_manager.stats()['queue_depth']
+        }), 503
+    except Exception as e:
+        logger.error(f"Endpoint error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Internal server error: {str(e)}'
+        }), 500
+
+
+@app.route('/solve-captcha/jobs/<job_id>', methods=['GET'])
+def get_job_endpoint(job_id: str):
+    """Return the status of a queued solve, and its result once finished."""
+    job = job_manager.get(job_id) if job_manager else None
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Job not found'
+        }), 404
+    return jsonify({'success': True, **job})
+
+
+@app.route('/solve-captcha/batch', methods=['POST'])
+def solve_batch_endpoint():
+    """Solve several pages concurrently and stream results as NDJSON.
+    
+    Expected JSON payload:
+    {
+        "requests": [
+            {"url": "https://example.com/a", "cookies": [...], "proxy": "...", "user_agent": "..."},
+            {"url": "https://example.com/b"}
+        ],
+        "concurrency": 4
+    }
+    
+    Each line of the response is one JSON result carrying the "index" of its
+    request, written as soon as that solve finishes (completion order).
+    """
+    data = request.get_json(silent=True)
+    specs = data.get('requests') if isinstance(data, dict) else None
+    if not specs or not isinstance(specs, list):
+        return jsonify({
+            'success': False,
+            'error': 'requests must be a non-empty list of solve requests'
+        }), 400
+    if len(specs) > BATCH_MAX_SIZE:
+        return jsonify({
+            'success': False,
+            'error': f'A batch may contain at most {BATCH_MAX_SIZE} requests'
+        }), 400
+    
+    try:
+        concurrency = int(data.get('concurrency', BATCH_MAX_CONCURRENCY))
+    except (TypeError, ValueError):
+        concurrency = BATCH_MAX_CONCURRENCY
+    concurrency = max(1, min(concurrency, BATCH_MAX_CONCURRENCY, len(specs)))
+    
+    def generate():
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='batch-solve')
+        try:
+            futures = {}
+            for index, spec in enumerate(specs):
+                params, error = parse_solve_request(spec)
+                if error:
+                    yield json.dumps({'index': index, 'success': False, 'error': error}) + '\n'
+                    continue
+                pooled = take_pooled_token(params, sitekey=spec.get('sitekey'))
+                if pooled:
+                    yield json.dumps({'index': index, 'token_pool_hit': True, **pooled}) + '\n'
+                    continue
+                futures[executor.submit(CaptchaAPI.solve_captcha_on_page, **params)] = index
+            
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'success': False, 'error': f'Internal server error: {str(e)}'}
+                yield json.dumps({'index': futures[future], **result}) + '\n'
+        finally:
+            # Client gone or batch done: drop solves that have not started yet
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
+
+@app.route('/token-pool', methods=['GET'])
+def token_pool_stats_endpoint():
+    """Token pool stock levels and hit/miss/expiry counters per target."""
+    if token_pool is None:
+        return jsonify({
+            'success': False,
+            'error': 'Token pool is not enabled'
+        }), 404
+    return jsonify({'success': True, **token_pool.stats()})
+
+
+@app.route('/token-pool/targets', methods=['POST'])
+def token_pool_register_endpoint():
+    """Keep a target page stocked with pre-solved tokens.
+    
+    Expected JSON payload:
+    {
+        "url": "https://example.com/page-with-captcha",
+        "depth": 2,
+        "sitekey": "optional sitekey"
+    }
+    A depth of 0 stops stocking the target.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data.get('url'):
+        return jsonify({
+            'success': False,
+            'error': 'URL is required'
+        }), 400
+    
+    try:
+        depth = int(data.get('depth', TokenPool.DEFAULT_DEPTH))
+    except (TypeError, ValueError):
+        return jsonify({
+            'success': False,
+            'error': 'depth must be an integer'
+        }), 400
+    
+    pool = get_token_pool()
+    if depth <= 0:
+        pool.unregister(data['url'], sitekey=data.get('sitekey'))
+    else:
+        pool.register(data['url'], depth=depth, sitekey=data.get('sitekey'))
+    return jsonify({'success': True, 'url': data['url'], 'depth': max(depth, 0)})
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Per-stage latency histograms and outcome counters in Prometheus text format."""
+    return Response(metrics.REGISTRY.render(), content_type=metrics.Registry.CONTENT_TYPE)
+
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
-    return jsonify({
+    health = {
         'status': 'healthy',
         'service': 'reCAPTCHA Solver API',
         'timestamp': time.time()
-    })
+    }
+    if CaptchaAPI.browser_pool is not None:
+        health['browser_pool'] = CaptchaAPI.browser_pool.stats()
+    if CaptchaAPI.context_pool is not None:
+        health['context_pool'] = CaptchaAPI.context_pool.stats()
+    if CaptchaAPI.keyed_pool is not None:
+        health['keyed_pool'] = CaptchaAPI.keyed_pool.stats()
+    if CaptchaAPI.proxy_health is not None:
+        health['proxy_health'] = CaptchaAPI.proxy_health.stats()
+    if CaptchaAPI.rate_scheduler is not None:
+        health['rate_scheduler'] = CaptchaAPI.rate_scheduler.stats()
+    if CaptchaAPI.recognition_backend is not None:
+        health['recognition'] = CaptchaAPI.recognition_backend.stats()
+    if CaptchaAPI.transcript_cache is not None:
+        health['transcript_cache'] = CaptchaAPI.transcript_cache.stats()
+    if CaptchaAPI.site_profiles is not None:
+        health['site_profiles'] = CaptchaAPI.site_profiles.stats()
+    if CaptchaAPI.timeout_controller is not None:
+        health['timeouts'] = CaptchaAPI.timeout_controller.stats()
+    if job_manager is not None:
+        health['jobs'] = job_manager.stats()
+    if token_pool is not None:
+        pool_stats = token_pool.stats()
+        health['token_pool'] = {key: pool_stats[key] for key in ('hits', 'misses', 'expired')}
+    return jsonify(health)
 
 
 @app.route('/', methods=['GET'])
@@ -404,6 +1305,12 @@ def api_info():
         'description': 'API for solving reCAPTCHA challenges using audio recognition',
         'endpoints': {
             'POST /solve-captcha': 'Solve reCAPTCHA on a given page',
+            'POST /solve-captcha/jobs': 'Queue a solve and return a job id immediately',
+            'GET /solve-captcha/jobs/<job_id>': 'Job status and result',
+            'POST /solve-captcha/batch': 'Solve several pages concurrently, streaming NDJSON results',
+            'POST /token-pool/targets': 'Keep a page stocked with pre-solved tokens',
+            'GET /token-pool': 'Token pool stock and hit/miss/expiry counters',
+            'GET /metrics': 'Prometheus metrics: per-stage latency histograms and outcome counters',
             'GET /health': 'Health check',
             'GET /': 'API information'
         },
@@ -433,7 +1340,9 @@ def api_info():
                     'httpOnly': True
                 }
             ],
+            'outcome': 'audio',
             'captcha_solve_time': 15.32,
+            'stage_timings': {'browser_launch': 1.21, 'navigation': 1.87, 'recognition': 2.4},
             'total_time': 18.45,
             'url': 'https://app2.bps.gub.uy/blanqueocontrasena-frontend/blanqueo',
             'message': 'reCAPTCHA solved successfully'
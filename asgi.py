@@ -0,0 +1,551 @@
+import asyncio
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import metrics
+from api import REJECTED_STATUS, CaptchaAPI, configure_solver, parse_solve_request
+from proxy_health import CircuitOpenError
+from rate_scheduler import RateLimitedError
+
+logger = logging.getLogger(__name__)
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# configure_solver arguments applied in the server process rather than in the
+# workers: limits and learnt deadlines must be shared by every solve
+SHARED_SETTINGS = ('proxy_breaker', 'proxies', 'proxy_failures', 'proxy_cooldown', 'domain_rate',
+                   'domain_burst', 'proxy_rate', 'proxy_burst', 'domain_limits', 'max_rate_wait',
+                   'adaptive_timeouts', 'timeout_percentile', 'timeout_margin', 'timeout_floor',
+                   'timeout_ceiling')
+
+
+def _init_worker(settings: Dict[str, Any]) -> None:
+    """Give each worker process its own browser pools and recognition backend."""
+    logging.basicConfig(level=logging.INFO)
+    configure_solver(**settings)
+
+
+def _shutdown_worker() -> None:
+    """Quit the browsers a worker process launched before it exits."""
+    CaptchaAPI.shutdown_pools()
+
+
+def _stop_worker(signum: int, frame: Any) -> None:
+    """SIGTERM handler of a worker: unwind so its finalizer runs."""
+    raise SystemExit(0)
+
+
+def _solve_in_worker(params: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Run one blocking solve inside a worker process.
+
+    Returns:
+        Tuple of (solve result, report for the server process's breaker and
+        timeout controller; see CaptchaAPI.solve_captcha_on_page)
+    """
+    report: Dict[str, Any] = {}
+    result = CaptchaAPI.solve_captcha_on_page(**params, report=report)
+    return result, report
+
+
+def _worker_main(tasks: Any, results: Any, threads: int, initializer: Callable[..., None],
+                 initargs: Tuple[Any, ...], finalizer: Optional[Callable[[], None]]) -> None:
+    """Worker process loop: run tasks on ``threads`` threads until told to stop.
+
+    ``finalizer`` runs on the way out, after a stop message or a terminate().
+    """
+    signal.signal(signal.SIGTERM, _stop_worker)
+    if hasattr(os, 'setpgrp'):
+        # Own process group, with the browsers it launches: if the process
+        # dies, the pool can still stop them
+        os.setpgrp()
+
+    def run(task_id: int, fn: Callable[..., Any], args: Tuple[Any, ...]) -> None:
+        try:
+            results.put((task_id, True, fn(*args)))
+        except BaseException as e:
+            results.put((task_id, False, f"{type(e).__name__}: {str(e)}"))
+
+    pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='solve')
+    try:
+        initializer(*initargs)
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            pool.submit(run, *task)
+        pool.shutdown(wait=True)
+    finally:
+        # Terminated: solves still running fail once their browsers are gone
+        pool.shutdown(wait=False, cancel_futures=True)
+        if finalizer is not None:
+            finalizer()
+
+
+class SolverProcessPool(Executor):
+    """Worker processes that each run several solves at once.
+
+    ``concurrent.futures.ProcessPoolExecutor`` hands a process one call at a
+    time, so the browsers a worker keeps warm would serve a single solve.
+    Here every process runs up to ``threads`` calls on its own threads,
+    sharing its pools between them. Tasks go to the process with the fewest
+    in flight.
+
+    When a process dies, its calls fail with BrokenProcessPool and the pool
+    refuses new work, like ProcessPoolExecutor; calls running in the other
+    processes still finish. Replace a broken pool with a new one.
+
+    Processes quit their browsers through ``finalizer`` when they are
+    stopped or terminated. Each runs in its own process group, so the
+    browsers of a process that died are stopped along with the group.
+    """
+
+    # Seconds between checks that the worker processes are alive
+    WATCH_INTERVAL = 0.5
+
+    def __init__(self, processes: int, threads: int, initializer: Callable[..., None],
+                 initargs: Tuple[Any, ...] = (), finalizer: Optional[Callable[[], None]] = None) -> None:
+        """Start the worker processes.
+
+        Args:
+            processes: Worker processes
+            threads: Calls each process runs at once
+            initializer: Module-level function run once in every process
+            initargs: Arguments of ``initializer``
+            finalizer: Module-level function run in every process before it
+                exits, also when the pool terminates it
+        """
+        # Spawned rather than forked: the server process runs threads whose locks
+        # a forked child would inherit
+        context = multiprocessing.get_context('spawn')
+        self.processes = processes
+        self.threads = threads
+
+        self._results = context.Queue()
+        self._workers: List[Dict[str, Any]] = []
+        self._futures: Dict[int, Tuple[Future, Dict[str, Any]]] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._broken = False
+        self._closed = False
+
+        for _ in range(processes):
+            tasks = context.Queue()
+            process = context.Process(target=_worker_main, daemon=True,
+                                      args=(tasks, self._results, threads, initializer, initargs, finalizer))
+            process.start()
+            self._workers.append({'process': process, 'tasks': tasks, 'in_flight': set()})
+
+        self._collector = threading.Thread(target=self._collect, name='solver-results', daemon=True)
+        self._collector.start()
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """Run ``fn(*args)`` in the least busy worker process.
+
+        Raises:
+            BrokenProcessPool: If a worker process died
+            RuntimeError: After shutdown
+        """
+        if kwargs:
+            raise TypeError("SolverProcessPool.submit takes positional arguments only")
+        future: Future = Future()
+        with self._lock:
+            if self._broken:
+                raise BrokenProcessPool("A solver worker process terminated abruptly")
+            if self._closed:
+                raise RuntimeError("Cannot submit to a pool after shutdown")
+            worker = min(self._workers, key=lambda candidate: len(candidate['in_flight']))
+            task_id = next(self._ids)
+            worker['in_flight'].add(task_id)
+            self._futures[task_id] = (future, worker)
+        future.set_running_or_notify_cancel()
+        worker['tasks'].put((task_id, fn, args))
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        """Stop the worker processes once their running calls are done.
+
+        Args:
+            wait: Block until the processes have exited
+            cancel_futures: Fail the calls still in flight instead of waiting for them
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            orphans = list(self._futures.values()) if cancel_futures else []
+            if cancel_futures:
+                self._futures.clear()
+                for worker in self._workers:
+                    worker['in_flight'].clear()
+        for worker in self._workers:
+            try:
+                worker['tasks'].put(None)
+            except Exception:
+                pass
+        for future, _ in orphans:
+            if not future.done():
+                future.set_exception(RuntimeError("Solver pool shut down"))
+        if cancel_futures:
+            for worker in self._workers:
+                worker['process'].terminate()
+        if wait:
+            for worker in self._workers:
+                worker['process'].join()
+
+    def _collect(self) -> None:
+        """Resolve futures from worker results and detect dead processes."""
+        while True:
+            try:
+                task_id, ok, value = self._results.get(timeout=self.WATCH_INTERVAL)
+            except queue.Empty:
+                if self._check_workers():
+                    return
+                continue
+            except (EOFError, OSError):
+                return
+            with self._lock:
+                entry = self._futures.pop(task_id, None)
+                if entry is not None:
+                    entry[1]['in_flight'].discard(task_id)
+            if entry is None or entry[0].done():
+                continue
+            if ok:
+                entry[0].set_result(value)
+            else:
+                entry[0].set_exception(Exception(value))
+
+    def _check_workers(self) -> bool:
+        """Fail the calls of dead processes. Returns True once the collector can stop."""
+        failed = []
+        with self._lock:
+            for worker in self._workers:
+                if worker['process'].is_alive():
+                    continue
+                if not worker.get('reaped'):
+                    worker['reaped'] = True
+                    self._stop_group(worker['process'])
+                if not self._closed:
+                    self._broken = True
+                failed.extend(self._futures.pop(task_id)[0] for task_id in worker['in_flight'])
+                worker['in_flight'].clear()
+            finished = self._closed and not self._futures
+        for future in failed:
+            if not future.done():
+                future.set_exception(BrokenProcessPool("A solver worker process terminated abruptly"))
+        return finished
+
+    @staticmethod
+    def _stop_group(process: Any) -> None:
+        """Stop what is left of a dead worker's process group, i.e. its browsers."""
+        if not hasattr(os, 'killpg') or process.pid is None:
+            return
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+class SolverApp:
+    """ASGI application serving the solve API on an asyncio event loop.
+
+    Requests are coroutines; each blocking solve is dispatched to worker
+    processes, every one holding its own browsers (configured with the same
+    settings as the Flask server) and running up to ``solves_per_worker``
+    solves at once on them. A client waiting for its solve therefore costs a
+    coroutine rather than an OS thread, also while it waits for its turn
+    under the rate limits. Beyond ``max_pending`` queued or
+    running solves new requests are refused with HTTP 503.
+
+    The proxy circuit breaker, the rate scheduler and the adaptive timeouts
+    (SHARED_SETTINGS) live in this process, so their limits hold across all
+    workers: a solve is admitted here, then sent to a worker with its proxy
+    and wait deadlines, and its outcome is recorded here when it returns.
+
+    Serve it with any ASGI server, e.g. ``python start_api.py --asgi``.
+    """
+
+    # Defaults
+    DEFAULT_MAX_PENDING = 1000
+    DEFAULT_SOLVES_PER_WORKER = 2
+    MAX_BODY_SIZE = 1024 * 1024
+    # Retry-After seconds suggested when the server is saturated or restarting its workers
+    BUSY_RETRY_AFTER = 1
+
+    def __init__(self, workers: Optional[int] = None, worker_settings: Optional[Dict[str, Any]] = None,
+                 max_pending: int = DEFAULT_MAX_PENDING, solves_per_worker: Optional[int] = None,
+                 executor_factory: Optional[Callable[[], Executor]] = None,
+                 solve: Callable[[Dict[str, Any]], Tuple[Dict[str, Any], Dict[str, Any]]] = _solve_in_worker
+                 ) -> None:
+        """Configure the application; the executor is started on ASGI lifespan startup.
+
+        Args:
+            workers: Solver worker processes (default: CPU count)
+            worker_settings: Keyword arguments for api.configure_solver; SHARED_SETTINGS
+                are applied in this process, the rest in every worker
+            max_pending: Solves allowed to queue or run before answering 503
+            solves_per_worker: Solves a worker runs at once (default: the browsers
+                its pools hold, or DEFAULT_SOLVES_PER_WORKER without pools)
+            executor_factory: Builds the executor, overridable for tests
+            solve: Module-level function performing one solve in the executor,
+                returning (result, report) like _solve_in_worker
+        """
+        settings = worker_settings or {}
+        self.workers = workers or os.cpu_count() or 1
+        self.shared_settings = {key: value for key, value in settings.items() if key in SHARED_SETTINGS}
+        self.worker_settings = {key: value for key, value in settings.items() if key not in SHARED_SETTINGS}
+        self.max_pending = max_pending
+        self.solves_per_worker = solves_per_worker or (
+            sum(settings.get(key) or 0 for key in ('pool_size', 'contexts', 'keyed_pool'))
+            or self.DEFAULT_SOLVES_PER_WORKER)
+        self.executor_factory = executor_factory or self._process_pool
+        self.solve = solve
+
+        self.executor: Optional[Executor] = None
+        self.pending = 0
+        self.started_at = time.time()
+        self._configured = False
+        self._routes: Dict[Tuple[str, str], Callable[[bytes], Awaitable[Tuple[Any, ...]]]] = {
+            ('GET', '/'): self.api_info,
+            ('GET', '/health'): self.health,
+            ('GET', '/metrics'): self.metrics,
+            ('POST', '/solve-captcha'): self.solve_captcha
+        }
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        handler = self._routes.get((scope['method'], scope['path']))
+        if handler is None:
+            allowed = any(path == scope['path'] for _, path in self._routes)
+            status = 405 if allowed else 404
+            await self._send_json(send, status, {'success': False, 'error': 'Method not allowed'
+                                                 if allowed else 'Not found'})
+            return
+
+        body = await self._read_body(receive)
+        if body is None:
+            await self._send_json(send, 413, {'success': False, 'error': 'Request body too large'})
+            return
+        headers: Dict[str, str] = {}
+        try:
+            status, payload, *extra = await handler(body)
+            if extra:
+                headers = extra[0]
+        except Exception as e:
+            logger.error(f"Endpoint error: {str(e)}")
+            status, payload = 500, {'success': False, 'error': f'Internal server error: {str(e)}'}
+
+        if isinstance(payload, str):
+            await self._send(send, status, payload.encode(), metrics.Registry.CONTENT_TYPE, headers)
+        else:
+            await self._send_json(send, status, payload, headers)
+
+    def start(self) -> None:
+        """Set up the shared limits and start the solver executor."""
+        if not self._configured:
+            self._configured = True
+            if self.shared_settings:
+                configure_solver(**self.shared_settings)
+        if self.executor is None:
+            self.executor = self.executor_factory()
+            logger.info(f"Solver executor started with {self.workers} worker(s), "
+                        f"{self.solves_per_worker} solve(s) each")
+
+    def shutdown(self) -> None:
+        """Stop the solver executor; running solves are cancelled."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def solve_captcha(self, body: bytes) -> Tuple[int, Dict[str, Any], Dict[str, str]]:
+        try:
+            data = json.loads(body) if body else None
+        except ValueError:
+            data = None
+        params, error = parse_solve_request(data)
+        if error:
+            return 400, {'success': False, 'error': error}, {}
+        busy = {'Retry-After': str(self.BUSY_RETRY_AFTER)}
+        if self.pending >= self.max_pending:
+            return 503, {'success': False, 'error': 'Too many pending solves, retry later'}, busy
+
+        self.start()
+        self.pending += 1
+        try:
+            result = await self._solve(params)
+        except BrokenProcessPool:
+            return 503, {'success': False, 'error': 'A solver worker crashed; workers are restarting, retry later',
+                         'outcome': 'failed', 'url': params['url']}, busy
+        finally:
+            self.pending -= 1
+
+        # Metrics recorded inside a worker process stay there; export them here
+        metrics.record_solve(result.get('outcome', 'failed'), result.get('total_time', 0.0),
+                             result.get('stage_timings', {}))
+        if result.get('outcome') in REJECTED_STATUS:
+            return (REJECTED_STATUS[result['outcome']], result,
+                    {'Retry-After': str(int(result['retry_after']) + 1)})
+        return (200 if result.get('success') else 500), result, {}
+
+    async def _solve(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Admit a solve here, run it in a worker and record its outcome here."""
+        loop = asyncio.get_running_loop()
+        start_time = time.time()
+        stages: Dict[str, float] = {}
+        try:
+            proxy = await CaptchaAPI.aadmit_request(params['url'], params['proxy'], stages)
+        except (CircuitOpenError, RateLimitedError) as e:
+            logger.warning(str(e))
+            return CaptchaAPI.rejected_result(params['url'], e, stages, time.time() - start_time)
+
+        health = CaptchaAPI.proxy_health
+        controller = CaptchaAPI.timeout_controller
+        params = {**params, 'proxy': proxy,
+                  'timeouts': controller.timeouts() if controller is not None else None}
+        proxy_outcome = 'no_browser'
+        executor = self.executor
+        try:
+            result, report = await loop.run_in_executor(executor, self.solve, params)
+            proxy_outcome = report.get('proxy_outcome', proxy_outcome)
+        except BrokenProcessPool:
+            self._restart(executor)
+            raise
+        finally:
+            if health is not None:
+                health.record(proxy, proxy_outcome)
+
+        if controller is not None:
+            for wait in report.get('waits', []):
+                controller.record(wait['timings'], wait['expired'])
+        if stages:
+            result['stage_timings'] = {**stages, **result.get('stage_timings', {})}
+            result['total_time'] = round(result.get('total_time', 0.0) + stages.get('rate_limit', 0.0), 2)
+        return result
+
+    async def health(self, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        return 200, {
+            'status': 'healthy',
+            'service': 'reCAPTCHA Solver API',
+            'timestamp': time.time(),
+            'server': 'asgi',
+            'solver': {
+                'workers': self.workers,
+                'solves_per_worker': self.solves_per_worker,
+                'pending': self.pending,
+                'max_pending': self.max_pending,
+                'started': self.executor is not None
+            },
+            **({'proxy_health': CaptchaAPI.proxy_health.stats()} if CaptchaAPI.proxy_health else {}),
+            **({'rate_scheduler': CaptchaAPI.rate_scheduler.stats()} if CaptchaAPI.rate_scheduler else {}),
+            **({'timeouts': CaptchaAPI.timeout_controller.stats()} if CaptchaAPI.timeout_controller else {})
+        }
+
+    async def metrics(self, body: bytes) -> Tuple[int, str]:
+        return 200, metrics.REGISTRY.render()
+
+    async def api_info(self, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        return 200, {
+            'name': 'reCAPTCHA Solver API',
+            'version': '1.0.0',
+            'description': 'API for solving reCAPTCHA challenges using audio recognition (ASGI server)',
+            'endpoints': {
+                'POST /solve-captcha': 'Solve reCAPTCHA on a given page',
+                'GET /metrics': 'Prometheus metrics: per-stage latency histograms and outcome counters',
+                'GET /health': 'Health check',
+                'GET /': 'API information'
+            }
+        }
+
+    def _restart(self, broken: Executor) -> None:
+        """Replace an executor that lost a worker process, once per breakage."""
+        if self.executor is not broken:
+            return
+        logger.error("A solver worker process died; restarting the worker pool")
+        self.executor = None
+        broken.shutdown(wait=False)
+        self.start()
+
+    def _process_pool(self) -> Executor:
+        return SolverProcessPool(self.workers, self.solves_per_worker, _init_worker, (self.worker_settings,),
+                                 finalizer=_shutdown_worker)
+
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _read_body(self, receive: Receive) -> Optional[bytes]:
+        """Read the request body, or None once it exceeds MAX_BODY_SIZE."""
+        chunks: List[bytes] = []
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > self.MAX_BODY_SIZE:
+                return None
+            chunks.append(chunk)
+            if not message.get('more_body'):
+                break
+        return b''.join(chunks)
+
+    async def _send_json(self, send: Send, status: int, payload: Dict[str, Any],
+                         headers: Optional[Dict[str, str]] = None) -> None:
+        await self._send(send, status, json.dumps(payload).encode(), 'application/json', headers)
+
+    async def _send(self, send: Send, status: int, body: bytes, content_type: str,
+                    headers: Optional[Dict[str, str]] = None) -> None:
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', content_type.encode()),
+                        (b'content-length', str(len(body)).encode()),
+                        *((name.lower().encode(), value.encode()) for name, value in (headers or {}).items())]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+
+def create_app(workers: Optional[int] = None, max_pending: int = SolverApp.DEFAULT_MAX_PENDING,
+               solves_per_worker: Optional[int] = None, **worker_settings: Any) -> SolverApp:
+    """Build the ASGI application.
+
+    Args:
+        workers: Solver worker processes (default: CPU count)
+        max_pending: Solves allowed to queue or run before answering 503
+        solves_per_worker: Solves a worker runs at once (default: its pooled browsers)
+        **worker_settings: api.configure_solver arguments; limits are applied
+            in the server process, everything else in every worker
+
+    Returns:
+        SolverApp: The ASGI application
+    """
+    return SolverApp(workers=workers, worker_settings=worker_settings, max_pending=max_pending,
+                     solves_per_worker=solves_per_worker)
+
+
+# Default application for ASGI servers: uvicorn asgi:app
+app = create_app()
@@ -0,0 +1,179 @@
+import io
+import logging
+import math
+import urllib.request
+from typing import Tuple
+
+import speech_recognition
+
+# In-process decoders, tried in order; pydub (one ffmpeg process per clip) is the last resort
+try:
+    import av
+except ImportError:
+    av = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import soundfile
+except ImportError:
+    soundfile = None
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_TIMEOUT = 15
+SAMPLE_WIDTH = 2  # 16-bit PCM
+
+# Preprocessing before recognition
+TARGET_RATE = 16000        # what speech recognisers work at internally
+RESAMPLE_BLOCK = 64        # FFT length granularity, in multiples of the rate ratio
+SILENCE_FRAME = 0.01       # seconds per frame when detecting silence
+SILENCE_THRESHOLD = 0.02   # frame RMS relative to the loudest frame
+SILENCE_PADDING = 0.15     # seconds of context kept around the speech
+TARGET_RMS = 0.1           # loudness of the speech, relative to full scale
+PEAK_LIMIT = 0.95
+
+
+def fetch_audio(url: str, timeout: float = DOWNLOAD_TIMEOUT) -> bytes:
+    """Download the challenge audio into memory.
+
+    Args:
+        url: URL of the audio file
+        timeout: Seconds before the download is abandoned
+
+    Returns:
+        bytes: The encoded audio (MP3 for reCAPTCHA)
+    """
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.read()
+
+
+def decode_audio(data: bytes) -> Tuple[bytes, int]:
+    """Decode encoded audio to mono 16-bit little-endian PCM without touching disk.
+
+    Args:
+        data: Encoded audio bytes
+
+    Returns:
+        Tuple of (PCM bytes, sample rate)
+    """
+    if av is not None:
+        return _decode_with_av(data)
+    if soundfile is not None and numpy is not None:
+        try:
+            return _decode_with_soundfile(data)
+        except Exception as e:
+            logger.warning(f"soundfile could not decode audio, falling back to pydub: {str(e)}")
+    return _decode_with_pydub(data)
+
+
+def to_audio_data(pcm: bytes, sample_rate: int) -> speech_recognition.AudioData:
+    """Wrap mono 16-bit PCM in the object speech_recognition recognisers accept."""
+    return speech_recognition.AudioData(pcm, sample_rate, SAMPLE_WIDTH)
+
+
+def preprocess(pcm: bytes, sample_rate: int, target_rate: int = TARGET_RATE) -> Tuple[bytes, int]:
+    """Shrink and clean a decoded clip before recognition.
+
+    Trims leading and trailing silence, resamples to ``target_rate`` and
+    normalises the loudness of what is left, all as vectorised NumPy
+    operations. The recogniser then receives a smaller payload (less upload,
+    less decoding on its side) with the speech at a consistent level.
+
+    Args:
+        pcm: Mono 16-bit little-endian PCM
+        sample_rate: Sample rate of ``pcm``
+        target_rate: Sample rate of the result
+
+    Returns:
+        Tuple of (PCM bytes, sample rate); unchanged when numpy is not installed
+    """
+    if numpy is None or not pcm:
+        return pcm, sample_rate
+
+    samples = numpy.frombuffer(pcm, dtype='<i2').astype(numpy.float32) / 32768.0
+    # Trim first so only the speech is resampled
+    samples = _trim_silence(samples, sample_rate)
+    if sample_rate != target_rate:
+        samples = _resample(samples, sample_rate, target_rate)
+        sample_rate = target_rate
+
+    rms = float(numpy.sqrt(numpy.mean(samples ** 2))) if len(samples) else 0.0
+    if rms > 0:
+        peak = float(numpy.abs(samples).max())
+        samples = samples * min(TARGET_RMS / rms, PEAK_LIMIT / peak)
+
+    pcm = numpy.clip(samples * 32768.0, -32768, 32767).astype('<i2').tobytes()
+    return pcm, sample_rate
+
+
+def load_audio(url: str) -> speech_recognition.AudioData:
+    """Fetch, decode and preprocess a challenge clip straight into an AudioData object."""
+    pcm, sample_rate = preprocess(*decode_audio(fetch_audio(url)))
+    return to_audio_data(pcm, sample_rate)
+
+
+def _resample(samples: 'numpy.ndarray', rate: int, target_rate: int) -> 'numpy.ndarray':
+    """Band-limited resampling in the frequency domain.
+
+    The spectrum is cut (or zero-extended) at the target Nyquist frequency,
+    which is an ideal anti-aliasing filter. The FFT length is padded to a
+    multiple of the rate ratio so both transforms have small prime factors.
+    """
+    step = rate // math.gcd(rate, target_rate) * RESAMPLE_BLOCK
+    size = -(-len(samples) // step) * step
+    resampled_size = size * target_rate // rate
+    spectrum = numpy.fft.rfft(samples, size)
+    resampled = numpy.fft.irfft(spectrum[:resampled_size // 2 + 1], resampled_size)
+    count = len(samples) * target_rate // rate
+    return (resampled[:count] * (resampled_size / size)).astype(numpy.float32)
+
+
+def _trim_silence(samples: 'numpy.ndarray', rate: int) -> 'numpy.ndarray':
+    """Drop leading and trailing frames much quieter than the loudest frame."""
+    frame = max(1, int(rate * SILENCE_FRAME))
+    count = len(samples) // frame
+    if count == 0:
+        return samples
+    energy = numpy.sqrt((samples[:count * frame].reshape(count, frame) ** 2).mean(axis=1))
+    voiced = numpy.flatnonzero(energy >= energy.max() * SILENCE_THRESHOLD)
+    if len(voiced) == 0:
+        return samples
+    padding = int(rate * SILENCE_PADDING)
+    start = max(0, voiced[0] * frame - padding)
+    end = min(len(samples), (voiced[-1] + 1) * frame + padding)
+    return samples[start:end]
+
+
+def _decode_with_av(data: bytes) -> Tuple[bytes, int]:
+    """Decode with PyAV (libavcodec linked in-process)."""
+    pcm = bytearray()
+    with av.open(io.BytesIO(data)) as container:
+        stream = container.streams.audio[0]
+        sample_rate = stream.rate
+        resampler = av.AudioResampler(format='s16', layout='mono', rate=sample_rate)
+        for frame in container.decode(stream):
+            for converted in resampler.resample(frame):
+                pcm += bytes(converted.planes[0])[:converted.samples * SAMPLE_WIDTH]
+        for converted in resampler.resample(None):
+            pcm += bytes(converted.planes[0])[:converted.samples * SAMPLE_WIDTH]
+    return bytes(pcm), sample_rate
+
+
+def _decode_with_soundfile(data: bytes) -> Tuple[bytes, int]:
+    """Decode with libsndfile (MP3 support needs libsndfile 1.1 or newer)."""
+    samples, sample_rate = soundfile.read(io.BytesIO(data), dtype='int16', always_2d=True)
+    mono = samples.mean(axis=1).astype(numpy.int16) if samples.shape[1] > 1 else samples[:, 0]
+    return mono.astype('<i2').tobytes(), sample_rate
+
+
+def _decode_with_pydub(data: bytes) -> Tuple[bytes, int]:
+    """Decode through pydub; ffmpeg is fed over pipes, so still nothing is written to disk."""
+    import pydub
+
+    sound = pydub.AudioSegment.from_file(io.BytesIO(data), format='mp3')
+    sound = sound.set_channels(1).set_sample_width(SAMPLE_WIDTH)
+    return sound.raw_data, sound.frame_rate
@@ -0,0 +1,96 @@
+"""
+Microbenchmark of the audio preprocessing stage on synthetic challenge clips.
+
+Compares what reaches the recogniser through the original pydub path (export
+the decoded clip to WAV and read it back in full), the same cleanup done with
+pydub, and the vectorised NumPy stage in audio_pipeline.preprocess.
+Decoding is excluded, so this runs without ffmpeg.
+
+Usage: python benchmark_audio.py [--clips 20] [--rate 22050] [--seconds 8]
+"""
+
+import argparse
+import io
+import statistics
+import time
+
+import numpy
+import pydub
+import pydub.effects
+import pydub.silence
+import speech_recognition
+
+import audio_pipeline
+
+
+def synthetic_clip(seconds, rate, seed):
+    """Mono 16-bit PCM resembling a digits challenge: spoken bursts between pauses, over noise."""
+    rng = numpy.random.default_rng(seed)
+    samples = rng.normal(0, 0.002, int(seconds * rate))
+    position = int(0.8 * rate)
+    while position < len(samples) - int(1.2 * rate):
+        length = int(rng.uniform(0.3, 0.5) * rate)
+        t = numpy.arange(length) / rate
+        pitch = rng.uniform(100, 220)
+        voice = sum(numpy.sin(2 * numpy.pi * pitch * k * t) / k for k in range(1, 8))
+        envelope = numpy.sin(numpy.pi * t / t[-1]) ** 2
+        samples[position:position + length] += 0.2 * voice * envelope
+        position += length + int(rng.uniform(0.2, 0.4) * rate)
+    return numpy.clip(samples * 32768, -32768, 32767).astype('<i2').tobytes()
+
+
+def pydub_export(pcm, rate):
+    """Original path: export the decoded clip to WAV and record the whole file."""
+    sound = pydub.AudioSegment(data=pcm, sample_width=2, frame_rate=rate, channels=1)
+    wav = io.BytesIO()
+    sound.export(wav, format='wav')
+    wav.seek(0)
+    with speech_recognition.AudioFile(wav) as source:
+        return speech_recognition.Recognizer().record(source)
+
+
+def pydub_cleanup(pcm, rate):
+    """Resample, trim and normalise with pydub's own tools."""
+    sound = pydub.AudioSegment(data=pcm, sample_width=2, frame_rate=rate, channels=1)
+    sound = sound.set_frame_rate(audio_pipeline.TARGET_RATE)
+    start = pydub.silence.detect_leading_silence(sound, silence_threshold=-40.0)
+    end = pydub.silence.detect_leading_silence(sound.reverse(), silence_threshold=-40.0)
+    sound = pydub.effects.normalize(sound[start:len(sound) - end])
+    return audio_pipeline.to_audio_data(sound.raw_data, sound.frame_rate)
+
+
+def numpy_preprocess(pcm, rate):
+    """The preprocessing stage used by the solver."""
+    return audio_pipeline.to_audio_data(*audio_pipeline.preprocess(pcm, rate))
+
+
+def measure(name, pipeline, clips, rate):
+    timings = []
+    payload = 0
+    for pcm in clips:
+        start = time.perf_counter()
+        audio = pipeline(pcm, rate)
+        timings.append((time.perf_counter() - start) * 1000)
+        payload += len(audio.get_raw_data())
+    print(f"{name:<32} {statistics.median(timings):>9.2f} {max(timings):>9.2f} "
+          f"{payload / len(clips) / 1024:>11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Audio preprocessing microbenchmark')
+    parser.add_argument('--clips', type=int, default=20, help='Number of synthetic clips')
+    parser.add_argument('--rate', type=int, default=22050, help='Sample rate of the decoded clips')
+    parser.add_argument('--seconds', type=float, default=8.0, help='Length of each clip')
+    args = parser.parse_args()
+
+    clips = [synthetic_clip(args.seconds, args.rate, seed) for seed in range(args.clips)]
+    print(f"{args.clips} clips, {args.seconds}s at {args.rate} Hz, "
+          f"{len(clips[0]) / 1024:.1f} KiB of PCM each\n")
+    print(f"{'pipeline':<32} {'p50 (ms)':>9} {'max (ms)':>9} {'payload KiB':>11}")
+    measure('pydub WAV export (original)', pydub_export, clips, args.rate)
+    measure('pydub resample/trim/normalise', pydub_cleanup, clips, args.rate)
+    measure('numpy preprocess', numpy_preprocess, clips, args.rate)
+
+
+if __name__ == "__main__":
+    main()
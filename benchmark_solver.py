@@ -0,0 +1,399 @@
+"""
+Offline solve benchmark against a local stand-in for the reCAPTCHA widget.
+
+Serves a page on 127.0.0.1 whose iframes and DOM mimic the widget
+(@title=reCAPTCHA, .rc-anchor-content, #recaptcha-audio-button, #audio-source,
+#audio-response, #recaptcha-verify-button) with configurable delays and a
+local audio clip, then drives RecaptchaSolver or CaptchaAPI.solve_captcha_on_page
+against it with a fake recogniser. Reports per-stage p50/p95/p99 and solves
+per minute; --save and --baseline turn it into a performance regression gate.
+No network access is needed, only a local Chrome/Chromium.
+
+Usage:
+  python benchmark_solver.py --runs 30
+  python benchmark_solver.py --target api --concurrency 4 --pool-size 4
+  python benchmark_solver.py --save baseline.json
+  python benchmark_solver.py --baseline baseline.json --tolerance 0.2
+"""
+
+import argparse
+import io
+import json
+import math
+import struct
+import sys
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlencode, urlparse
+
+from speech_backends import RecognitionBackend, Transcript
+
+ANSWER = 'seven four two'
+PERCENTILES = (50, 95, 99)
+ABSOLUTE_SLACK = 0.05  # seconds of p95 noise tolerated on fast stages
+
+MAIN_PAGE = """<!doctype html>
+<html>
+<head>
+<title>reCAPTCHA benchmark</title>
+<style>
+  #challenge {{ display: none; width: 400px; height: 580px; border: 0; }}
+  #detected {{ display: none; }}
+</style>
+</head>
+<body>
+<form>
+  <iframe title="reCAPTCHA" src="/anchor?{query}" width="304" height="78"></iframe>
+  <textarea id="g-recaptcha-response" name="g-recaptcha-response" style="display: none"></textarea>
+</form>
+<div id="detected">Try again later</div>
+<iframe id="challenge" title="recaptcha challenge expires in two minutes" src="/bframe?{query}"></iframe>
+<script>
+  window.benchmark = {{
+    solve() {{
+      const anchor = document.querySelector('iframe[title="reCAPTCHA"]').contentDocument;
+      anchor.querySelector('.recaptcha-checkbox-checkmark').setAttribute('style', 'display: block;');
+      document.getElementById('g-recaptcha-response').value = 'benchmark-token-' + Date.now();
+      document.getElementById('challenge').style.display = 'none';
+    }},
+    showChallenge() {{
+      document.getElementById('challenge').style.display = 'block';
+    }},
+    detect() {{
+      document.getElementById('detected').style.display = 'block';
+    }}
+  }};
+</script>
+</body>
+</html>
+"""
+
+ANCHOR_FRAME = """<!doctype html>
+<html>
+<body>
+<div class="rc-anchor-content" style="width: 280px; height: 60px; cursor: pointer">
+  <span class="recaptcha-checkbox-checkmark"></span> I'm not a robot
+</div>
+<script>
+  const params = new URLSearchParams(location.search);
+  document.querySelector('.rc-anchor-content').addEventListener('click', () => {{
+    setTimeout(() => {{
+      if (params.get('mode') === 'checkbox') parent.benchmark.solve();
+      else parent.benchmark.showChallenge();
+    }}, 1000 * parseFloat(params.get('checkbox_delay') || '0'));
+  }});
+</script>
+</body>
+</html>
+"""
+
+CHALLENGE_FRAME = """<!doctype html>
+<html>
+<body>
+<button id="recaptcha-audio-button">Get an audio challenge</button>
+<div id="audio-panel"></div>
+<input id="audio-response" type="text">
+<button id="recaptcha-verify-button">Verify</button>
+<div class="rc-audiochallenge-error-message" style="display: none"></div>
+<script>
+  const params = new URLSearchParams(location.search);
+  const delay = name => 1000 * parseFloat(params.get(name) || '0');
+  document.getElementById('recaptcha-audio-button').addEventListener('click', () => {{
+    setTimeout(() => {{
+      if (params.get('mode') === 'detected') {{ parent.benchmark.detect(); return; }}
+      const audio = document.createElement('audio');
+      audio.id = 'audio-source';
+      audio.src = location.origin + '/audio.wav';
+      document.getElementById('audio-panel').appendChild(audio);
+    }}, delay('audio_delay'));
+  }});
+  document.getElementById('recaptcha-verify-button').addEventListener('click', () => {{
+    setTimeout(() => {{
+      const answer = document.getElementById('audio-response').value.trim().toLowerCase();
+      if (answer === params.get('answer')) {{
+        parent.benchmark.solve();
+      }} else {{
+        const error = document.querySelector('.rc-audiochallenge-error-message');
+        error.textContent = 'Multiple correct solutions required - please solve more.';
+        error.style.display = 'block';
+      }}
+    }}, delay('verify_delay'));
+  }});
+</script>
+</body>
+</html>
+"""
+
+
+def make_clip(seconds: float = 4.0, rate: int = 22050) -> bytes:
+    """A WAV clip standing in for the challenge audio: tone bursts between pauses."""
+    frames = bytearray()
+    for i in range(int(seconds * rate)):
+        t = i / rate
+        voiced = 0.5 < t < seconds - 0.5 and int(t * 3) % 2 == 0
+        sample = int(8000 * math.sin(2 * math.pi * 180 * t)) if voiced else 0
+        frames += struct.pack('<h', sample)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as clip:
+        clip.setnchannels(1)
+        clip.setsampwidth(2)
+        clip.setframerate(rate)
+        clip.writeframes(bytes(frames))
+    return buffer.getvalue()
+
+
+class FakeRecognizer(RecognitionBackend):
+    """Recognition backend returning the expected answer after a fixed delay."""
+
+    name = 'fake'
+
+    def __init__(self, answer: str = ANSWER, delay: float = 0.5) -> None:
+        self.answer = answer
+        self.delay = delay
+
+    def transcribe(self, audio: Any) -> Transcript:
+        time.sleep(self.delay)
+        return Transcript(self.answer, 1.0, self.name)
+
+
+class StandInServer:
+    """Local HTTP server for the stand-in widget pages and audio clip."""
+
+    def __init__(self, clip: Optional[bytes] = None) -> None:
+        self.clip = clip or make_clip()
+        pages = {'/': MAIN_PAGE, '/anchor': ANCHOR_FRAME, '/bframe': CHALLENGE_FRAME}
+        clip_bytes = self.clip
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                if parsed.path == '/audio.wav':
+                    self._send(clip_bytes, 'audio/wav')
+                elif parsed.path in pages:
+                    body = pages[parsed.path].format(query=parsed.query)
+                    self._send(body.encode(), 'text/html; charset=utf-8')
+                else:
+                    self.send_error(404)
+
+            def _send(self, body, content_type):
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def origin(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def page_url(self, mode: str = 'audio', checkbox_delay: float = 0.3, audio_delay: float = 0.3,
+                 verify_delay: float = 0.5, answer: str = ANSWER) -> str:
+        """URL of a stand-in page behaving as configured."""
+        query = urlencode({
+            'mode': mode,
+            'checkbox_delay': checkbox_delay,
+            'audio_delay': audio_delay,
+            'verify_delay': verify_delay,
+            'answer': answer
+        })
+        return f"{self.origin}/?{query}"
+
+    def start(self) -> 'StandInServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile, or None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def summarize(runs: List[Dict[str, Any]], wall_time: float) -> Dict[str, Any]:
+    """Per-stage percentiles and throughput of a set of runs.
+
+    Args:
+        runs: One dict per solve with 'success', 'total_time' and 'stages'
+        wall_time: Seconds the whole benchmark took
+
+    Returns:
+        Dict with 'stages' (name -> {p50, p95, p99}), 'total', 'runs',
+        'successes' and 'solves_per_minute'
+    """
+    stage_values: Dict[str, List[float]] = {}
+    for run in runs:
+        for stage, seconds in run['stages'].items():
+            stage_values.setdefault(stage, []).append(seconds)
+
+    def describe(values):
+        return {f"p{p}": percentile(values, p) for p in PERCENTILES}
+
+    successes = sum(1 for run in runs if run['success'])
+    return {
+        'stages': {stage: describe(values) for stage, values in stage_values.items()},
+        'total': describe([run['total_time'] for run in runs]),
+        'runs': len(runs),
+        'successes': successes,
+        'solves_per_minute': round(successes / wall_time * 60, 2) if wall_time > 0 else 0.0
+    }
+
+
+def compare(summary: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Return the regressions of ``summary`` against ``baseline``."""
+    regressions = []
+    for stage, base in baseline['stages'].items():
+        current = summary['stages'].get(stage)
+        if current is None or base['p95'] is None:
+            continue
+        limit = base['p95'] * (1 + tolerance) + ABSOLUTE_SLACK
+        if current['p95'] > limit:
+            regressions.append(f"{stage}: p95 {current['p95']:.3f}s > {limit:.3f}s")
+    limit = baseline['solves_per_minute'] * (1 - tolerance)
+    if summary['solves_per_minute'] < limit:
+        regressions.append(f"throughput: {summary['solves_per_minute']} solves/min < {limit:.2f}")
+    return regressions
+
+
+def run_solver(url: str, runs: int, concurrency: int, recognizer: FakeRecognizer) -> List[Dict[str, Any]]:
+    """Solve ``runs`` times with RecaptchaSolver, one browser per concurrent worker."""
+    from api import CaptchaAPI
+    from RecaptchaSolver import RecaptchaSolver
+
+    local = threading.local()
+    drivers = []
+    drivers_lock = threading.Lock()
+
+    def solve(_):
+        driver = getattr(local, 'driver', None)
+        if driver is None:
+            driver = local.driver = CaptchaAPI.create_driver(headless=True, auto_port=True)
+            with drivers_lock:
+                drivers.append(driver)
+        start = time.time()
+        stages = {}
+        driver.get(url)
+        driver.wait.doc_loaded()
+        stages['navigation'] = round(time.time() - start, 3)
+        solver = RecaptchaSolver(driver, backend=recognizer)
+        try:
+            solver.solveCaptcha()
+            success = bool(solver.get_token())
+        except Exception as e:
+            print(f"  run failed: {str(e)}")
+            success = False
+        stages.update(solver.timings)
+        return {'success': success, 'total_time': time.time() - start, 'stages': stages}
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(solve, range(runs)))
+    finally:
+        for driver in drivers:
+            driver.quit()
+
+
+def run_api(url: str, runs: int, concurrency: int, recognizer: FakeRecognizer) -> List[Dict[str, Any]]:
+    """Solve ``runs`` times through CaptchaAPI.solve_captcha_on_page."""
+    from api import CaptchaAPI
+
+    CaptchaAPI.recognition_backend = recognizer
+
+    def solve(_):
+        result = CaptchaAPI.solve_captcha_on_page(url)
+        return {
+            'success': bool(result.get('success') and result.get('token')),
+            'total_time': result['total_time'],
+            'stages': result.get('stage_timings', {})
+        }
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(solve, range(runs)))
+
+
+def print_report(summary: Dict[str, Any]) -> None:
+    print(f"\n{'stage':<18}" + ''.join(f"{f'p{p} (s)':>10}" for p in PERCENTILES))
+    for stage, values in list(summary['stages'].items()) + [('total', summary['total'])]:
+        print(f"{stage:<18}" + ''.join(f"{values[f'p{p}']:>10.3f}" for p in PERCENTILES))
+    print(f"\n{summary['successes']}/{summary['runs']} solved, "
+          f"{summary['solves_per_minute']} solves/min")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline reCAPTCHA solve benchmark')
+    parser.add_argument('--target', choices=['solver', 'api'], default='solver',
+                        help='Drive RecaptchaSolver directly or CaptchaAPI.solve_captcha_on_page')
+    parser.add_argument('--runs', type=int, default=20, help='Number of solves')
+    parser.add_argument('--concurrency', type=int, default=1, help='Solves running at once')
+    parser.add_argument('--mode', choices=['audio', 'checkbox', 'detected'], default='audio',
+                        help='Widget behaviour: audio challenge, checkbox-only, or bot detection')
+    parser.add_argument('--checkbox-delay', type=float, default=0.3, help='Seconds before the checkbox reacts')
+    parser.add_argument('--audio-delay', type=float, default=0.3, help='Seconds before the audio clip appears')
+    parser.add_argument('--verify-delay', type=float, default=0.5, help='Seconds before verification answers')
+    parser.add_argument('--recognition-delay', type=float, default=0.5, help='Seconds the fake recogniser takes')
+    parser.add_argument('--pool-size', type=int, default=0, help='Warm browser pool size (api target)')
+    parser.add_argument('--contexts', type=int, default=0, help='Shared browser contexts (api target)')
+    parser.add_argument('--save', help='Write the summary to this JSON file')
+    parser.add_argument('--baseline', help='Fail if slower than the summary in this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed relative slowdown against the baseline (default: 0.2)')
+    args = parser.parse_args()
+
+    server = StandInServer().start()
+    url = server.page_url(args.mode, args.checkbox_delay, args.audio_delay, args.verify_delay)
+    recognizer = FakeRecognizer(delay=args.recognition_delay)
+    print(f"Benchmarking {args.target} against {url}")
+
+    try:
+        if args.target == 'api':
+            from api import CaptchaAPI
+            if args.pool_size:
+                CaptchaAPI.enable_browser_pool(size=args.pool_size)
+            if args.contexts:
+                CaptchaAPI.enable_context_pool(max_contexts=args.contexts)
+        start = time.time()
+        runner = run_api if args.target == 'api' else run_solver
+        runs = runner(url, args.runs, args.concurrency, recognizer)
+        summary = summarize(runs, time.time() - start)
+    finally:
+        server.stop()
+        if args.target == 'api':
+            from api import CaptchaAPI
+            for pool in (CaptchaAPI.browser_pool, CaptchaAPI.context_pool):
+                if pool is not None:
+                    pool.shutdown()
+
+    print_report(summary)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"Summary written to {args.save}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(summary, json.load(f), args.tolerance)
+        if regressions:
+            print("\n❌ Performance regression:")
+            for regression in regressions:
+                print(f"   {regression}")
+            sys.exit(1)
+        print("\n✅ Within tolerance of the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,879 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+from DrissionPage import ChromiumPage
+from DrissionPage.items import ChromiumTab
+
+logger = logging.getLogger(__name__)
+
+# Launch arguments identifying a keyed browser: (proxy, user_agent, headless)
+PoolKey = Tuple[Optional[str], Optional[str], bool]
+
+# Origins serving the reCAPTCHA iframes, wiped after every lease (the keyed pool keeps them)
+RECAPTCHA_ORIGINS = ('https://www.google.com', 'https://www.recaptcha.net', 'https://recaptcha.net')
+# DOM storage cleared per origin by Storage.clearDataForOrigin (cookies are cleared separately)
+STORAGE_TYPES = 'local_storage,session_storage,indexeddb,websql,service_workers,cache_storage'
+
+
+class PooledBrowser:
+    """A pre-launched browser together with its usage bookkeeping."""
+
+    def __init__(self, driver: ChromiumPage, key: Optional[PoolKey] = None) -> None:
+        """Wrap a freshly launched driver.
+
+        Args:
+            driver: ChromiumPage instance owned by the pool
+            key: Launch arguments of the browser, for keyed pools
+        """
+        self.driver = driver
+        self.key = key
+        self.created_at = time.time()
+        self.uses = 0
+
+    @property
+    def age(self) -> float:
+        """Seconds elapsed since the browser was launched."""
+        return time.time() - self.created_at
+
+
+class BrowserPool:
+    """Keeps a fixed number of warm ChromiumPage instances ready for leasing.
+
+    Browsers are launched ahead of time, health-checked before every lease,
+    wiped (cookies, storage, extra tabs) when they are returned and recycled
+    once they reach ``max_uses`` solves or ``max_age`` seconds. Replacements
+    are launched on a background thread so a recycle never blocks a request.
+    """
+
+    # Defaults
+    DEFAULT_SIZE = 2
+    DEFAULT_MAX_USES = 25
+    DEFAULT_MAX_AGE = 900
+    DEFAULT_LEASE_TIMEOUT = 60
+    HEALTH_CHECK_TIMEOUT = 3
+    # Seconds between inline launch attempts while the factory keeps failing
+    LAUNCH_RETRY_DELAY = 1.0
+
+    def __init__(self, factory: Callable[[], ChromiumPage], size: int = DEFAULT_SIZE,
+                 max_uses: int = DEFAULT_MAX_USES, max_age: float = DEFAULT_MAX_AGE,
+                 lease_timeout: float = DEFAULT_LEASE_TIMEOUT) -> None:
+        """Configure the pool. No browser is launched until ``start`` is called.
+
+        Args:
+            factory: Callable returning a new, independent ChromiumPage
+            size: Number of browsers kept alive
+            max_uses: Solves served by a browser before it is recycled
+            max_age: Seconds a browser may live before it is recycled
+            lease_timeout: Default seconds to wait for a free browser
+        """
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+
+        self.factory = factory
+        self.size = size
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self.lease_timeout = lease_timeout
+
+        self._idle: List[PooledBrowser] = []
+        self._total = 0
+        self._closed = False
+        self._launch_error: Optional[str] = None
+        self._condition = threading.Condition()
+        self._stats = {'leases': 0, 'launched': 0, 'recycled': 0, 'unhealthy': 0}
+
+    def start(self) -> None:
+        """Launch browsers until the pool holds ``size`` instances."""
+        with self._condition:
+            missing = self.size - self._total
+            self._total += missing
+
+        for _ in range(missing):
+            self._launch()
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None) -> Iterator[ChromiumPage]:
+        """Lease a browser for the duration of a ``with`` block.
+
+        Args:
+            timeout: Seconds to wait for a free browser (default: lease_timeout)
+
+        Yields:
+            ChromiumPage: A clean, healthy browser
+        """
+        browser = self.acquire(timeout=timeout)
+        try:
+            yield browser.driver
+        finally:
+            self.release(browser)
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledBrowser:
+        """Take a healthy browser out of the pool, waiting if none is free.
+
+        Args:
+            timeout: Seconds to wait for a free browser (default: lease_timeout)
+
+        Returns:
+            PooledBrowser: The leased browser; hand it back with ``release``
+
+        Raises:
+            Exception: If the pool is shut down, no browser frees up in time
+                or browsers keep failing to launch until the deadline
+        """
+        deadline = time.time() + (self.lease_timeout if timeout is None else timeout)
+
+        while True:
+            launch = False
+            with self._condition:
+                while not self._idle:
+                    if self._closed:
+                        raise Exception("Browser pool is shut down")
+                    if self._total < self.size:
+                        # A slot is free (e.g. a launch failed earlier): fill it inline
+                        self._total += 1
+                        launch = True
+                        break
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise Exception("Timed out waiting for a free browser")
+                    self._condition.wait(remaining)
+
+                browser = None if launch else self._idle.pop()
+
+            if launch:
+                browser = self._create()
+                if browser is None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise Exception(f"Failed to launch a browser for the pool: {self._launch_error}")
+                    time.sleep(min(self.LAUNCH_RETRY_DELAY, remaining))
+                    continue
+            elif browser.age >= self.max_age or not self.is_healthy(browser.driver):
+                self._count('unhealthy' if browser.age < self.max_age else 'recycled')
+                self._retire(browser)
+                continue
+
+            browser.uses += 1
+            self._count('leases')
+            return browser
+
+    def release(self, browser: PooledBrowser) -> None:
+        """Return a leased browser, resetting or recycling it.
+
+        Args:
+            browser: Browser previously obtained from ``acquire``
+        """
+        if self._closed:
+            self._discard(browser)
+            return
+
+        if browser.uses >= self.max_uses or browser.age >= self.max_age:
+            self._count('recycled')
+            self._retire(browser)
+            return
+
+        if not self.reset(browser.driver):
+            self._count('unhealthy')
+            self._retire(browser)
+            return
+
+        with self._condition:
+            self._idle.append(browser)
+            self._condition.notify()
+
+    def shutdown(self) -> None:
+        """Close every idle browser and refuse further leases."""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._condition.notify_all()
+
+        for browser in idle:
+            self._discard(browser)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool occupancy and lifetime counters."""
+        with self._condition:
+            return {
+                'size': self.size,
+                'alive': self._total,
+                'idle': len(self._idle),
+                'in_use': self._total - len(self._idle),
+                **self._stats
+            }
+
+    @classmethod
+    def is_healthy(cls, driver: ChromiumPage) -> bool:
+        """Check that the browser still answers a trivial script."""
+        try:
+            return driver.run_js("return 1;", timeout=cls.HEALTH_CHECK_TIMEOUT) == 1
+        except Exception:
+            return False
+
+    @staticmethod
+    def reset(driver: ChromiumPage, keep_domains: Sequence[str] = ()) -> bool:
+        """Wipe session state left behind by the previous lease.
+
+        Cookies, extra tabs and the DOM storage of every origin the lease
+        touched (see ``visited_origins``) are cleared; the HTTP cache is kept
+        on purpose so static reCAPTCHA assets stay warm.
+
+        Args:
+            driver: ChromiumPage instance to reset
+            keep_domains: Domains (and their subdomains) whose DOM storage is kept
+
+        Returns:
+            bool: True if the browser is clean and reusable
+        """
+        try:
+            if driver.tabs_count > 1:
+                driver.close_tabs(driver.tab_id, others=True)
+
+            for origin in BrowserPool.visited_origins(driver):
+                if not in_domains(urlparse(origin).hostname or '', keep_domains):
+                    driver.run_cdp('Storage.clearDataForOrigin', origin=origin, storageTypes=STORAGE_TYPES)
+
+            driver.run_cdp('Network.clearBrowserCookies')
+            driver.get('about:blank')
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to reset pooled browser: {str(e)}")
+            return False
+
+    @staticmethod
+    def visited_origins(driver: ChromiumPage) -> List[str]:
+        """Origins whose storage a lease may have written to.
+
+        Covers the current page and its frames, every domain holding a cookie
+        and the reCAPTCHA origins, whose iframes are out-of-process and do not
+        always show up in the page's frame tree.
+
+        Args:
+            driver: ChromiumPage instance about to be reset
+
+        Returns:
+            list: Origins such as 'https://www.google.com', without duplicates
+        """
+        origins = list(RECAPTCHA_ORIGINS)
+
+        def add(url: str) -> None:
+            parsed = urlparse(url or '')
+            if parsed.scheme in ('http', 'https') and parsed.netloc:
+                origin = f"{parsed.scheme}://{parsed.netloc}"
+                if origin not in origins:
+                    origins.append(origin)
+
+        add(driver.url)
+        try:
+            frames = [driver.run_cdp('Page.getFrameTree').get('frameTree')]
+        except Exception:
+            frames = []
+        while frames:
+            node = frames.pop()
+            if node:
+                add(node.get('frame', {}).get('url'))
+                frames.extend(node.get('childFrames', []))
+
+        cookies = driver.run_cdp('Network.getAllCookies').get('cookies', [])
+        for cookie in cookies:
+            domain = cookie.get('domain', '').lstrip('.')
+            if domain:
+                add(f"https://{domain}")
+                if not cookie.get('secure'):
+                    add(f"http://{domain}")
+        return origins
+
+    def _launch(self) -> None:
+        """Create one browser for an already reserved slot and make it idle."""
+        browser = self._create()
+        if browser is None:
+            return
+        with self._condition:
+            if self._closed:
+                closed = True
+            else:
+                closed = False
+                self._idle.append(browser)
+                self._condition.notify()
+        if closed:
+            self._discard(browser)
+
+    def _create(self) -> Optional[PooledBrowser]:
+        """Run the factory for a reserved slot, releasing the slot on failure."""
+        try:
+            browser = PooledBrowser(self.factory())
+            self._count('launched')
+            return browser
+        except Exception as e:
+            logger.error(f"Failed to launch pooled browser: {str(e)}")
+            with self._condition:
+                self._launch_error = str(e)
+                self._total -= 1
+                self._condition.notify()
+            return None
+
+    def _count(self, name: str) -> None:
+        """Increment a lifetime counter."""
+        with self._condition:
+            self._stats[name] += 1
+
+    def _retire(self, browser: PooledBrowser) -> None:
+        """Close a browser and launch its replacement in the background."""
+        self._quit(browser)
+        with self._condition:
+            replace = not self._closed
+            if not replace:
+                self._total -= 1
+                self._condition.notify()
+        if replace:
+            # The slot stays reserved for the replacement
+            threading.Thread(target=self._launch, daemon=True).start()
+
+    def _discard(self, browser: PooledBrowser) -> None:
+        """Quit a browser for good and free its slot."""
+        self._quit(browser)
+        with self._condition:
+            self._total -= 1
+            self._condition.notify()
+
+    @staticmethod
+    def _quit(browser: PooledBrowser) -> None:
+        """Shut down the browser process behind a pooled instance."""
+        try:
+            browser.driver.quit()
+        except Exception as e:
+            logger.warning(f"Error closing pooled browser: {str(e)}")
+
+
+class ContextPool:
+    """Runs several isolated solves at once inside one shared Chromium.
+
+    Every lease gets its own incognito-style browser context (separate cookie
+    jar, storage and cache partition) with a single tab; the context is
+    disposed on return, so nothing leaks between sessions while the browser
+    process, and its memory footprint, is shared. The shared browser is
+    relaunched after ``max_uses`` leases once its last context is returned.
+    """
+
+    # Defaults
+    DEFAULT_MAX_CONTEXTS = 4
+    DEFAULT_MAX_USES = 200
+    DEFAULT_LEASE_TIMEOUT = 60
+
+    def __init__(self, factory: Callable[[], ChromiumPage],
+                 max_contexts: int = DEFAULT_MAX_CONTEXTS,
+                 max_uses: int = DEFAULT_MAX_USES,
+                 lease_timeout: float = DEFAULT_LEASE_TIMEOUT) -> None:
+        """Configure the pool. The browser is launched lazily or by ``start``.
+
+        Args:
+            factory: Callable returning a new, independent ChromiumPage
+            max_contexts: Maximum number of concurrent contexts in the browser
+            max_uses: Leases served before the browser is relaunched
+            lease_timeout: Default seconds to wait for a free context slot
+        """
+        if max_contexts < 1:
+            raise ValueError("max_contexts must be at least 1")
+
+        self.factory = factory
+        self.max_contexts = max_contexts
+        self.max_uses = max_uses
+        self.lease_timeout = lease_timeout
+
+        self._browser: Optional[PooledBrowser] = None
+        self._active = 0
+        # A lease is health-checking or launching the browser outside the lock
+        self._preparing = False
+        self._closed = False
+        self._condition = threading.Condition()
+        self._stats = {'leases': 0, 'launched': 0, 'context_errors': 0}
+
+    def start(self) -> None:
+        """Launch the shared browser ahead of the first lease."""
+        with self._condition:
+            if self._closed or self._preparing or self._browser is not None:
+                return
+            self._preparing = True
+        self._prepare(None, lease=False)
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None) -> Iterator[ChromiumTab]:
+        """Lease an isolated tab for the duration of a ``with`` block.
+
+        Args:
+            timeout: Seconds to wait for a free slot (default: lease_timeout)
+
+        Yields:
+            ChromiumTab: A blank tab in a fresh browser context
+        """
+        tab = self.acquire(timeout=timeout)
+        try:
+            yield tab
+        finally:
+            self.release(tab)
+
+    def acquire(self, timeout: Optional[float] = None) -> ChromiumTab:
+        """Open a tab in a new browser context, waiting for a free slot.
+
+        Args:
+            timeout: Seconds to wait for a free slot (default: lease_timeout)
+
+        Returns:
+            ChromiumTab: Tab to drive; hand it back with ``release``
+
+        Raises:
+            Exception: If the pool is shut down, no slot frees up in time or
+                the context cannot be created
+        """
+        deadline = time.time() + (self.lease_timeout if timeout is None else timeout)
+
+        with self._condition:
+            while self._active >= self.max_contexts or self._draining() or self._preparing:
+                if self._closed:
+                    raise Exception("Context pool is shut down")
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise Exception("Timed out waiting for a free browser context")
+                self._condition.wait(remaining)
+
+            if self._closed:
+                raise Exception("Context pool is shut down")
+
+            browser = self._browser
+            prepare = browser is None or self._active == 0
+            if prepare:
+                # Check or launch the browser without holding the lock; other
+                # leases wait on _preparing instead
+                self._browser = None
+                self._preparing = True
+            else:
+                self._lease(browser)
+
+        if prepare:
+            browser = self._prepare(browser, lease=True)
+
+        try:
+            return browser.driver.new_tab(new_context=True)
+        except Exception:
+            retired = None
+            with self._condition:
+                self._active -= 1
+                self._stats['context_errors'] += 1
+                # The failed lease may have been the browser's last one
+                if self._active == 0 and (self._closed or self._draining()):
+                    retired = self._detach_browser()
+                self._condition.notify_all()
+            if retired is not None:
+                BrowserPool._quit(retired)
+            raise
+
+    def release(self, tab: ChromiumTab) -> None:
+        """Dispose a leased tab's browser context and free its slot.
+
+        Args:
+            tab: Tab previously obtained from ``acquire``
+        """
+        try:
+            context_id = tab.run_cdp('Target.getTargetInfo')['targetInfo']['browserContextId']
+            run_browser_cdp(tab.browser, 'Target.disposeBrowserContext', browserContextId=context_id)
+        except Exception as e:
+            logger.warning(f"Failed to dispose browser context: {str(e)}")
+            with self._condition:
+                self._stats['context_errors'] += 1
+
+        retired = None
+        with self._condition:
+            self._active -= 1
+            if self._active == 0 and (self._closed or self._draining()):
+                retired = self._detach_browser()
+            self._condition.notify_all()
+        if retired is not None:
+            BrowserPool._quit(retired)
+
+    def shutdown(self) -> None:
+        """Refuse further leases and quit the browser once it is idle."""
+        retired = None
+        with self._condition:
+            self._closed = True
+            if self._active == 0:
+                retired = self._detach_browser()
+            self._condition.notify_all()
+        if retired is not None:
+            BrowserPool._quit(retired)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return slot occupancy and lifetime counters."""
+        with self._condition:
+            return {
+                'max_contexts': self.max_contexts,
+                'active_contexts': self._active,
+                'browser_uses': self._browser.uses if self._browser else 0,
+                **self._stats
+            }
+
+    def _draining(self) -> bool:
+        """True when the browser has served its quota and awaits relaunch."""
+        return self._browser is not None and self._browser.uses >= self.max_uses
+
+    def _lease(self, browser: PooledBrowser) -> None:
+        """Count a lease of the browser and take its slot. Caller holds the lock."""
+        browser.uses += 1
+        self._active += 1
+        self._stats['leases'] += 1
+
+    def _prepare(self, browser: Optional[PooledBrowser], lease: bool) -> PooledBrowser:
+        """Health-check or launch the shared browser outside the lock and install it.
+
+        The caller has set ``_preparing``, so no other lease touches the
+        browser meanwhile.
+
+        Args:
+            browser: Previously shared browser, or None to launch one
+            lease: Also take a context slot for the caller
+
+        Returns:
+            PooledBrowser: The installed browser
+        """
+        launched = False
+        try:
+            if browser is not None and not BrowserPool.is_healthy(browser.driver):
+                BrowserPool._quit(browser)
+                browser = None
+            if browser is None:
+                browser = PooledBrowser(self.factory())
+                launched = True
+        except Exception:
+            with self._condition:
+                self._preparing = False
+                self._condition.notify_all()
+            raise
+
+        with self._condition:
+            self._preparing = False
+            self._stats['launched'] += launched
+            closed = self._closed
+            if not closed:
+                self._browser = browser
+                if lease:
+                    self._lease(browser)
+            self._condition.notify_all()
+
+        if closed:
+            BrowserPool._quit(browser)
+            raise Exception("Context pool is shut down")
+        return browser
+
+    def _detach_browser(self) -> Optional[PooledBrowser]:
+        """Take the shared browser out so the next lease relaunches it. Caller holds the lock."""
+        browser, self._browser = self._browser, None
+        return browser
+
+
+class KeyedBrowserPool:
+    """Warm browsers for requests with their own proxy or user agent.
+
+    Proxy and user agent are launch arguments, so browsers are pooled per
+    (proxy, user_agent, headless) key. A request for a recently used key gets
+    a browser that kept the reCAPTCHA cookies and storage (STICKY_COOKIE_DOMAINS)
+    earned through that proxy, which makes checkbox-only solves more likely; all
+    other cookies and storage are wiped between leases. At most ``capacity``
+    browsers run at once; when a new key needs a slot, the idle browser of
+    the least recently used key is closed.
+    """
+
+    # Defaults
+    DEFAULT_CAPACITY = 8
+    DEFAULT_MAX_USES = 50
+    DEFAULT_MAX_AGE = 1800
+    DEFAULT_LEASE_TIMEOUT = 60
+    # Keys whose statistics are kept
+    MAX_TRACKED_KEYS = 1000
+    # Cookies and storage kept across leases of the same key
+    STICKY_COOKIE_DOMAINS = ('google.com', 'recaptcha.net')
+    # Seconds between launch attempts while the factory keeps failing
+    LAUNCH_RETRY_DELAY = BrowserPool.LAUNCH_RETRY_DELAY
+    # Outcomes of solves that reached the checkbox
+    SOLVE_OUTCOMES = ('checkbox', 'audio', 'bot_detected', 'failed')
+    COOKIE_FIELDS = ('name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'sameSite')
+
+    def __init__(self, factory: Callable[[PoolKey], ChromiumPage], capacity: int = DEFAULT_CAPACITY,
+                 max_uses: int = DEFAULT_MAX_USES, max_age: float = DEFAULT_MAX_AGE,
+                 lease_timeout: float = DEFAULT_LEASE_TIMEOUT) -> None:
+        """Configure the pool. Browsers are launched on demand.
+
+        Args:
+            factory: Callable returning a new ChromiumPage launched for a key
+            capacity: Maximum number of browsers alive at once, across keys
+            max_uses: Solves served by a browser before it is recycled
+            max_age: Seconds a browser may live before it is recycled
+            lease_timeout: Default seconds to wait for a free slot
+        """
+        if capacity < 1:
+            raise ValueError("Pool capacity must be at least 1")
+
+        self.factory = factory
+        self.capacity = capacity
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self.lease_timeout = lease_timeout
+
+        # Idle browsers per key, least recently used key first
+        self._idle: 'OrderedDict[PoolKey, List[PooledBrowser]]' = OrderedDict()
+        self._total = 0
+        self._closed = False
+        self._launch_error: Optional[str] = None
+        self._condition = threading.Condition()
+        self._stats = {'leases': 0, 'hits': 0, 'launched': 0, 'evicted': 0, 'recycled': 0, 'unhealthy': 0}
+        self._key_stats: 'OrderedDict[PoolKey, Dict[str, int]]' = OrderedDict()
+
+    def acquire(self, key: PoolKey, timeout: Optional[float] = None) -> PooledBrowser:
+        """Lease a browser launched for ``key``, reusing a warm one when idle.
+
+        Args:
+            key: (proxy, user_agent, headless) of the request
+            timeout: Seconds to wait for a free slot (default: lease_timeout)
+
+        Returns:
+            PooledBrowser: The leased browser; hand it back with ``release``
+
+        Raises:
+            Exception: If the pool is shut down, no slot frees up in time or
+                the browser keeps failing to launch until the deadline
+        """
+        deadline = time.time() + (self.lease_timeout if timeout is None else timeout)
+
+        while True:
+            browser = victim = None
+            with self._condition:
+                while True:
+                    if self._closed:
+                        raise Exception("Browser pool is shut down")
+                    idle = self._idle.get(key)
+                    if idle:
+                        browser = idle.pop()
+                        if not idle:
+                            del self._idle[key]
+                        break
+                    if self._total < self.capacity:
+                        self._total += 1
+                        break
+                    victim = self._pop_lru()
+                    if victim is not None:
+                        # The evicted browser's slot goes to the new key
+                        self._stats['evicted'] += 1
+                        break
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise Exception("Timed out waiting for a free browser")
+                    self._condition.wait(remaining)
+
+            if victim is not None:
+                BrowserPool._quit(victim)
+            hit = browser is not None
+            if not hit:
+                browser = self._create(key)
+                if browser is None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise Exception(f"Failed to launch a browser for the pool: {self._launch_error}")
+                    time.sleep(min(self.LAUNCH_RETRY_DELAY, remaining))
+                    continue
+            elif browser.age >= self.max_age or not BrowserPool.is_healthy(browser.driver):
+                self._count('unhealthy' if browser.age < self.max_age else 'recycled')
+                self._discard(browser)
+                continue
+
+            browser.uses += 1
+            with self._condition:
+                self._stats['leases'] += 1
+                self._stats['hits'] += hit
+                stats = self._stats_for(key)
+                stats['leases'] += 1
+                stats['hits'] += hit
+            return browser
+
+    def release(self, browser: PooledBrowser, outcome: Optional[str] = None) -> None:
+        """Return a leased browser, keeping its reCAPTCHA cookies.
+
+        Args:
+            browser: Browser previously obtained from ``acquire``
+            outcome: Outcome of the solve it served, for the per-key statistics
+        """
+        if outcome in self.SOLVE_OUTCOMES:
+            with self._condition:
+                stats = self._stats_for(browser.key)
+                stats['solves'] += 1
+                stats['checkbox_solves'] += outcome == 'checkbox'
+
+        if self._closed:
+            self._discard(browser)
+            return
+
+        if browser.uses >= self.max_uses or browser.age >= self.max_age:
+            self._count('recycled')
+            self._discard(browser)
+            return
+
+        if not self.reset(browser.driver):
+            self._count('unhealthy')
+            self._discard(browser)
+            return
+
+        with self._condition:
+            self._idle.setdefault(browser.key, []).append(browser)
+            self._idle.move_to_end(browser.key)
+            self._condition.notify_all()
+
+    def shutdown(self) -> None:
+        """Close every idle browser and refuse further leases."""
+        with self._condition:
+            self._closed = True
+            idle = [browser for browsers in self._idle.values() for browser in browsers]
+            self._idle.clear()
+            self._condition.notify_all()
+
+        for browser in idle:
+            self._discard(browser)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return occupancy, lifetime counters and hit/checkbox-only rates per key."""
+        with self._condition:
+            idle = sum(len(browsers) for browsers in self._idle.values())
+            keys = []
+            for key, stats in reversed(self._key_stats.items()):
+                proxy, user_agent, headless = key
+                keys.append({
+                    'proxy': mask_proxy(proxy),
+                    'user_agent': user_agent,
+                    'headless': headless,
+                    'idle': len(self._idle.get(key, ())),
+                    **stats,
+                    'hit_rate': round(stats['hits'] / stats['leases'], 3) if stats['leases'] else None,
+                    'checkbox_rate': (round(stats['checkbox_solves'] / stats['solves'], 3)
+                                      if stats['solves'] else None)
+                })
+            return {
+                'capacity': self.capacity,
+                'alive': self._total,
+                'idle': idle,
+                'in_use': self._total - idle,
+                **self._stats,
+                'hit_rate': round(self._stats['hits'] / self._stats['leases'], 3) if self._stats['leases'] else None,
+                'keys': keys
+            }
+
+    @classmethod
+    def reset(cls, driver: ChromiumPage) -> bool:
+        """Wipe the previous lease's session, keeping the reCAPTCHA cookies and storage.
+
+        Args:
+            driver: ChromiumPage instance to reset
+
+        Returns:
+            bool: True if the browser is clean and reusable
+        """
+        try:
+            cookies = driver.run_cdp('Network.getAllCookies').get('cookies', [])
+        except Exception as e:
+            logger.warning(f"Failed to read pooled browser cookies: {str(e)}")
+            return False
+
+        sticky = []
+        for cookie in cookies:
+            if in_domains(cookie.get('domain', '').lstrip('.'), cls.STICKY_COOKIE_DOMAINS):
+                kept = {field: cookie[field] for field in cls.COOKIE_FIELDS if field in cookie}
+                if not cookie.get('session') and cookie.get('expires', -1) > 0:
+                    kept['expires'] = cookie['expires']
+                sticky.append(kept)
+
+        if not BrowserPool.reset(driver, keep_domains=cls.STICKY_COOKIE_DOMAINS):
+            return False
+        if sticky:
+            try:
+                driver.run_cdp('Network.setCookies', cookies=sticky)
+            except Exception as e:
+                logger.warning(f"Failed to restore reCAPTCHA cookies: {str(e)}")
+        return True
+
+    def _pop_lru(self) -> Optional[PooledBrowser]:
+        """Take the idle browser of the least recently used key. Caller holds the lock."""
+        for key, browsers in self._idle.items():
+            browser = browsers.pop(0)
+            if not browsers:
+                del self._idle[key]
+            return browser
+        return None
+
+    def _stats_for(self, key: PoolKey) -> Dict[str, int]:
+        """Counters of a key, most recently used last. Caller holds the lock."""
+        stats = self._key_stats.get(key)
+        if stats is None:
+            stats = self._key_stats[key] = {'leases': 0, 'hits': 0, 'solves': 0, 'checkbox_solves': 0}
+            if len(self._key_stats) > self.MAX_TRACKED_KEYS:
+                self._key_stats.popitem(last=False)
+        self._key_stats.move_to_end(key)
+        return stats
+
+    def _create(self, key: PoolKey) -> Optional[PooledBrowser]:
+        """Launch a browser for a reserved slot, releasing the slot on failure."""
+        try:
+            browser = PooledBrowser(self.factory(key), key=key)
+            self._count('launched')
+            return browser
+        except Exception as e:
+            logger.error(f"Failed to launch pooled browser: {str(e)}")
+            with self._condition:
+                self._launch_error = str(e)
+                self._total -= 1
+                self._condition.notify()
+            return None
+
+    def _count(self, name: str) -> None:
+        """Increment a lifetime counter."""
+        with self._condition:
+            self._stats[name] += 1
+
+    def _discard(self, browser: PooledBrowser) -> None:
+        """Quit a browser and free its slot; the key relaunches on demand."""
+        BrowserPool._quit(browser)
+        with self._condition:
+            self._total -= 1
+            self._condition.notify()
+
+
+def run_browser_cdp(browser: Any, cmd: str, **kwargs: Any) -> Dict[str, Any]:
+    """Send a CDP command to the browser target rather than to a tab.
+
+    Browser-level commands such as ``Target.disposeBrowserContext`` are not
+    accepted on a tab session. DrissionPage 4.1 reaches the browser target
+    only through ``Chromium._run_cdp``, so that is the fallback when the
+    browser object has no public ``run_cdp``.
+
+    Args:
+        browser: DrissionPage Chromium instance (``tab.browser``)
+        cmd: CDP method name
+        **kwargs: CDP parameters
+
+    Returns:
+        dict: CDP result
+    """
+    run = getattr(browser, 'run_cdp', None) or getattr(browser, '_run_cdp')
+    return run(cmd, **kwargs)
+
+
+def in_domains(host: str, domains: Sequence[str]) -> bool:
+    """True if ``host`` is one of ``domains`` or a subdomain of one."""
+    return any(host == domain or host.endswith('.' + domain) for domain in domains)
+
+
+def mask_proxy(proxy: Optional[str]) -> Optional[str]:
+    """Hide the password of a 'username:password@ip:port' proxy."""
+    if not proxy or '@' not in proxy:
+        return proxy
+    credentials, address = proxy.rsplit('@', 1)
+    return f"{credentials.split(':', 1)[0]}:***@{address}"
@@ -0,0 +1,109 @@
+import logging
+import time
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+# Widget types RecaptchaSolver can solve (a visible checkbox that opens the audio challenge)
+SOLVABLE_TYPES = ('recaptcha_v2', 'recaptcha_enterprise')
+
+DETECTION_TIMEOUT = 10.0
+SETTLE_TIME = 0.3
+POLL_INTERVAL = 0.05
+
+# One evaluation checks every signature. "pending" means a reCAPTCHA script or
+# container is on the page but the anchor frame has not been rendered yet.
+DETECTION_SCRIPT = """
+const state = {type: null, sitekey: null, pending: false, ready: document.readyState === 'complete'};
+const frames = Array.from(document.querySelectorAll('iframe'));
+const sources = Array.from(document.scripts).map(s => s.src)
+    .concat(performance.getEntriesByType('resource').map(entry => entry.name));
+const api = sources.find(src => /\\/recaptcha\\/(api|enterprise)\\.js/.test(src));
+const render = api && api.match(/[?&]render=([^&]+)/);
+const v3key = render && render[1] !== 'explicit' ? decodeURIComponent(render[1]) : null;
+const anchor = frames.find(f => /\\/recaptcha\\/(api2|enterprise)\\/anchor/.test(f.src) || f.title === 'reCAPTCHA');
+if (anchor) {
+    const src = anchor.src || '';
+    const key = src.match(/[?&]k=([^&]+)/);
+    state.sitekey = key ? decodeURIComponent(key[1]) : null;
+    state.type = src.includes('/enterprise/') ? 'recaptcha_enterprise' : 'recaptcha_v2';
+    if (/[?&]size=invisible/.test(src)) {
+        // v3 renders an invisible anchor for its badge
+        state.type = v3key && v3key === state.sitekey ? 'recaptcha_v3' : state.type + '_invisible';
+    }
+    return state;
+}
+if (frames.some(f => /hcaptcha\\.com/.test(f.src))) {
+    state.type = 'hcaptcha';
+    return state;
+}
+if (frames.some(f => /challenges\\.cloudflare\\.com/.test(f.src))) {
+    state.type = 'turnstile';
+    return state;
+}
+const container = document.querySelector('.g-recaptcha, #recaptcha, [data-sitekey]');
+if (container) {
+    state.sitekey = container.getAttribute('data-sitekey');
+} else if (v3key) {
+    state.type = 'recaptcha_v3';
+    state.sitekey = v3key;
+    return state;
+}
+state.pending = Boolean(container || api);
+return state;
+"""
+
+
+def detect_captcha(driver: Any, timeout: float = DETECTION_TIMEOUT,
+                   settle: float = SETTLE_TIME) -> Dict[str, Any]:
+    """Detect the captcha widget on the current page.
+
+    Every poll is a single JS evaluation covering all signatures: reCAPTCHA
+    anchor frames (v2, invisible, Enterprise), api.js loaded with a v3
+    render key, hCaptcha and Turnstile frames. Returns as soon as a widget
+    appears. Without one, it returns once the document has loaded and no
+    reCAPTCHA script or container has been waiting to render for ``settle``
+    seconds, so pages without a captcha cost a fraction of a second.
+
+    Args:
+        driver: ChromiumPage or tab showing the page
+        timeout: Seconds to wait for a widget that is announced but not rendered
+        settle: Seconds the loaded page must stay widget-free
+
+    Returns:
+        Dict with 'found', 'type' (e.g. 'recaptcha_v2', 'recaptcha_v3',
+        'hcaptcha', or None), 'sitekey' and 'solvable'
+    """
+    deadline = time.time() + timeout
+    settled_since = None
+    state: Dict[str, Any] = {}
+    while True:
+        try:
+            state = driver.run_js(DETECTION_SCRIPT) or {}
+        except Exception as e:
+            logger.warning(f"Captcha detection script failed: {str(e)}")
+            state = {}
+
+        captcha_type = state.get('type')
+        if captcha_type:
+            return {
+                'found': True,
+                'type': captcha_type,
+                'sitekey': state.get('sitekey'),
+                'solvable': captcha_type in SOLVABLE_TYPES
+            }
+
+        now = time.time()
+        if state.get('ready') and not state.get('pending'):
+            settled_since = settled_since or now
+            if now - settled_since >= settle:
+                break
+        else:
+            settled_since = None
+        if now >= deadline:
+            if state.get('pending'):
+                logger.warning("reCAPTCHA script or container found, but the widget never rendered")
+            break
+        time.sleep(POLL_INTERVAL)
+
+    return {'found': False, 'type': None, 'sitekey': state.get('sitekey'), 'solvable': False}
@@ -0,0 +1,174 @@
+import logging
+import queue
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class JobManager:
+    """Runs solve jobs on a fixed-size worker pool fed by a bounded queue.
+
+    Submitting returns a job id immediately; callers poll ``get`` for the
+    status and result. Jobs still queued past their timeout are skipped, and
+    a job still running past its timeout is reported as ``timeout`` with its
+    late result discarded. Finished jobs are kept for ``result_ttl`` seconds.
+    """
+
+    # Job states
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    TIMEOUT = 'timeout'
+
+    # Defaults
+    DEFAULT_WORKERS = 2
+    DEFAULT_MAX_QUEUE = 50
+    DEFAULT_JOB_TIMEOUT = 120
+    DEFAULT_RESULT_TTL = 600
+
+    def __init__(self, handler: Callable[..., Dict[str, Any]], workers: int = DEFAULT_WORKERS,
+                 max_queue: int = DEFAULT_MAX_QUEUE, job_timeout: float = DEFAULT_JOB_TIMEOUT,
+                 result_ttl: float = DEFAULT_RESULT_TTL) -> None:
+        """Configure the manager and start its worker threads.
+
+        Args:
+            handler: Callable executing one job; receives the job parameters as kwargs
+            workers: Number of jobs executed concurrently
+            max_queue: Maximum number of jobs waiting for a worker
+            job_timeout: Default seconds a job may take from submission to result
+            result_ttl: Seconds a finished job stays retrievable
+        """
+        self.handler = handler
+        self.workers = workers
+        self.job_timeout = job_timeout
+        self.result_ttl = result_ttl
+
+        self._queue: "queue.Queue[str]" = queue.Queue(maxsize=max_queue)
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._running = 0
+        self._threads: List[threading.Thread] = []
+
+        for index in range(workers):
+            thread = threading.Thread(target=self._work, name=f"solve-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, params: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Queue a job for execution.
+
+        Args:
+            params: Keyword arguments passed to the handler
+            timeout: Seconds the job may take overall (default: job_timeout)
+
+        Returns:
+            Dict describing the queued job
+
+        Raises:
+            QueueFullError: If the queue is at capacity
+        """
+        self._purge()
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        job = {
+            'job_id': job_id,
+            'status': self.QUEUED,
+            'params': params,
+            'submitted_at': now,
+            'deadline': now + (self.job_timeout if timeout is None else timeout),
+            'started_at': None,
+            'finished_at': None,
+            'result': None,
+            'error': None
+        }
+
+        with self._lock:
+            self._jobs[job_id] = job
+        try:
+            self._queue.put_nowait(job_id)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job_id]
+            raise QueueFullError(f"Job queue is full ({self._queue.maxsize} waiting)")
+
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the public view of a job, or None if it is unknown or expired."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            self._check_deadline(job)
+            view = {key: value for key, value in job.items() if key not in ('params', 'deadline')}
+
+        if view['status'] == self.QUEUED:
+            view['queue_depth'] = self._queue.qsize()
+        return view
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth and worker occupancy."""
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+            return {
+                'workers': self.workers,
+                'busy_workers': self._running,
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'jobs': counts
+            }
+
+    def _work(self) -> None:
+        """Worker loop: execute queued jobs one at a time."""
+        while True:
+            job_id = self._queue.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or self._check_deadline(job):
+                    continue
+                job['status'] = self.RUNNING
+                job['started_at'] = time.time()
+                self._running += 1
+
+            try:
+                result, error = self.handler(**job['params']), None
+            except Exception as e:
+                logger.error(f"Job {job_id} failed: {str(e)}")
+                result, error = None, str(e)
+
+            with self._lock:
+                self._running -= 1
+                if self._check_deadline(job):
+                    logger.warning(f"Job {job_id} finished after its deadline; result discarded")
+                    continue
+                job['finished_at'] = time.time()
+                job['status'] = self.FAILED if error else self.DONE
+                job['result'] = result
+                job['error'] = error
+
+    def _check_deadline(self, job: Dict[str, Any]) -> bool:
+        """Mark an unfinished job as timed out once its deadline passes. Caller holds the lock."""
+        if job['status'] in (self.QUEUED, self.RUNNING) and time.time() > job['deadline']:
+            job['status'] = self.TIMEOUT
+            job['error'] = 'Job exceeded its timeout'
+            job['finished_at'] = job['finished_at'] or time.time()
+        return job['status'] == self.TIMEOUT
+
+    def _purge(self) -> None:
+        """Forget finished jobs older than result_ttl."""
+        cutoff = time.time() - self.result_ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job['finished_at'] and job['finished_at'] < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
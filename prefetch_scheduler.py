@@ -0,0 +1,136 @@
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+class PrefetchScheduler:
+    """Forecasts token demand per target and sizes the prefetch accordingly.
+
+    Arrivals feed an exponentially decayed rate estimate (an EWMA over a
+    ``half_life`` window) and every background solve feeds an EWMA of solve
+    latency and success rate. The target depth covers the demand expected
+    while one solve is in flight, plus a Poisson burst allowance, and is
+    capped by the demand the pool can serve before a token expires, so
+    stocking never outpaces what clients will actually consume. Targets whose
+    next request is unlikely to arrive within a token's lifetime get nothing.
+    """
+
+    # Defaults
+    DEFAULT_HALF_LIFE = 60.0
+    DEFAULT_LATENCY = 20.0
+    DEFAULT_BURST_Z = 1.0
+    LATENCY_ALPHA = 0.2
+    SUCCESS_ALPHA = 0.1
+    MIN_SUCCESS_RATE = 0.2
+    MIN_USE_PROBABILITY = 0.5
+
+    def __init__(self, half_life: float = DEFAULT_HALF_LIFE, burst_z: float = DEFAULT_BURST_Z,
+                 token_lifetime: float = 105.0, min_depth: int = 0, max_depth: int = 20,
+                 initial_latency: float = DEFAULT_LATENCY,
+                 clock: Callable[[], float] = time.time) -> None:
+        """Configure the forecaster.
+
+        Args:
+            half_life: Seconds after which an arrival weighs half in the rate estimate
+            burst_z: Standard deviations of Poisson demand covered on top of the mean
+            token_lifetime: Seconds a stocked token stays usable
+            min_depth: Lowest depth returned for a known target
+            max_depth: Highest depth returned for any target
+            initial_latency: Solve latency assumed before any solve completes
+            clock: Time source, overridable for simulations
+        """
+        self.tau = half_life / math.log(2)
+        self.burst_z = burst_z
+        self.token_lifetime = token_lifetime
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self.initial_latency = initial_latency
+        self.clock = clock
+
+        self._targets: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record_request(self, key: str) -> None:
+        """Record one client request for a target."""
+        now = self.clock()
+        with self._lock:
+            target = self._target(key)
+            target['rate'] = self._decayed_rate(target, now) + 1 / self.tau
+            target['last_arrival'] = now
+
+    def record_solve(self, key: str, latency: float, success: bool) -> None:
+        """Record the outcome of one background solve for a target.
+
+        Args:
+            key: Target key
+            latency: Seconds from dispatch to result
+            success: Whether the solve produced a token
+        """
+        with self._lock:
+            target = self._target(key)
+            if success:
+                target['latency'] += self.LATENCY_ALPHA * (latency - target['latency'])
+            target['success_rate'] += self.SUCCESS_ALPHA * (float(success) - target['success_rate'])
+
+    def rate(self, key: str) -> float:
+        """Current forecast of requests per second for a target."""
+        with self._lock:
+            target = self._targets.get(key)
+            return self._decayed_rate(target, self.clock()) if target else 0.0
+
+    def target_depth(self, key: str) -> int:
+        """Tokens a target should have in stock or in flight right now."""
+        with self._lock:
+            target = self._targets.get(key)
+            if target is None:
+                return self.min_depth
+            rate = self._decayed_rate(target, self.clock())
+            latency = target['latency']
+            success_rate = max(target['success_rate'], self.MIN_SUCCESS_RATE)
+
+        # A token nobody is likely to ask for before it expires is a wasted solve
+        if 1 - math.exp(-rate * self.token_lifetime) < self.MIN_USE_PROBABILITY:
+            return self.min_depth
+
+        # Demand arriving while a replacement solve is in flight
+        expected = rate * latency
+        needed = expected + self.burst_z * math.sqrt(expected)
+        # Tokens beyond what is consumed within their lifetime expire unused
+        needed = min(needed, rate * self.token_lifetime)
+        depth = math.ceil(needed / success_rate - 1e-9) if needed > 0 else 0
+        return max(self.min_depth, min(self.max_depth, depth))
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return the forecast inputs and resulting depth per target."""
+        with self._lock:
+            keys = list(self._targets)
+        snapshot = {}
+        for key in keys:
+            with self._lock:
+                target = dict(self._targets[key])
+            snapshot[key] = {
+                'rate_per_minute': round(self.rate(key) * 60, 2),
+                'solve_latency': round(target['latency'], 2),
+                'success_rate': round(target['success_rate'], 3),
+                'target_depth': self.target_depth(key)
+            }
+        return snapshot
+
+    def _target(self, key: str) -> Dict[str, float]:
+        """Return the state of a target, creating it on first sight. Caller holds the lock."""
+        target = self._targets.get(key)
+        if target is None:
+            target = self._targets[key] = {
+                'rate': 0.0,
+                'last_arrival': self.clock(),
+                'latency': self.initial_latency,
+                'success_rate': 1.0
+            }
+        return target
+
+    def _decayed_rate(self, target: Optional[Dict[str, float]], now: float) -> float:
+        """Rate estimate decayed to ``now``. Caller holds the lock."""
+        if target is None:
+            return 0.0
+        return target['rate'] * math.exp(-(now - target['last_arrival']) / self.tau)
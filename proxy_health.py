@@ -0,0 +1,232 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from browser_pool import mask_proxy
+
+logger = logging.getLogger(__name__)
+
+# Key of requests made without a proxy, from the server's own address
+DIRECT = 'direct'
+
+
+class CircuitOpenError(Exception):
+    """Raised when a proxy, or every configured proxy, is cooling down."""
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def proxy_host(proxy: Optional[str]) -> Optional[str]:
+    """Host of a 'ip:port' or 'username:password@ip:port' proxy, i.e. its exit address."""
+    if not proxy:
+        return None
+    address = proxy.rsplit('@', 1)[-1]
+    address = address.split('://', 1)[-1]
+    return address.rsplit(':', 1)[0] if ':' in address else address
+
+
+class Circuit:
+    """Failure bookkeeping of one proxy or exit address."""
+
+    def __init__(self) -> None:
+        self.consecutive_failures = 0
+        self.trips = 0
+        self.open_until = 0.0
+        self.trial_started: Optional[float] = None
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.last_failure: Optional[str] = None
+
+    def state(self, now: float) -> str:
+        if self.open_until > now:
+            return 'open'
+        return 'half_open' if self.trips and self.consecutive_failures else 'closed'
+
+
+class ProxyHealth:
+    """Circuit breaker per proxy and per exit address, driven by solve outcomes.
+
+    Bot detections, failed verifications and errors count as failures.
+    After ``failure_threshold`` consecutive failures the circuit opens for
+    ``base_cooldown`` seconds, doubling on every further trip up to
+    ``max_cooldown``. Once the cool-down ends, one trial request is let
+    through (half-open): success closes the circuit, failure reopens it.
+    Requests for an open proxy are rejected immediately.
+
+    Proxies sharing a host share an exit address, so a burned address opens
+    for every proxy on it. When ``proxies`` is configured, requests that do
+    not pin a proxy are routed to the healthiest one.
+    """
+
+    # Defaults
+    DEFAULT_FAILURE_THRESHOLD = 3
+    DEFAULT_BASE_COOLDOWN = 60
+    DEFAULT_MAX_COOLDOWN = 3600
+    # Seconds after which an unreported half-open trial no longer blocks others
+    TRIAL_TIMEOUT = 180
+
+    SUCCESS_OUTCOMES = ('checkbox', 'audio')
+    FAILURE_OUTCOMES = ('bot_detected', 'failed', 'error')
+
+    def __init__(self, proxies: Sequence[str] = (), failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 base_cooldown: float = DEFAULT_BASE_COOLDOWN, max_cooldown: float = DEFAULT_MAX_COOLDOWN,
+                 clock: Callable[[], float] = time.time) -> None:
+        """Configure the breaker.
+
+        Args:
+            proxies: Proxies to route unpinned requests through (empty: no routing)
+            failure_threshold: Consecutive failures that open a circuit
+            base_cooldown: Seconds a circuit stays open after its first trip
+            max_cooldown: Upper bound of the doubling cool-down
+            clock: Time source, overridable for tests
+        """
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1")
+
+        self.proxies = list(proxies)
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.clock = clock
+
+        self._circuits: Dict[str, Circuit] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, proxy: Optional[str] = None) -> Optional[str]:
+        """Admit a request, choosing its proxy when it does not pin one.
+
+        Args:
+            proxy: Proxy pinned by the client, or None
+
+        Returns:
+            The proxy to use (None for a direct connection)
+
+        Raises:
+            CircuitOpenError: If the pinned proxy, or every configured proxy, is open
+        """
+        with self._lock:
+            now = self.clock()
+            if proxy is None and self.proxies:
+                return self._choose(now)
+            wait = self._admit(proxy, now)
+            if wait:
+                for key in self._keys(proxy):
+                    self._circuits[key].rejected += 1
+                raise CircuitOpenError(f"Proxy {mask_proxy(proxy) or DIRECT} is cooling down after "
+                                       f"repeated bot detections", wait)
+            return proxy
+
+    def record(self, proxy: Optional[str], outcome: str) -> None:
+        """Record the outcome of a request admitted by ``acquire``.
+
+        Args:
+            proxy: Proxy the request used
+            outcome: Solve outcome; outcomes that say nothing about the proxy
+                (e.g. 'no_captcha') only end a half-open trial
+        """
+        with self._lock:
+            now = self.clock()
+            for key in self._keys(proxy):
+                circuit = self._circuits.setdefault(key, Circuit())
+                circuit.trial_started = None
+                if outcome in self.SUCCESS_OUTCOMES:
+                    circuit.successes += 1
+                    circuit.consecutive_failures = 0
+                    circuit.trips = 0
+                elif outcome in self.FAILURE_OUTCOMES:
+                    circuit.failures += 1
+                    circuit.consecutive_failures += 1
+                    circuit.last_failure = outcome
+                    if circuit.consecutive_failures >= self.failure_threshold:
+                        cooldown = min(self.base_cooldown * 2 ** circuit.trips, self.max_cooldown)
+                        circuit.trips += 1
+                        circuit.open_until = now + cooldown
+                        logger.warning(f"Circuit opened for {mask_proxy(key)} for {cooldown:.0f}s "
+                                       f"after {circuit.consecutive_failures} failures ({outcome})")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the state and counters of every tracked proxy and exit address."""
+        with self._lock:
+            now = self.clock()
+            circuits = {}
+            for key, circuit in self._circuits.items():
+                circuits[mask_proxy(key)] = {
+                    'state': circuit.state(now),
+                    'retry_after': round(max(circuit.open_until - now, 0), 1),
+                    'consecutive_failures': circuit.consecutive_failures,
+                    'trips': circuit.trips,
+                    'successes': circuit.successes,
+                    'failures': circuit.failures,
+                    'rejected': circuit.rejected,
+                    'last_failure': circuit.last_failure
+                }
+            return {
+                'proxies': len(self.proxies),
+                'failure_threshold': self.failure_threshold,
+                'circuits': circuits
+            }
+
+    def _keys(self, proxy: Optional[str]) -> List[str]:
+        """Circuits a request through ``proxy`` belongs to: the proxy and its exit address."""
+        if not proxy:
+            return [DIRECT]
+        host = proxy_host(proxy)
+        return [proxy, f"ip:{host}"] if host and host != proxy else [proxy]
+
+    def routable(self) -> List[str]:
+        """Configured proxies that would be admitted now, healthiest first."""
+        with self._lock:
+            now = self.clock()
+            return [proxy for proxy in sorted(self.proxies, key=self._score) if not self._wait(proxy, now)]
+
+    def _wait(self, proxy: Optional[str], now: float) -> float:
+        """Seconds until ``proxy`` may be used, 0 if it may be used now. Caller holds the lock."""
+        circuits = [self._circuits.setdefault(key, Circuit()) for key in self._keys(proxy)]
+        wait = max(circuit.open_until - now for circuit in circuits)
+        if wait > 0:
+            return wait
+        for circuit in circuits:
+            if circuit.state(now) == 'half_open' and circuit.trial_started is not None \
+                    and now - circuit.trial_started < self.TRIAL_TIMEOUT:
+                # One trial at a time; the others wait for its verdict
+                return self.TRIAL_TIMEOUT - (now - circuit.trial_started)
+        return 0
+
+    def _admit(self, proxy: Optional[str], now: float) -> float:
+        """Like ``_wait``, but an admitted request becomes the trial of half-open circuits."""
+        wait = self._wait(proxy, now)
+        if not wait:
+            for key in self._keys(proxy):
+                circuit = self._circuits[key]
+                if circuit.state(now) == 'half_open':
+                    circuit.trial_started = now
+        return wait
+
+    def _score(self, proxy: str) -> Tuple[int, float, int]:
+        """Sort key ranking proxies by recent failures, then by smoothed success rate.
+
+        A proxy ranks as the worse of its own circuit and its exit address's,
+        so a proxy on a burned address sorts behind one on a clean address.
+        """
+        scores = []
+        for key in self._keys(proxy):
+            circuit = self._circuits.get(key) or Circuit()
+            attempts = circuit.successes + circuit.failures
+            scores.append((circuit.consecutive_failures, -(circuit.successes + 1) / (attempts + 2), attempts))
+        return max(scores)
+
+    def _choose(self, now: float) -> str:
+        """Pick the admitted proxy with the best record. Caller holds the lock."""
+        waits = []
+        for proxy in sorted(self.proxies, key=self._score):
+            wait = self._admit(proxy, now)
+            if not wait:
+                return proxy
+            waits.append(wait)
+        for key in {key for proxy in self.proxies for key in self._keys(proxy)}:
+            self._circuits[key].rejected += 1
+        raise CircuitOpenError("Every configured proxy is cooling down", min(waits))
@@ -0,0 +1,268 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+from browser_pool import mask_proxy
+
+logger = logging.getLogger(__name__)
+
+# Key of requests made without a proxy
+DIRECT = 'direct'
+
+
+class RateLimitedError(Exception):
+    """Raised when a solve would have to wait longer than the scheduler allows."""
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Token bucket kept as a theoretical arrival time (GCRA).
+
+    ``tat`` is when the bucket would be full again; a start conforms while
+    it is no more than ``burst - 1`` intervals ahead of now.
+    """
+
+    def __init__(self, per_minute: float, burst: int) -> None:
+        if per_minute <= 0 or burst < 1:
+            raise ValueError("A bucket needs a positive rate and a burst of at least 1")
+        self.per_minute = per_minute
+        self.burst = burst
+        self.interval = 60.0 / per_minute
+        self.tolerance = (burst - 1) * self.interval
+        self.tat = 0.0
+        self.queued = 0
+        self.started = 0
+        self.delayed = 0
+        self.wait_total = 0.0
+
+    def earliest(self, now: float) -> float:
+        """Earliest time a new start would conform to the bucket."""
+        return max(now, self.tat - self.tolerance)
+
+    def take(self, now: float, waited: float) -> None:
+        """Spend a token on a start at ``now`` (not before ``earliest``)."""
+        self.tat = max(self.tat, now) + self.interval
+        self.started += 1
+        if waited > 0:
+            self.delayed += 1
+            self.wait_total += waited
+
+    def refund(self) -> None:
+        """Give back the token of a start that did not happen."""
+        self.tat -= self.interval
+        self.started -= 1
+
+    def idle(self, now: float) -> bool:
+        """True once the bucket is full again and nobody waits on it."""
+        return self.tat <= now and not self.queued
+
+
+# Domain and proxy buckets a start spends a token of
+Spent = Tuple[TokenBucket, TokenBucket]
+
+
+class RateScheduler:
+    """Paces outbound solves with token buckets per target domain and per proxy.
+
+    A solve starts once both the bucket of its domain and the bucket of its
+    proxy have a token; until then it sleeps until the later of the two
+    refills, rather than being dropped. Tokens are only spent when a solve
+    actually starts, so a solve held back by its domain does not block
+    other domains queued on the same proxy. Requests that do not pin a
+    proxy are given the candidate proxy whose bucket frees up first,
+    spreading load so every proxy stays under its budget.
+
+    Rates are solves per minute; ``burst`` solves may start back to back
+    after a quiet period. ``aacquire`` waits on the event loop instead, so
+    a queued solve costs a coroutine rather than a blocked thread.
+    """
+
+    # Defaults
+    DEFAULT_DOMAIN_RATE = 6.0
+    DEFAULT_DOMAIN_BURST = 2
+    DEFAULT_PROXY_RATE = 4.0
+    DEFAULT_PROXY_BURST = 1
+    # Idle buckets are dropped once this many are tracked
+    MAX_BUCKETS = 10000
+
+    def __init__(self, domain_rate: float = DEFAULT_DOMAIN_RATE, domain_burst: int = DEFAULT_DOMAIN_BURST,
+                 proxy_rate: float = DEFAULT_PROXY_RATE, proxy_burst: int = DEFAULT_PROXY_BURST,
+                 domain_limits: Optional[Dict[str, Tuple[float, int]]] = None,
+                 max_wait: Optional[float] = None, clock: Callable[[], float] = time.time,
+                 sleep: Callable[[float], None] = time.sleep) -> None:
+        """Configure the limits.
+
+        Args:
+            domain_rate: Solves per minute per target domain
+            domain_burst: Solves a domain may start back to back
+            proxy_rate: Solves per minute per proxy (and for direct connections)
+            proxy_burst: Solves a proxy may start back to back
+            domain_limits: (rate, burst) overrides per domain
+            max_wait: Seconds a solve may wait before RateLimitedError (None: always queue)
+            clock: Time source, overridable for tests
+            sleep: Sleep function, overridable for tests
+        """
+        # Validate the limits up front
+        TokenBucket(domain_rate, domain_burst)
+        TokenBucket(proxy_rate, proxy_burst)
+        for limit in (domain_limits or {}).values():
+            TokenBucket(*limit)
+
+        self.domain_limit = (domain_rate, domain_burst)
+        self.proxy_limit = (proxy_rate, proxy_burst)
+        self.domain_limits = {domain.lower(): limit for domain, limit in (domain_limits or {}).items()}
+        self.max_wait = max_wait
+        self.clock = clock
+        self.sleep = sleep
+
+        self._domains: Dict[str, TokenBucket] = {}
+        self._proxies: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, url: str, proxy: Optional[str] = None,
+                candidates: Sequence[str] = ()) -> Tuple[Optional[str], float, Spent]:
+        """Wait until a solve of ``url`` may start.
+
+        Args:
+            url: Target page
+            proxy: Proxy pinned by the client, or None
+            candidates: Proxies to choose from when ``proxy`` is None
+
+        Returns:
+            Tuple of (proxy to use, seconds waited, the buckets whose tokens
+            were spent, to hand to ``refund`` if the solve does not start)
+
+        Raises:
+            RateLimitedError: If the start is further away than ``max_wait``
+        """
+        domain = self._domain(url)
+        options = [proxy] if proxy or not candidates else list(candidates)
+        began = self.clock()
+        while True:
+            chosen, waited, delay, buckets = self._try_start(domain, options, began)
+            if not delay:
+                return chosen, waited, buckets
+            try:
+                self.sleep(delay)
+            finally:
+                self._dequeue(buckets)
+
+    async def aacquire(self, url: str, proxy: Optional[str] = None,
+                       candidates: Sequence[str] = ()) -> Tuple[Optional[str], float, Spent]:
+        """Awaitable acquire: the wait is an ``asyncio.sleep`` instead of a blocked thread."""
+        domain = self._domain(url)
+        options = [proxy] if proxy or not candidates else list(candidates)
+        began = self.clock()
+        while True:
+            chosen, waited, delay, buckets = self._try_start(domain, options, began)
+            if not delay:
+                return chosen, waited, buckets
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self._dequeue(buckets)
+
+    def refund(self, spent: Spent) -> None:
+        """Return the tokens ``acquire`` spent on a solve that was then refused.
+
+        The buckets are those ``acquire`` returned, so a bucket dropped and
+        recreated under the same key meanwhile is left alone.
+
+        Args:
+            spent: Buckets returned by ``acquire``
+        """
+        with self._lock:
+            for bucket in spent:
+                bucket.refund()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the limits and counters of every bucket."""
+        with self._lock:
+            now = self.clock()
+
+            def describe(bucket: TokenBucket) -> Dict[str, Any]:
+                return {
+                    'per_minute': bucket.per_minute,
+                    'burst': bucket.burst,
+                    'queued': bucket.queued,
+                    'started': bucket.started,
+                    'delayed': bucket.delayed,
+                    'wait_seconds': round(bucket.wait_total, 1),
+                    'next_start_in': round(max(bucket.earliest(now) - now, 0), 1)
+                }
+
+            return {
+                'domains': {domain: describe(bucket) for domain, bucket in self._domains.items()},
+                'proxies': {mask_proxy(key): describe(bucket) for key, bucket in self._proxies.items()}
+            }
+
+    def _try_start(self, domain: str, options: Sequence[Optional[str]],
+                   began: float) -> Tuple[Optional[str], float, float, Spent]:
+        """Start a solve now if its buckets allow it, else queue it on them.
+
+        Args:
+            domain: Target domain
+            options: Proxies to choose from
+            began: When the solve started waiting
+
+        Returns:
+            Tuple of (chosen proxy, seconds waited, seconds still to wait, the
+            domain and proxy buckets). With 0 still to wait the tokens are
+            taken; otherwise the solve is queued on both buckets until ``_dequeue``.
+
+        Raises:
+            RateLimitedError: If the start is further away than ``max_wait``
+        """
+        with self._lock:
+            now = self.clock()
+            domain_bucket = self._bucket(self._domains, domain, self.domain_limits.get(domain, self.domain_limit))
+            # The proxy whose token comes first; ties keep the candidates' order
+            best = None
+            for option in options:
+                bucket = self._bucket(self._proxies, option or DIRECT, self.proxy_limit)
+                earliest = max(domain_bucket.earliest(now), bucket.earliest(now))
+                if best is None or earliest < best[0]:
+                    best = (earliest, option, bucket)
+            start, chosen, proxy_bucket = best
+            buckets = (domain_bucket, proxy_bucket)
+
+            waited = now - began
+            if start <= now:
+                for bucket in buckets:
+                    bucket.take(now, waited)
+                return chosen, waited, 0.0, buckets
+            if self.max_wait is not None and start - began > self.max_wait:
+                raise RateLimitedError(f"Rate limit for {domain} via {mask_proxy(chosen) or DIRECT} "
+                                       f"would delay the solve by {start - now:.0f}s", start - now)
+            for bucket in buckets:
+                bucket.queued += 1
+        logger.info(f"Pacing solve of {domain} via {mask_proxy(chosen) or DIRECT}: waiting {start - now:.1f}s")
+        return chosen, waited, start - now, buckets
+
+    def _dequeue(self, buckets: Sequence[TokenBucket]) -> None:
+        """Take a solve that finished waiting off its buckets' queues."""
+        with self._lock:
+            for bucket in buckets:
+                bucket.queued -= 1
+
+    @staticmethod
+    def _domain(url: str) -> str:
+        """Domain whose bucket paces solves of ``url``."""
+        return (urlparse(url).hostname or url).lower()
+
+    def _bucket(self, buckets: Dict[str, TokenBucket], key: str, limit: Tuple[float, int]) -> TokenBucket:
+        """Bucket of ``key``, created on first use. Caller holds the lock."""
+        bucket = buckets.get(key)
+        if bucket is None:
+            if len(buckets) >= self.MAX_BUCKETS:
+                now = self.clock()
+                for stale in [name for name, candidate in buckets.items() if candidate.idle(now)]:
+                    del buckets[stale]
+            bucket = buckets[key] = TokenBucket(*limit)
+        return bucket
@@ -0,0 +1,293 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional, Sequence
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Steps whose duration depends on the target page rather than on Google
+WIDGET_STEPS = ('detection', 'anchor_iframe')
+CHECKBOX_STEP = 'checkbox_result'
+
+# Profile-derived timeouts stay within these bounds; the ceiling is
+# RecaptchaSolver.TIMEOUT_STANDARD, the fixed wait they replace
+MIN_TIMEOUT = 2.0
+MAX_TIMEOUT = 20.0
+TIMEOUT_MARGIN = 2.0
+
+
+def profile_key(url: str) -> str:
+    """Profile key of a target URL: host and path, without query or fragment."""
+    parsed = urlparse(url)
+    host = (parsed.hostname or '').lower()
+    port = f":{parsed.port}" if parsed.port else ''
+    return f"{host}{port}{parsed.path.rstrip('/') or '/'}"
+
+
+class SiteProfile:
+    """What solves of one target page have shown so far."""
+
+    # Latency samples kept per measurement
+    WINDOW = 50
+
+    def __init__(self) -> None:
+        self.captcha_type: Optional[str] = None
+        self.sitekey: Optional[str] = None
+        self.type_streak = 0
+        self.solves = 0
+        self.checkbox_attempts = 0
+        self.checkbox_passes = 0
+        self.mismatches = 0
+        self.widget_latency: Deque[float] = deque(maxlen=self.WINDOW)
+        self.checkbox_latency: Deque[float] = deque(maxlen=self.WINDOW)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'captcha_type': self.captcha_type,
+            'sitekey': self.sitekey,
+            'type_streak': self.type_streak,
+            'solves': self.solves,
+            'checkbox_attempts': self.checkbox_attempts,
+            'checkbox_passes': self.checkbox_passes,
+            'mismatches': self.mismatches,
+            'widget_latency': list(self.widget_latency),
+            'checkbox_latency': list(self.checkbox_latency)
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SiteProfile':
+        profile = cls()
+        for field in ('captcha_type', 'sitekey', 'type_streak', 'solves', 'checkbox_attempts',
+                      'checkbox_passes', 'mismatches'):
+            if field in data:
+                setattr(profile, field, data[field])
+        profile.widget_latency.extend(data.get('widget_latency', ()))
+        profile.checkbox_latency.extend(data.get('checkbox_latency', ()))
+        return profile
+
+
+class SiteProfiles:
+    """Learned profile per target page, used to skip detection and size waits.
+
+    Every solve records which widget the page showed (type and sitekey),
+    how long it took to appear and whether the checkbox alone passed. Once
+    a page has shown the same solvable widget ``min_samples`` times in a
+    row, solves skip the generic detection scan and wait for the anchor
+    frame directly. Waits for the widget and the checkbox verdict are
+    sized from the observed 95th percentile times TIMEOUT_MARGIN, within
+    MIN_TIMEOUT and MAX_TIMEOUT, instead of the fixed 20 s.
+
+    Profiles are keyed by host and path (see ``profile_key``) and live in
+    an in-memory LRU bounded by ``max_entries``. With a ``path`` they are
+    also written to a SQLite file, which survives restarts and is consulted
+    on a memory miss.
+    """
+
+    # Defaults
+    DEFAULT_MAX_ENTRIES = 512
+    DEFAULT_MIN_SAMPLES = 5
+    PERCENTILE = 95
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, path: Optional[str] = None,
+                 min_samples: int = DEFAULT_MIN_SAMPLES) -> None:
+        """Create the store.
+
+        Args:
+            max_entries: Profiles kept in memory before the least recently used is dropped
+            path: Optional SQLite file for the persistent tier
+            min_samples: Solves of a page before its profile is used
+        """
+        if min_samples < 1:
+            raise ValueError("min_samples must be at least 1")
+
+        self.max_entries = max_entries
+        self.path = path
+        self.min_samples = min_samples
+
+        self._profiles: 'OrderedDict[str, SiteProfile]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'plans': 0, 'skipped_detection': 0, 'mismatches': 0}
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS site_profiles "
+                "(key TEXT PRIMARY KEY, profile TEXT NOT NULL, updated_at REAL)"
+            )
+            self._db.commit()
+
+    def plan(self, url: str, solvable_types: Sequence[str] = ()) -> Optional[Dict[str, Any]]:
+        """How to solve ``url``, from its profile.
+
+        Args:
+            url: Target URL
+            solvable_types: Widget types the solver handles; only those skip detection
+
+        Returns:
+            None until the page has ``min_samples`` solves, else a dict with
+            'captcha_type' and 'sitekey' (set when detection can be skipped),
+            'detection_timeout', 'timeouts' (solver step name to seconds)
+            and 'checkbox_rate'
+        """
+        with self._lock:
+            profile = self._get(profile_key(url))
+            if profile is None or profile.solves < self.min_samples:
+                return None
+            self._stats['plans'] += 1
+
+            known = (profile.captcha_type in solvable_types and profile.type_streak >= self.min_samples)
+            if known:
+                self._stats['skipped_detection'] += 1
+            widget_timeout = self._timeout(profile.widget_latency)
+            timeouts = {}
+            if widget_timeout is not None:
+                timeouts['anchor_iframe'] = widget_timeout
+            checkbox_timeout = self._timeout(profile.checkbox_latency)
+            if checkbox_timeout is not None:
+                timeouts[CHECKBOX_STEP] = checkbox_timeout
+            return {
+                'captcha_type': profile.captcha_type if known else None,
+                'sitekey': profile.sitekey if known else None,
+                'detection_timeout': widget_timeout,
+                'timeouts': timeouts,
+                'checkbox_rate': self._checkbox_rate(profile)
+            }
+
+    def record(self, url: str, captcha_type: Optional[str], sitekey: Optional[str],
+               stages: Dict[str, float], outcome: str) -> None:
+        """Learn from a finished solve.
+
+        Args:
+            url: Target URL
+            captcha_type: Widget type the page showed, None if it had none
+            sitekey: Sitekey of the widget
+            stages: Stage timings of the solve
+            outcome: Solve outcome ('checkbox', 'audio', 'no_captcha', ...)
+        """
+        key = profile_key(url)
+        with self._lock:
+            profile = self._get(key) or SiteProfile()
+            profile.solves += 1
+            if captcha_type == profile.captcha_type and sitekey == profile.sitekey:
+                profile.type_streak += 1
+            else:
+                profile.captcha_type, profile.sitekey, profile.type_streak = captcha_type, sitekey, 1
+
+            # Time to widget: the detection scan, or the direct anchor wait when it was skipped
+            if captcha_type and 'checkbox_click' in stages:
+                profile.widget_latency.append(sum(stages.get(step, 0.0) for step in WIDGET_STEPS))
+            if CHECKBOX_STEP in stages:
+                profile.checkbox_latency.append(stages[CHECKBOX_STEP])
+                profile.checkbox_attempts += 1
+                if outcome == 'checkbox':
+                    profile.checkbox_passes += 1
+            self._remember(key, profile)
+            self._save(key, profile)
+
+    def mismatch(self, url: str) -> None:
+        """Record that a page no longer showed its profiled widget; detection runs again."""
+        key = profile_key(url)
+        with self._lock:
+            profile = self._get(key)
+            self._stats['mismatches'] += 1
+            if profile is not None:
+                profile.mismatches += 1
+                profile.type_streak = 0
+                self._save(key, profile)
+        logger.info(f"Site profile of {key} is out of date, detecting the widget again")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters and a summary of every profile in memory."""
+        with self._lock:
+            sites = {}
+            for key, profile in self._profiles.items():
+                sites[key] = {
+                    'captcha_type': profile.captcha_type,
+                    'solves': profile.solves,
+                    'type_streak': profile.type_streak,
+                    'widget_p95': self._percentile(profile.widget_latency),
+                    'checkbox_p95': self._percentile(profile.checkbox_latency),
+                    'checkbox_rate': self._checkbox_rate(profile),
+                    'mismatches': profile.mismatches
+                }
+            return {
+                'profiles': len(self._profiles),
+                'max_entries': self.max_entries,
+                'min_samples': self.min_samples,
+                'persistent': self._db is not None,
+                **self._stats,
+                'sites': sites
+            }
+
+    def close(self) -> None:
+        """Close the persistent tier."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _timeout(self, latencies: Deque[float]) -> Optional[float]:
+        """Wait covering the observed latencies, or None before ``min_samples`` of them."""
+        observed = self._percentile(latencies)
+        if observed is None:
+            return None
+        return round(min(max(observed * TIMEOUT_MARGIN, MIN_TIMEOUT), MAX_TIMEOUT), 2)
+
+    def _percentile(self, latencies: Deque[float]) -> Optional[float]:
+        if len(latencies) < self.min_samples:
+            return None
+        ordered = sorted(latencies)
+        index = min(len(ordered) - 1, int(round(self.PERCENTILE / 100 * (len(ordered) - 1))))
+        return round(ordered[index], 3)
+
+    @staticmethod
+    def _checkbox_rate(profile: SiteProfile) -> Optional[float]:
+        if not profile.checkbox_attempts:
+            return None
+        return round(profile.checkbox_passes / profile.checkbox_attempts, 3)
+
+    def _get(self, key: str) -> Optional[SiteProfile]:
+        """Profile from memory or the persistent tier. Caller holds the lock."""
+        profile = self._profiles.get(key)
+        if profile is not None:
+            self._profiles.move_to_end(key)
+        elif self._db is not None:
+            profile = self._load(key)
+            if profile is not None:
+                self._remember(key, profile)
+        return profile
+
+    def _remember(self, key: str, profile: SiteProfile) -> None:
+        """Insert into the memory tier, evicting the least recently used. Caller holds the lock."""
+        self._profiles[key] = profile
+        self._profiles.move_to_end(key)
+        while len(self._profiles) > self.max_entries:
+            self._profiles.popitem(last=False)
+
+    def _load(self, key: str) -> Optional[SiteProfile]:
+        """Read a profile from the persistent tier. Caller holds the lock."""
+        row = self._db.execute("SELECT profile FROM site_profiles WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        try:
+            return SiteProfile.from_dict(json.loads(row[0]))
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable site profile {key}: {str(e)}")
+            return None
+
+    def _save(self, key: str, profile: SiteProfile) -> None:
+        """Write a profile to the persistent tier, if any. Caller holds the lock."""
+        if self._db is None:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO site_profiles (key, profile, updated_at) VALUES (?, ?, ?)",
+                (key, json.dumps(profile.to_dict()), time.time())
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not persist site profile: {str(e)}")
@@ -0,0 +1,411 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional, Type
+
+import speech_recognition
+
+logger = logging.getLogger(__name__)
+
+
+class RecognitionError(Exception):
+    """Raised when a backend cannot produce a transcript."""
+
+
+class Transcript(NamedTuple):
+    """Text recognised from a clip, with the backend's confidence in [0, 1]."""
+    text: str
+    confidence: Optional[float]
+    backend: str
+
+
+class RecognitionBackend:
+    """Interface for speech-recognition engines used by RecaptchaSolver."""
+
+    name = 'base'
+
+    def transcribe(self, audio: speech_recognition.AudioData) -> Transcript:
+        """Recognise the speech in a clip.
+
+        Args:
+            audio: Mono 16-bit PCM clip
+
+        Returns:
+            Transcript: Recognised text and confidence
+
+        Raises:
+            RecognitionError: If nothing could be recognised
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release resources held by the backend."""
+
+    def stats(self) -> Dict[str, Any]:
+        """Return backend statistics for the health endpoint."""
+        return {'backend': self.name}
+
+
+class GoogleBackend(RecognitionBackend):
+    """Google Web Speech API through speech_recognition (network round trip)."""
+
+    name = 'google'
+
+    def __init__(self, language: str = 'en-US') -> None:
+        self.language = language
+
+    def transcribe(self, audio: speech_recognition.AudioData) -> Transcript:
+        recognizer = speech_recognition.Recognizer()
+        try:
+            response = recognizer.recognize_google(audio, language=self.language, show_all=True)
+        except speech_recognition.RequestError as e:
+            raise RecognitionError(f"Google recognition request failed: {str(e)}")
+
+        alternatives = response.get('alternative') if isinstance(response, dict) else None
+        if not alternatives:
+            raise RecognitionError("Google recognition returned no transcript")
+        best = alternatives[0]
+        return Transcript(best['transcript'], best.get('confidence'), self.name)
+
+
+class ProcessPoolBackend(RecognitionBackend):
+    """Runs an offline model in worker processes that load it once at startup.
+
+    ``loader`` runs once in every worker and returns the model, which is kept
+    in the worker for its lifetime; ``transcriber`` then handles each clip.
+    Both must be module-level functions so they can be sent to the workers.
+    Recognition throughput scales with the number of workers (CPU cores).
+    """
+
+    name = 'offline'
+    DEFAULT_TIMEOUT = 30
+
+    def __init__(self, loader: Callable[..., Any], transcriber: Callable[[Any, bytes, int], Transcript],
+                 loader_args: tuple = (), workers: Optional[int] = None,
+                 timeout: float = DEFAULT_TIMEOUT) -> None:
+        """Start the worker processes.
+
+        Args:
+            loader: Module-level function returning the loaded model
+            transcriber: Module-level function (model, pcm, sample_rate) -> Transcript
+            loader_args: Arguments passed to ``loader``
+            workers: Number of worker processes (default: CPU count)
+            timeout: Seconds to wait for one clip
+        """
+        self.timeout = timeout
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(loader, loader_args, transcriber)
+        )
+        self.warm_up()
+
+    def warm_up(self) -> None:
+        """Start every worker now so model loading stays off the solve path."""
+        futures = [self._executor.submit(_worker_ready) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def transcribe(self, audio: speech_recognition.AudioData) -> Transcript:
+        future = self._executor.submit(_transcribe_in_worker, audio.get_raw_data(convert_width=2),
+                                       audio.sample_rate)
+        try:
+            transcript = future.result(timeout=self.timeout)
+        except RecognitionError:
+            raise
+        except Exception as e:
+            future.cancel()
+            raise RecognitionError(f"{self.name} recognition failed: {str(e) or type(e).__name__}")
+        return transcript._replace(backend=self.name)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class VoskBackend(ProcessPoolBackend):
+    """CPU-only offline recognition with a Vosk (Kaldi) model.
+
+    Download a model (e.g. vosk-model-small-en-us) from
+    https://alphacephei.com/vosk/models and pass its directory.
+    """
+
+    name = 'vosk'
+
+    def __init__(self, model_path: str, workers: Optional[int] = None,
+                 timeout: float = ProcessPoolBackend.DEFAULT_TIMEOUT) -> None:
+        if not os.path.isdir(model_path):
+            raise ValueError(f"Vosk model directory not found: {model_path}")
+        super().__init__(_load_vosk_model, _vosk_transcribe, loader_args=(model_path,),
+                         workers=workers, timeout=timeout)
+
+
+class HedgedBackend(RecognitionBackend):
+    """Sends one clip to several backends and keeps the first good answer.
+
+    A result is accepted as soon as its confidence reaches ``min_confidence``
+    or ``agreement`` backends return the same words; the backends still
+    running are then cancelled (or, if already running, ignored). If none
+    qualifies, the most confident result wins once all have answered.
+
+    By default all backends start at once. With ``hedge_percentile`` they are
+    staggered instead: the next backend only starts if the previous one has
+    not answered within that percentile of its observed latency (or failed),
+    so the extra load is paid only on the slow tail.
+
+    Backends run on a thread pool shared by every clip, with one thread per
+    backend for each of ``concurrency`` clips. A clip's ``timeout`` starts
+    when its first backend starts running, so time spent queued behind other
+    clips does not count. A backend still running when its clip is decided
+    keeps its thread until it returns.
+    """
+
+    name = 'hedged'
+
+    # Defaults
+    DEFAULT_MIN_CONFIDENCE = 0.8
+    DEFAULT_AGREEMENT = 2
+    DEFAULT_HEDGE_DELAY = 3.0
+    DEFAULT_TIMEOUT = 30
+    DEFAULT_CONCURRENCY = 4
+    LATENCY_WINDOW = 200
+    MIN_LATENCY_SAMPLES = 10
+
+    def __init__(self, backends: List[RecognitionBackend],
+                 min_confidence: float = DEFAULT_MIN_CONFIDENCE,
+                 agreement: int = DEFAULT_AGREEMENT,
+                 hedge_percentile: Optional[float] = None,
+                 hedge_delay: float = DEFAULT_HEDGE_DELAY,
+                 timeout: float = DEFAULT_TIMEOUT,
+                 concurrency: int = DEFAULT_CONCURRENCY) -> None:
+        """Configure the race.
+
+        Args:
+            backends: Backends in order of preference; the first is the primary
+            min_confidence: Confidence at which a single result is accepted
+            agreement: Number of backends agreeing on the words for a result to be accepted
+            hedge_percentile: Stagger backends, starting the next one after this
+                percentile (0-100) of the previous one's latency; None starts all at once
+            hedge_delay: Stagger used until enough latencies have been observed
+            timeout: Seconds to wait for any acceptable result, from the moment
+                the first backend starts running
+            concurrency: Clips expected to be recognised at once, usually the
+                number of concurrent solves; sizes the thread pool
+        """
+        if not backends:
+            raise ValueError("HedgedBackend needs at least one backend")
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.backends = backends
+        self.min_confidence = min_confidence
+        self.agreement = agreement
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay
+        self.timeout = timeout
+        self.concurrency = concurrency
+
+        self._executor = ThreadPoolExecutor(max_workers=concurrency * len(backends),
+                                            thread_name_prefix='recognition')
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, Deque[float]] = {
+            backend.name: deque(maxlen=self.LATENCY_WINDOW) for backend in backends
+        }
+        self._stats = {'clips': 0, 'hedges': 0, 'failed': 0,
+                       'wins': {backend.name: 0 for backend in backends}}
+
+    def transcribe(self, audio: speech_recognition.AudioData) -> Transcript:
+        waiting = list(self.backends)
+        running: Dict[Future, RecognitionBackend] = {}
+        results: List[Transcript] = []
+        errors: List[str] = []
+        # Times at which this clip's backends began running, appended by the pool threads
+        started: List[float] = []
+        next_start = time.time()
+
+        with self._lock:
+            self._stats['clips'] += 1
+
+        try:
+            while waiting or running:
+                now = time.time()
+                # Until a backend runs the deadline has not started; it can be
+                # no earlier than a full timeout from now
+                deadline = min(started) + self.timeout if started else now + self.timeout
+                if now >= deadline:
+                    break
+                # Start the next backend: immediately in parallel mode, once the
+                # stagger has passed in hedged mode, or when nothing else is running
+                if waiting and (now >= next_start or not running):
+                    backend = waiting.pop(0)
+                    if running:
+                        with self._lock:
+                            self._stats['hedges'] += 1
+                    future = self._executor.submit(self._timed_transcribe, backend, audio, started)
+                    running[future] = backend
+                    next_start = now + self._stagger(backend)
+                    continue
+
+                wake = min(deadline, next_start) if waiting else deadline
+                done, _ = wait(list(running), timeout=max(0.0, wake - now),
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    backend = running.pop(future)
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        errors.append(f"{backend.name}: {str(e)}")
+                        next_start = time.time()
+                        continue
+                    accepted = self._accept(results)
+                    if accepted is not None:
+                        return self._win(accepted)
+        finally:
+            for future in running:
+                future.cancel()
+
+        if results:
+            best = max(results, key=lambda result: result.confidence or 0.0)
+            return self._win(best)
+        with self._lock:
+            self._stats['failed'] += 1
+        if errors:
+            raise RecognitionError(f"All recognition backends failed ({'; '.join(errors)})")
+        raise RecognitionError(f"No recognition backend answered within {self.timeout}s")
+
+    def latency_percentile(self, backend_name: str, percentile: float) -> Optional[float]:
+        """Observed latency percentile of a backend, or None before MIN_LATENCY_SAMPLES."""
+        with self._lock:
+            latencies = sorted(self._latencies.get(backend_name, ()))
+        if len(latencies) < self.MIN_LATENCY_SAMPLES:
+            return None
+        index = min(len(latencies) - 1, int(round(percentile / 100 * (len(latencies) - 1))))
+        return latencies[index]
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for backend in self.backends:
+            backend.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {'backend': self.name, **self._stats, 'wins': dict(self._stats['wins'])}
+        stats['latency_p50'] = {backend.name: self.latency_percentile(backend.name, 50)
+                                for backend in self.backends}
+        stats['latency_p95'] = {backend.name: self.latency_percentile(backend.name, 95)
+                                for backend in self.backends}
+        return stats
+
+    def _timed_transcribe(self, backend: RecognitionBackend, audio: speech_recognition.AudioData,
+                          started: List[float]) -> Transcript:
+        """Run one backend, noting when it started, and record its latency on success."""
+        start = time.time()
+        started.append(start)
+        transcript = backend.transcribe(audio)
+        with self._lock:
+            self._latencies[backend.name].append(time.time() - start)
+        return transcript
+
+    def _stagger(self, backend: RecognitionBackend) -> float:
+        """Seconds to give a backend before the next one is started."""
+        if self.hedge_percentile is None:
+            return 0.0
+        observed = self.latency_percentile(backend.name, self.hedge_percentile)
+        return self.hedge_delay if observed is None else observed
+
+    def _accept(self, results: List[Transcript]) -> Optional[Transcript]:
+        """Return a result that meets the confidence or agreement threshold, if any."""
+        latest = results[-1]
+        if latest.confidence is not None and latest.confidence >= self.min_confidence:
+            return latest
+        words = _normalise(latest.text)
+        agreeing = [result for result in results if _normalise(result.text) == words]
+        if len(agreeing) >= self.agreement:
+            return max(agreeing, key=lambda result: result.confidence or 0.0)
+        return None
+
+    def _win(self, transcript: Transcript) -> Transcript:
+        """Count a win for the backend that produced the returned transcript."""
+        with self._lock:
+            if transcript.backend in self._stats['wins']:
+                self._stats['wins'][transcript.backend] += 1
+        return transcript
+
+
+def _normalise(text: str) -> str:
+    """Lower-case words without punctuation, for comparing transcripts."""
+    return ' '.join(re.sub(r'[^\w\s]', ' ', text.lower()).split())
+
+
+BACKENDS: Dict[str, Type[RecognitionBackend]] = {
+    GoogleBackend.name: GoogleBackend,
+    VoskBackend.name: VoskBackend,
+    HedgedBackend.name: HedgedBackend
+}
+
+
+def create_backend(name: str, **options: Any) -> RecognitionBackend:
+    """Instantiate a registered backend by name.
+
+    Args:
+        name: Backend name ('google', 'vosk' or 'hedged')
+        **options: Backend constructor arguments (e.g. model_path, workers)
+
+    Returns:
+        RecognitionBackend: The backend
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown recognition backend '{name}', choose from {sorted(BACKENDS)}")
+    return BACKENDS[name](**options)
+
+
+# Worker-process state for ProcessPoolBackend
+_worker_model = None
+_worker_transcriber = None
+
+
+def _init_worker(loader: Callable[..., Any], loader_args: tuple,
+                 transcriber: Callable[[Any, bytes, int], Transcript]) -> None:
+    """Load the model once when a worker process starts."""
+    global _worker_model, _worker_transcriber
+    _worker_model = loader(*loader_args)
+    _worker_transcriber = transcriber
+
+
+def _worker_ready() -> bool:
+    """No-op task used to spawn workers ahead of the first clip."""
+    return _worker_model is not None
+
+
+def _transcribe_in_worker(pcm: bytes, sample_rate: int) -> Transcript:
+    """Transcribe one clip with the model preloaded in this worker."""
+    return _worker_transcriber(_worker_model, pcm, sample_rate)
+
+
+def _load_vosk_model(model_path: str) -> Any:
+    """Load a Vosk model; runs in the worker process."""
+    import vosk
+
+    vosk.SetLogLevel(-1)
+    return vosk.Model(model_path)
+
+
+def _vosk_transcribe(model: Any, pcm: bytes, sample_rate: int) -> Transcript:
+    """Transcribe mono 16-bit PCM with a loaded Vosk model."""
+    import vosk
+
+    recognizer = vosk.KaldiRecognizer(model, sample_rate)
+    recognizer.SetWords(True)
+    recognizer.AcceptWaveform(pcm)
+    result = json.loads(recognizer.FinalResult())
+
+    text = result.get('text', '').strip()
+    if not text:
+        raise RecognitionError("Vosk recognised no speech")
+    words = result.get('result') or []
+    confidence = sum(word['conf'] for word in words) / len(words) if words else None
+    return Transcript(text, confidence, VoskBackend.name)
@@ -45,19 +45,78 @@ def check_dependencies():
     print("✅ All dependencies are installed!")
     return True
 
-def start_api_server(host='0.0.0.0', port=5000, debug=False):
+def start_api_server(host='0.0.0.0', port=5000, debug=False, pool_size=0,
+                     pool_max_uses=25, pool_max_age=900, contexts=0, keyed_pool=0, proxy_breaker=False,
+                     proxies=None, proxy_failures=3, proxy_cooldown=60, domain_rate=0,
+                     domain_burst=2, proxy_rate=4, proxy_burst=1, domain_limits=None,
+                     max_rate_wait=None, job_workers=2,
+                     job_queue_size=50, job_timeout=120, prefill=None, prefill_depth=2,
+                     prefill_workers=2, prefill_adaptive=False, recognizer='google',
+                     vosk_model=None, recognizer_workers=None, transcript_cache=0,
+                     transcript_cache_path=None, site_profiles=0, site_profiles_path=None,
+                     profile_min_samples=5, adaptive_timeouts=False, timeout_percentile=99,
+                     timeout_margin=2.0, timeout_floor=2.0, timeout_ceiling=20.0, challenge_retries=0,
+                     min_confidence=0.8, hedge_percentile=None, recognizer_concurrency=None,
+                     asgi=False, workers=None, max_pending=1000, worker_solves=None):
     """Start the API server."""
     print(f"🚀 Starting reCAPTCHA Solver API...")
+    print(f"   Server: {'ASGI (uvicorn), ' + str(workers or os.cpu_count()) + ' solver process(es)' if asgi else 'Flask'}")
     print(f"   Host: {host}")
     print(f"   Port: {port}")
     print(f"   Debug: {debug}")
+    print(f"   Browser pool: {pool_size if pool_size else 'disabled'}")
+    print(f"   Shared browser contexts: {contexts if contexts else 'disabled'}")
+    print(f"   Proxy/user-agent browser pool: {keyed_pool if keyed_pool else 'disabled'}")
+    print(f"   Proxy circuit breaker: {'enabled' if proxy_breaker or proxies else 'disabled'}"
+          f"{f' ({len(proxies)} routable proxies)' if proxies else ''}")
+    print(f"   Rate limits: {f'{domain_rate}/min per domain, {proxy_rate}/min per proxy' if domain_rate else 'disabled'}")
+    print(f"   Job workers: {job_workers} (queue size {job_queue_size})")
+    print(f"   Token pool targets: {len(prefill) if prefill else 'none'}")
+    print(f"   Speech recognition: {recognizer}")
+    print(f"   Transcript cache: {transcript_cache if transcript_cache else 'disabled'}")
+    print(f"   Site profiles: {site_profiles if site_profiles else 'disabled'}")
+    print(f"   Challenge retries: {challenge_retries}")
+    print(f"   Adaptive timeouts: {f'p{timeout_percentile:g} + {timeout_margin:g}s' if adaptive_timeouts else 'disabled'}")
     print(f"   URL: http://{host}:{port}")
     print("\n" + "="*50)
     
+    solver_settings = dict(
+        pool_size=pool_size, pool_max_uses=pool_max_uses, pool_max_age=pool_max_age,
+        contexts=contexts, keyed_pool=keyed_pool, proxy_breaker=proxy_breaker, proxies=proxies,
+        proxy_failures=proxy_failures, proxy_cooldown=proxy_cooldown, domain_rate=domain_rate,
+        domain_burst=domain_burst, proxy_rate=proxy_rate, proxy_burst=proxy_burst,
+        domain_limits=domain_limits, max_rate_wait=max_rate_wait, recognizer=recognizer, vosk_model=vosk_model,
+        recognizer_workers=recognizer_workers, min_confidence=min_confidence,
+        hedge_percentile=hedge_percentile, recognizer_concurrency=recognizer_concurrency,
+        transcript_cache=transcript_cache,
+        transcript_cache_path=transcript_cache_path, site_profiles=site_profiles,
+        site_profiles_path=site_profiles_path, profile_min_samples=profile_min_samples,
+        adaptive_timeouts=adaptive_timeouts, timeout_percentile=timeout_percentile,
+        timeout_margin=timeout_margin, timeout_floor=timeout_floor, timeout_ceiling=timeout_ceiling,
+        challenge_retries=challenge_retries
+    )
+    
     try:
+        if asgi:
+            # Solves run in worker processes, each configured with solver_settings
+            import uvicorn
+            from asgi import create_app
+            uvicorn.run(create_app(workers=workers, max_pending=max_pending, solves_per_worker=worker_solves,
+                                   **solver_settings),
+                        host=host, port=port, log_level='debug' if debug else 'info')
+            return True
+        
         # Import and run the Flask app
-        from api import app
-        app.run(debug=debug, host=host, port=port)
+        from api import app, configure_solver, init_job_manager, init_token_pool
+        configure_solver(**solver_settings)
+        init_job_manager(workers=job_workers, max_queue=job_queue_size, job_timeout=job_timeout)
+        if prefill:
+            pool = init_token_pool(fill_workers=prefill_workers, adaptive=prefill_adaptive)
+            for url in prefill:
+                pool.register(url, depth=prefill_depth)
+        # The reloader would launch the pooled browsers twice
+        app.run(debug=debug, host=host, port=port,
+                use_reloader=debug and not (pool_size or contexts))
     except KeyboardInterrupt:
         print("\n\n🛑 Server stopped by user")
     except Exception as e:
@@ -77,6 +136,19 @@ Examples:
   python start_api.py --port 8080        # Start on port 8080
   python start_api.py --debug             # Start in debug mode
   python start_api.py --host 127.0.0.1   # Start on localhost only
+  python start_api.py --pool-size 4      # Keep 4 warm browsers ready
+  python start_api.py --contexts 6       # Run 6 isolated solves in one browser
+  python start_api.py --keyed-pool 8     # Reuse warm browsers per proxy/user agent
+  python start_api.py --proxies a:8080,b:8080   # Route around bot-detected proxies
+  python start_api.py --domain-rate 6 --proxy-rate 4 --proxies a:8080,b:8080   # Pace bursts
+  python start_api.py --prefill https://example.com/form   # Keep pre-solved tokens ready
+  python start_api.py --recognizer vosk --vosk-model ./vosk-model-small-en-us   # Offline recognition
+  python start_api.py --recognizer vosk,google --vosk-model ./model --hedge-percentile 95   # Hedge on the slow tail
+  python start_api.py --transcript-cache 2048 --transcript-cache-path transcripts.db   # Reuse transcripts
+  python start_api.py --site-profiles 512 --site-profiles-path profiles.db   # Learn each target page
+  python start_api.py --adaptive-timeouts --timeout-percentile 99   # Fail hung steps fast
+  python start_api.py --challenge-retries 2   # Retry rejected transcripts with a new clip in place
+  python start_api.py --asgi --workers 4 --pool-size 2   # asyncio server, 4 solver processes
         """
     )
     
@@ -99,6 +171,298 @@ Examples:
         help='Run in debug mode'
     )
     
+    parser.add_argument(
+        '--pool-size',
+        type=int,
+        default=0,
+        help='Number of pre-launched browsers to keep warm (default: 0, disabled)'
+    )
+    
+    parser.add_argument(
+        '--pool-max-uses',
+        type=int,
+        default=25,
+        help='Solves served by a pooled browser before it is recycled (default: 25)'
+    )
+    
+    parser.add_argument(
+        '--pool-max-age',
+        type=float,
+        default=900,
+        help='Seconds a pooled browser may live before it is recycled (default: 900)'
+    )
+    
+    parser.add_argument(
+        '--contexts',
+        type=int,
+        default=0,
+        help='Concurrent isolated browser contexts in one shared browser (default: 0, disabled)'
+    )
+    
+    parser.add_argument(
+        '--keyed-pool',
+        type=int,
+        default=0,
+        help='Browsers kept warm per proxy and user agent, across all keys (default: 0, disabled)'
+    )
+    
+    parser.add_argument(
+        '--proxy-breaker',
+        action='store_true',
+        help='Reject requests for proxies that keep getting bot-detected until they cool down'
+    )
+    
+    parser.add_argument(
+        '--proxies',
+        type=lambda value: [proxy.strip() for proxy in value.split(',') if proxy.strip()],
+        default=None,
+        help='Comma-separated proxies; requests without a proxy use the healthiest one (implies --proxy-breaker)'
+    )
+    
+    parser.add_argument(
+        '--proxy-failures',
+        type=int,
+        default=3,
+        help='Consecutive failures that open a proxy circuit (default: 3)'
+    )
+    
+    parser.add_argument(
+        '--proxy-cooldown',
+        type=float,
+        default=60,
+        help='Seconds a proxy circuit stays open after its first trip, doubling on each trip (default: 60)'
+    )
+    
+    parser.add_argument(
+        '--domain-rate',
+        type=float,
+        default=0,
+        help='Solves per minute started against one target domain; excess solves wait their turn '
+             '(default: 0, no pacing)'
+    )
+    
+    parser.add_argument(
+        '--domain-burst',
+        type=int,
+        default=2,
+        help='Solves a domain may start back to back (default: 2)'
+    )
+    
+    parser.add_argument(
+        '--domain-limit',
+        action='append',
+        default=[],
+        metavar='DOMAIN=RATE[/BURST]',
+        help='Per-domain override of --domain-rate/--domain-burst, e.g. example.com=2/1 (repeatable)'
+    )
+    
+    parser.add_argument(
+        '--proxy-rate',
+        type=float,
+        default=4,
+        help='Solves per minute started through one proxy, with --domain-rate (default: 4)'
+    )
+    
+    parser.add_argument(
+        '--proxy-burst',
+        type=int,
+        default=1,
+        help='Solves a proxy may start back to back (default: 1)'
+    )
+    
+    parser.add_argument(
+        '--max-rate-wait',
+        type=float,
+        default=None,
+        help='Answer 429 instead of queueing solves that would wait longer than this many seconds'
+    )
+    
+    parser.add_argument(
+        '--job-workers',
+        type=int,
+        default=2,
+        help='Solves executed concurrently by the job API (default: 2)'
+    )
+    
+    parser.add_argument(
+        '--job-queue-size',
+        type=int,
+        default=50,
+        help='Jobs allowed to wait for a worker before submissions are rejected (default: 50)'
+    )
+    
+    parser.add_argument(
+        '--job-timeout',
+        type=float,
+        default=120,
+        help='Seconds a job may take from submission to result (default: 120)'
+    )
+    
+    parser.add_argument(
+        '--prefill',
+        action='append',
+        metavar='URL',
+        help='Keep pre-solved tokens in stock for this page (repeatable)'
+    )
+    
+    parser.add_argument(
+        '--prefill-depth',
+        type=int,
+        default=2,
+        help='Valid tokens kept in stock per prefilled page (default: 2)'
+    )
+    
+    parser.add_argument(
+        '--prefill-workers',
+        type=int,
+        default=2,
+        help='Background solves running at once for the token pool (default: 2)'
+    )
+    
+    parser.add_argument(
+        '--prefill-adaptive',
+        action='store_true',
+        help='Size the token pool from forecast demand; --prefill-depth becomes the ceiling'
+    )
+    
+    parser.add_argument(
+        '--recognizer',
+        default='google',
+        help='Speech-recognition backend (google or vosk), or a comma-separated list '
+             'to send each clip to several and keep the first confident answer (default: google)'
+    )
+    
+    parser.add_argument(
+        '--vosk-model',
+        help='Path to the Vosk model directory (required with --recognizer vosk)'
+    )
+    
+    parser.add_argument(
+        '--recognizer-workers',
+        type=int,
+        help='Worker processes for offline recognition (default: CPU count)'
+    )
+    
+    parser.add_argument(
+        '--min-confidence',
+        type=float,
+        default=0.8,
+        help='With several recognizers, accept a transcript at this confidence (default: 0.8)'
+    )
+    
+    parser.add_argument(
+        '--hedge-percentile',
+        type=float,
+        help='With several recognizers, start the next one only after this percentile '
+             'of the previous one\'s latency (default: start all at once)'
+    )
+    
+    parser.add_argument(
+        '--recognizer-concurrency',
+        type=int,
+        help='With several recognizers, clips raced at once; size it to the number of '
+             'concurrent solves (default: --pool-size + --contexts + --keyed-pool, or 4)'
+    )
+    
+    parser.add_argument(
+        '--transcript-cache',
+        type=int,
+        default=0,
+        help='Audio transcripts kept in memory for reuse (default: 0, disabled)'
+    )
+    
+    parser.add_argument(
+        '--transcript-cache-path',
+        help='SQLite file persisting the transcript cache across restarts'
+    )
+    
+    parser.add_argument(
+        '--site-profiles',
+        type=int,
+        default=0,
+        help='Target pages whose widget and timings are learnt, kept in memory (default: 0, disabled)'
+    )
+    
+    parser.add_argument(
+        '--site-profiles-path',
+        help='SQLite file persisting the site profiles across restarts'
+    )
+    
+    parser.add_argument(
+        '--profile-min-samples',
+        type=int,
+        default=5,
+        help='Solves of a page before its profile is used (default: 5)'
+    )
+    
+    parser.add_argument(
+        '--challenge-retries',
+        type=int,
+        default=0,
+        help='Reload the challenge and try a new audio clip this many times after a rejected '
+             'transcript, in the same browser (default: 0)'
+    )
+    
+    parser.add_argument(
+        '--adaptive-timeouts',
+        action='store_true',
+        help='Set solver wait deadlines from observed step latencies instead of a fixed 20 s'
+    )
+    
+    parser.add_argument(
+        '--timeout-percentile',
+        type=float,
+        default=99,
+        help='Percentile of observed step latencies an adaptive deadline covers (default: 99)'
+    )
+    
+    parser.add_argument(
+        '--timeout-margin',
+        type=float,
+        default=2.0,
+        help='Seconds added to the percentile (default: 2)'
+    )
+    
+    parser.add_argument(
+        '--timeout-floor',
+        type=float,
+        default=2.0,
+        help='Shortest adaptive deadline in seconds (default: 2)'
+    )
+    
+    parser.add_argument(
+        '--timeout-ceiling',
+        type=float,
+        default=20.0,
+        help='Longest adaptive deadline in seconds (default: 20)'
+    )
+    
+    parser.add_argument(
+        '--asgi',
+        action='store_true',
+        help='Serve on an asyncio event loop with solves in worker processes (needs: pip install uvicorn)'
+    )
+    
+    parser.add_argument(
+        '--workers',
+        type=int,
+        help='Solver worker processes in --asgi mode, each with its own browsers (default: CPU count)'
+    )
+    
+    parser.add_argument(
+        '--max-pending',
+        type=int,
+        default=1000,
+        help='Solves queued or running before --asgi mode answers 503 (default: 1000)'
+    )
+    
+    parser.add_argument(
+        '--worker-solves',
+        type=int,
+        help='Solves each --asgi worker process runs at once on its browsers '
+             '(default: --pool-size + --contexts + --keyed-pool, or 2)'
+    )
+    
     parser.add_argument(
         '--check-deps',
         action='store_true',
@@ -114,6 +478,32 @@ Examples:
     if not check_dependencies():
         sys.exit(1)
     
+    recognizers = args.recognizer.split(',')
+    unknown = [name for name in recognizers if name not in ('google', 'vosk')]
+    if unknown:
+        parser.error(f"unknown recognizer(s): {', '.join(unknown)} (choose from google, vosk)")
+    if 'vosk' in recognizers and not args.vosk_model:
+        parser.error('--vosk-model is required with --recognizer vosk')
+    
+    domain_limits = {}
+    for limit in args.domain_limit:
+        try:
+            domain, budget = limit.split('=', 1)
+            rate, _, burst = budget.partition('/')
+            domain_limits[domain.strip()] = (float(rate), int(burst) if burst else args.domain_burst)
+        except ValueError:
+            parser.error(f"invalid --domain-limit {limit!r}, expected DOMAIN=RATE[/BURST]")
+    if domain_limits and not args.domain_rate:
+        parser.error('--domain-limit needs --domain-rate')
+    
+    if args.asgi:
+        try:
+            import uvicorn
+        except ImportError:
+            parser.error('--asgi needs uvicorn: pip install uvicorn')
+        if args.prefill:
+            parser.error('--prefill is only supported by the Flask server')
+    
     if args.check_deps:
         print("✅ Dependency check completed successfully!")
         sys.exit(0)
@@ -122,7 +512,50 @@ Examples:
     success = start_api_server(
         host=args.host,
         port=args.port,
-        debug=args.debug
+        debug=args.debug,
+        pool_size=args.pool_size,
+        pool_max_uses=args.pool_max_uses,
+        pool_max_age=args.pool_max_age,
+        contexts=args.contexts,
+        keyed_pool=args.keyed_pool,
+        proxy_breaker=args.proxy_breaker,
+        proxies=args.proxies,
+        proxy_failures=args.proxy_failures,
+        proxy_cooldown=args.proxy_cooldown,
+        domain_rate=args.domain_rate,
+        domain_burst=args.domain_burst,
+        proxy_rate=args.proxy_rate,
+        proxy_burst=args.proxy_burst,
+        domain_limits=domain_limits,
+        max_rate_wait=args.max_rate_wait,
+        job_workers=args.job_workers,
+        job_queue_size=args.job_queue_size,
+        job_timeout=args.job_timeout,
+        prefill=args.prefill,
+        prefill_depth=args.prefill_depth,
+        prefill_workers=args.prefill_workers,
+        prefill_adaptive=args.prefill_adaptive,
+        recognizer=args.recognizer,
+        vosk_model=args.vosk_model,
+        recognizer_workers=args.recognizer_workers,
+        transcript_cache=args.transcript_cache,
+        transcript_cache_path=args.transcript_cache_path,
+        site_profiles=args.site_profiles,
+        site_profiles_path=args.site_profiles_path,
+        profile_min_samples=args.profile_min_samples,
+        adaptive_timeouts=args.adaptive_timeouts,
+        challenge_retries=args.challenge_retries,
+        timeout_percentile=args.timeout_percentile,
+        timeout_margin=args.timeout_margin,
+        timeout_floor=args.timeout_floor,
+        timeout_ceiling=args.timeout_ceiling,
+        min_confidence=args.min_confidence,
+        hedge_percentile=args.hedge_percentile,
+        recognizer_concurrency=args.recognizer_concurrency,
+        asgi=args.asgi,
+        workers=args.workers,
+        max_pending=args.max_pending,
+        worker_solves=args.worker_solves
     )
     
     sys.exit(0 if success else 1)
@@ -48,6 +48,18 @@ try:
     token = recaptchaSolver.get_token()
     print(f"Time to solve the captcha: {time.time()-t0:.2f} seconds - {token}")
 
+    # Per-step latency next to the fixed sleeps these waits replaced
+    legacy_sleeps = {
+        'anchor_iframe': 0.1,
+        'checkbox_result': 1.0,
+        'audio_source': 0.3,
+        'verify': 1.0 + 1.0,  # sleep after verify plus the one inside is_solved()
+    }
+    print(f"{'step':<20}{'before (fixed)':>16}{'after (waited)':>16}")
+    for step, elapsed in recaptchaSolver.timings.items():
+        before = f"{legacy_sleeps[step]:.2f}s+" if step in legacy_sleeps else '-'
+        print(f"{step:<20}{before:>16}{elapsed:>15.2f}s")
+
 finally:
     try:
         driver.close()
@@ -0,0 +1,65 @@
+"""Tests for the adaptive solver timeouts."""
+
+import asyncio
+import time
+
+from RecaptchaSolver import RecaptchaSolver
+from adaptive_timeouts import TimeoutController
+from test_async_solver import FakeRecognizer, FakeWidget
+
+
+def test_deadline_follows_percentile_within_bounds():
+    controller = TimeoutController(percentile=90, margin=1.0, floor=2.0, ceiling=20.0, min_samples=10)
+    for i in range(9):
+        controller.record({'verify': 3.0 + i * 0.1, 'checkbox_result': 0.2})
+    assert controller.timeout('verify') == 20.0
+
+    controller.record({'verify': 3.9, 'checkbox_result': 0.2})
+    timeouts = controller.timeouts()
+    assert timeouts['verify'] == 4.8  # p90 of 3.0-3.9 plus 1 s
+    assert timeouts['checkbox_result'] == 2.0  # floor
+    assert timeouts['audio_source'] == 20.0  # never observed
+
+
+def test_expired_waits_raise_the_deadline():
+    controller = TimeoutController(percentile=90, margin=1.0, min_samples=10)
+    for _ in range(10):
+        controller.record({'audio_source': 1.0})
+    deadline = controller.timeout('audio_source')
+    assert deadline == 2.0
+
+    # A slow proxy keeps hitting the deadline, which keeps moving up
+    for _ in range(6):
+        controller.record({'audio_source': deadline}, expired=['audio_source'])
+        deadline = controller.timeout('audio_source')
+    assert deadline == 5.0
+    assert controller.stats()['steps']['audio_source']['expired'] == 6
+
+
+def test_hung_step_fails_at_its_deadline():
+    class SilentWidget(FakeWidget):
+        def click(self, selector):
+            if selector != '#recaptcha-audio-button':
+                super().click(selector)
+
+    async def scenario():
+        solver = RecaptchaSolver(SilentWidget(delay=0.05), backend=FakeRecognizer(),
+                                 timeouts={'audio_source': 0.3})
+        start = time.time()
+        try:
+            await solver.asolve_captcha()
+        except Exception as e:
+            return solver, str(e), time.time() - start
+        raise AssertionError("The solve should have failed")
+
+    solver, error, elapsed = asyncio.run(scenario())
+    assert error == "Audio challenge did not load"
+    assert solver.expired == ['audio_source']
+    assert elapsed < 2.0
+
+
+if __name__ == "__main__":
+    for test in (test_deadline_follows_percentile_within_bounds, test_expired_waits_raise_the_deadline,
+                 test_hung_step_fails_at_its_deadline):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,280 @@
+"""Tests for the ASGI server mode, driving the application directly."""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from api import CaptchaAPI
+from asgi import SolverApp, SolverProcessPool, _init_worker
+
+running = {'now': 0, 'peak': 0}
+running_lock = threading.Lock()
+
+
+def fake_solve(params):
+    with running_lock:
+        running['now'] += 1
+        running['peak'] = max(running['peak'], running['now'])
+    time.sleep(0.05)
+    with running_lock:
+        running['now'] -= 1
+    outcome = 'bot_detected' if 'burned' in params['url'] else 'audio'
+    result = {'success': params['url'].endswith('ok'), 'token': 'tok', 'outcome': outcome,
+              'total_time': 0.05, 'stage_timings': {'verify': 0.05}, 'url': params['url'],
+              'proxy': params['proxy']}
+    return result, {'proxy_outcome': outcome, 'waits': [{'timings': {'verify': 0.05}, 'expired': []}]}
+
+
+def make_app(workers=2, max_pending=1000, solves_per_worker=1, **settings):
+    return SolverApp(workers=workers, max_pending=max_pending, solves_per_worker=solves_per_worker,
+                     worker_settings=settings, solve=fake_solve,
+                     executor_factory=lambda: ThreadPoolExecutor(max_workers=workers * solves_per_worker))
+
+
+def pid_after(seconds):
+    time.sleep(seconds)
+    return os.getpid(), threading.current_thread().name
+
+
+def crashing_solve(params):
+    if 'crash' in params['url']:
+        os._exit(1)
+    return fake_solve(params)
+
+
+worker_state = {}
+
+
+def init_marked_worker(directory):
+    worker_state['directory'] = directory
+    # Stands in for a browser the worker launched
+    worker_state['child'] = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+    with open(os.path.join(directory, 'child'), 'w') as f:
+        f.write(str(worker_state['child'].pid))
+
+
+def finalize_marked_worker():
+    worker_state['child'].terminate()
+    open(os.path.join(worker_state['directory'], 'finalized'), 'w').close()
+
+
+def child_of(directory):
+    with open(os.path.join(directory, 'child')) as f:
+        return int(f.read())
+
+
+def running_pid(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # A killed child may linger as a zombie until it is reaped
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().split(') ')[1][0] != 'Z'
+    except FileNotFoundError:
+        return True
+
+
+def wait_until(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+
+async def call(app, method, path, body=None):
+    status, payload, _ = await call_with_headers(app, method, path, body)
+    return status, payload
+
+
+async def call_with_headers(app, method, path, body=None):
+    messages = [{'type': 'http.request', 'body': json.dumps(body).encode() if body is not None else b''}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    await app({'type': 'http', 'method': method, 'path': path, 'headers': []}, receive, send)
+    status = sent[0]['status']
+    headers = {name.decode(): value.decode() for name, value in sent[0]['headers']}
+    payload = sent[1]['body']
+    return status, json.loads(payload) if path != '/metrics' else payload.decode(), headers
+
+
+def test_routes_and_validation():
+    async def scenario():
+        app = make_app()
+        try:
+            status, health = await call(app, 'GET', '/health')
+            assert status == 200 and health['solver']['workers'] == 2
+            assert (await call(app, 'POST', '/solve-captcha', {'cookies': []}))[0] == 400
+            assert (await call(app, 'GET', '/solve-captcha'))[0] == 405
+            assert (await call(app, 'GET', '/missing'))[0] == 404
+
+            status, result = await call(app, 'POST', '/solve-captcha', {'url': 'https://example.com/ok'})
+            assert status == 200 and result['token'] == 'tok'
+            assert (await call(app, 'POST', '/solve-captcha', {'url': 'https://example.com/no'}))[0] == 500
+            status, body = await call(app, 'GET', '/metrics')
+            assert 'recaptcha_solve_outcomes_total{outcome="audio"}' in body
+        finally:
+            app.shutdown()
+    asyncio.run(scenario())
+
+
+def test_waiting_clients_are_coroutines_bounded_by_workers():
+    async def scenario():
+        app = make_app(workers=2)
+        try:
+            start = time.time()
+            results = await asyncio.gather(*(
+                call(app, 'POST', '/solve-captcha', {'url': f'https://example.com/{i}/ok'}) for i in range(20)
+            ))
+            elapsed = time.time() - start
+        finally:
+            app.shutdown()
+        assert all(status == 200 for status, _ in results)
+        assert running['peak'] <= 2
+        assert elapsed >= 10 * 0.05
+    asyncio.run(scenario())
+
+
+def test_overload_is_refused_with_503():
+    async def scenario():
+        app = make_app(workers=1, max_pending=3)
+        try:
+            results = await asyncio.gather(*(
+                call_with_headers(app, 'POST', '/solve-captcha', {'url': 'https://example.com/ok'})
+                for _ in range(6)
+            ))
+        finally:
+            app.shutdown()
+        statuses = sorted(status for status, _, _ in results)
+        assert statuses == [200, 200, 200, 503, 503, 503]
+        assert all(headers.get('retry-after') == '1' for status, _, headers in results if status == 503)
+    asyncio.run(scenario())
+
+
+def test_breaker_and_deadlines_are_shared_by_all_workers():
+    async def scenario():
+        app = make_app(workers=2, proxies=['10.0.0.1:8080'], proxy_failures=1, adaptive_timeouts=True,
+                       pool_size=1)
+        assert app.worker_settings == {'pool_size': 1} and app.solves_per_worker == 1
+        try:
+            status, result = await call(app, 'POST', '/solve-captcha', {'url': 'https://example.com/burned'})
+            assert status == 500 and result['proxy'] == '10.0.0.1:8080'
+            # The trip recorded in the server process refuses the next solve on any worker
+            status, result, headers = await call_with_headers(app, 'POST', '/solve-captcha',
+                                                              {'url': 'https://example.com/ok'})
+            assert status == 503 and result['outcome'] == 'circuit_open'
+            assert headers['retry-after'] == str(int(result['retry_after']) + 1)
+            status, health = await call(app, 'GET', '/health')
+            assert health['timeouts']['steps']['verify']['waits'] == 1
+        finally:
+            app.shutdown()
+            CaptchaAPI.proxy_health = CaptchaAPI.timeout_controller = None
+    asyncio.run(scenario())
+
+
+def test_rate_limited_clients_wait_without_threads():
+    async def scenario():
+        app = make_app(workers=1, domain_rate=600, domain_burst=1, proxy_rate=6000, proxy_burst=10)
+        baseline, peak = threading.active_count(), [0]
+
+        async def watch():
+            while True:
+                peak[0] = max(peak[0], threading.active_count())
+                await asyncio.sleep(0.01)
+
+        watcher = asyncio.ensure_future(watch())
+        try:
+            results = await asyncio.gather(*(
+                call(app, 'POST', '/solve-captcha', {'url': f'https://example.com/{i}/ok'}) for i in range(10)
+            ))
+        finally:
+            watcher.cancel()
+            app.shutdown()
+            CaptchaAPI.rate_scheduler = None
+        assert all(status == 200 for status, _ in results)
+        # Paced 0.1 s apart, the last solve waited 0.9 s on the event loop
+        assert max(result['stage_timings'].get('rate_limit', 0) for _, result in results) >= 0.8
+        # Only the single solve thread was added while nine clients waited
+        assert peak[0] <= baseline + 1
+    asyncio.run(scenario())
+
+
+def test_worker_process_runs_several_calls_at_once():
+    pool = SolverProcessPool(1, 3, _init_worker, ({},))
+    try:
+        # Warm up: the spawned process imports the API before its first call
+        pool.submit(pid_after, 0).result(timeout=60)
+        start = time.time()
+        results = [future.result(timeout=10) for future in [pool.submit(pid_after, 0.5) for _ in range(3)]]
+        elapsed = time.time() - start
+    finally:
+        pool.shutdown()
+    assert len({pid for pid, _ in results}) == 1 and results[0][0] != os.getpid()
+    assert len({thread for _, thread in results}) == 3
+    assert elapsed < 1.2
+
+
+def test_terminated_worker_quits_its_browsers():
+    with tempfile.TemporaryDirectory() as directory:
+        pool = SolverProcessPool(1, 1, init_marked_worker, (directory,), finalizer=finalize_marked_worker)
+        pool.submit(pid_after, 0).result(timeout=60)
+        pool.submit(pid_after, 30)
+        pool.shutdown(wait=True, cancel_futures=True)
+        assert os.path.exists(os.path.join(directory, 'finalized'))
+        assert wait_until(lambda: not running_pid(child_of(directory)))
+
+
+def test_dead_worker_browsers_are_stopped():
+    if not hasattr(os, 'killpg'):
+        return  # Needs POSIX process groups
+    with tempfile.TemporaryDirectory() as directory:
+        pool = SolverProcessPool(1, 1, init_marked_worker, (directory,), finalizer=finalize_marked_worker)
+        try:
+            pool.submit(pid_after, 0).result(timeout=60)
+            child = child_of(directory)
+            try:
+                pool.submit(os._exit, 1).result(timeout=10)
+            except BrokenProcessPool:
+                pass
+            assert wait_until(lambda: not running_pid(child))
+            assert not os.path.exists(os.path.join(directory, 'finalized'))
+        finally:
+            pool.shutdown()
+
+
+def test_crashed_worker_is_replaced():
+    async def scenario():
+        app = SolverApp(workers=1, solves_per_worker=1, solve=crashing_solve)
+        try:
+            status, result, headers = await call_with_headers(app, 'POST', '/solve-captcha',
+                                                              {'url': 'https://example.com/crash'})
+            assert status == 503 and headers['retry-after'] == '1'
+            status, result = await call(app, 'POST', '/solve-captcha', {'url': 'https://example.com/ok'})
+            assert status == 200 and result['token'] == 'tok'
+        finally:
+            app.shutdown()
+    asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    for test in (test_routes_and_validation, test_waiting_clients_are_coroutines_bounded_by_workers,
+                 test_overload_is_refused_with_503, test_breaker_and_deadlines_are_shared_by_all_workers,
+                 test_rate_limited_clients_wait_without_threads,
+                 test_worker_process_runs_several_calls_at_once, test_terminated_worker_quits_its_browsers,
+                 test_dead_worker_browsers_are_stopped, test_crashed_worker_is_replaced):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,227 @@
+"""Tests for the async and blocking RecaptchaSolver APIs against a simulated widget."""
+
+import asyncio
+import threading
+import time
+
+import audio_pipeline
+from RecaptchaSolver import RecaptchaSolver
+from speech_backends import RecognitionBackend, Transcript
+from test_audio_pipeline import make_wav
+
+ANSWER = 'seven four two'
+
+
+class FakeStates:
+    def __init__(self, displayed):
+        self.is_displayed = displayed
+
+
+class FakeElement:
+    def __init__(self, widget, selector):
+        self.widget = widget
+        self.selector = selector
+        self.states = FakeStates(True)
+
+    @property
+    def attrs(self):
+        if self.selector == '#audio-source':
+            return {'src': f'http://audio/{self.widget.clip()}'}
+        return {'style': 'display: block;'} if self.widget.happened('solved') else {}
+
+    @property
+    def text(self):
+        if self.selector == '.rc-audiochallenge-error-message' and self.widget.happened('rejected'):
+            return 'Multiple correct solutions required - please solve more.'
+        return ''
+
+    def click(self):
+        self.widget.click(self.selector)
+
+    def input(self, text, clear=False):
+        self.widget.answer = text
+
+
+class FakeWait:
+    """``wait`` helper of a page or frame: ele_displayed polls until the element shows."""
+
+    def __init__(self, container):
+        self.container = container
+
+    def ele_displayed(self, selector, timeout=None):
+        deadline = time.time() + (timeout or 0)
+        while True:
+            element = self.container(selector)
+            if element and element.states.is_displayed:
+                return True
+            if time.time() >= deadline:
+                return False
+            time.sleep(0.01)
+
+
+class FakeFrame:
+    def __init__(self, widget, challenge=False):
+        self.widget = widget
+        self.challenge = challenge
+        self.wait = FakeWait(self)
+
+    @property
+    def states(self):
+        return FakeStates(not self.challenge or self.widget.happened('challenge'))
+
+    def __call__(self, selector, timeout=None):
+        if selector == '#audio-source' and not self.widget.happened('audio'):
+            return None
+        return FakeElement(self.widget, selector)
+
+    ele = __call__
+
+
+class FakeWidget:
+    """Page driver simulating the widget: each click takes effect after a delay.
+
+    The first ``rejections`` correct answers are rejected; the reload button serves a new clip.
+    """
+
+    def __init__(self, mode='audio', delay=0.1, rejections=0):
+        self.mode = mode
+        self.delay = delay
+        self.rejections = rejections
+        self.answer = None
+        self.events = {}
+        self.new_clips = []
+        self.anchor = FakeFrame(self)
+        self.challenge = FakeFrame(self, challenge=True)
+        self.wait = FakeWait(self)
+
+    def happened(self, event):
+        return event in self.events and time.time() >= self.events[event]
+
+    def clip(self):
+        return 1 + sum(1 for at in self.new_clips if time.time() >= at)
+
+    def click(self, selector):
+        at = time.time() + self.delay
+        if selector == '.rc-anchor-content':
+            self.events['solved' if self.mode == 'checkbox' else 'challenge'] = at
+        elif selector == '#recaptcha-audio-button':
+            self.events['audio'] = at
+        elif selector == '#recaptcha-verify-button' and self.answer == ANSWER:
+            if self.rejections:
+                self.rejections -= 1
+                self.events['rejected'] = at
+            else:
+                self.events['solved'] = at
+        elif selector == '#recaptcha-reload-button':
+            self.new_clips.append(at)
+
+    def __call__(self, selector, timeout=None):
+        return self.anchor if selector == '@title=reCAPTCHA' else self.challenge
+
+    def ele(self, selector, timeout=None):
+        return None
+
+    def run_js(self, script):
+        return 'async-token' if self.happened('solved') else ''
+
+
+class FakeRecognizer(RecognitionBackend):
+    name = 'fake'
+
+    def transcribe(self, audio):
+        time.sleep(0.05)
+        return Transcript(ANSWER, 1.0, self.name)
+
+
+def with_local_audio(test):
+    def wrapper():
+        clip = make_wav(channels=1)
+        original_fetch = audio_pipeline.fetch_audio
+        audio_pipeline.fetch_audio = lambda url, timeout=audio_pipeline.DOWNLOAD_TIMEOUT: clip
+        try:
+            test()
+        finally:
+            audio_pipeline.fetch_audio = original_fetch
+    wrapper.__name__ = test.__name__
+    return wrapper
+
+
+@with_local_audio
+def test_async_audio_solve():
+    async def scenario():
+        solver = RecaptchaSolver(FakeWidget(), backend=FakeRecognizer())
+        await solver.asolve_captcha()
+        return solver, await solver.ais_solved(), await solver.aget_token()
+
+    solver, solved, token = asyncio.run(scenario())
+    assert solved and token == 'async-token'
+    assert solver.outcome == 'audio'
+    assert {'checkbox_result', 'audio_source', 'recognition', 'verify'} <= set(solver.timings)
+
+
+@with_local_audio
+def test_rejected_transcript_is_retried_in_place():
+    async def scenario(retries):
+        solver = RecaptchaSolver(FakeWidget(delay=0.05, rejections=1), backend=FakeRecognizer(),
+                                 retries=retries, timeouts={'verify': 1.0})
+        try:
+            await solver.asolve_captcha()
+        except Exception:
+            pass
+        return solver
+
+    solver = asyncio.run(scenario(retries=0))
+    assert solver.outcome == 'failed' and solver.attempts == 1
+
+    solver = asyncio.run(scenario(retries=2))
+    assert solver.outcome == 'audio' and solver.attempts == 2
+    assert 'reload' in solver.timings and not solver.expired
+
+
+
+@with_local_audio
+def test_blocking_solve_retries_rejected_transcript():
+    solver = RecaptchaSolver(FakeWidget(delay=0.05, rejections=1), backend=FakeRecognizer(),
+                             retries=1, timeouts={'verify': 1.0})
+    solver.solveCaptcha()
+    assert solver.outcome == 'audio' and solver.attempts == 2
+    assert solver.get_token() == 'async-token'
+    assert 'reload' in solver.timings and not solver.expired
+
+
+def test_async_checkbox_only_solve():
+    async def scenario():
+        solver = RecaptchaSolver(FakeWidget(mode='checkbox'), backend=FakeRecognizer())
+        await solver.asolve_captcha()
+        return solver
+    assert asyncio.run(scenario()).outcome == 'checkbox'
+
+
+@with_local_audio
+def test_one_thread_interleaves_many_solves():
+    threads = set()
+
+    class RecordingWidget(FakeWidget):
+        def __call__(self, selector, timeout=None):
+            threads.add(threading.get_ident())
+            return super().__call__(selector, timeout)
+
+    async def scenario():
+        solvers = [RecaptchaSolver(RecordingWidget(delay=0.2), backend=FakeRecognizer()) for _ in range(20)]
+        start = time.time()
+        await asyncio.gather(*(solver.asolve_captcha() for solver in solvers))
+        return solvers, time.time() - start
+
+    solvers, elapsed = asyncio.run(scenario())
+    assert all(solver.outcome == 'audio' for solver in solvers)
+    # Three 0.2 s page waits each: serially that would take 20 * 0.6 s
+    assert elapsed < 3.0
+    assert len(threads) == 1
+
+
+if __name__ == "__main__":
+    for test in (test_async_audio_solve, test_rejected_transcript_is_retried_in_place,
+                 test_blocking_solve_retries_rejected_transcript, test_async_checkbox_only_solve,
+                 test_one_thread_interleaves_many_solves):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,73 @@
+"""Tests for the in-memory audio pipeline."""
+
+import io
+import math
+import struct
+import wave
+
+import audio_pipeline
+
+
+def make_wav(seconds=0.5, rate=22050, channels=2):
+    frames = bytearray()
+    for i in range(int(seconds * rate)):
+        sample = int(8000 * math.sin(2 * math.pi * 440 * i / rate))
+        frames += struct.pack('<h', sample) * channels
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(bytes(frames))
+    return buffer.getvalue()
+
+
+def test_decode_downmixes_to_mono_pcm():
+    pcm, rate = audio_pipeline.decode_audio(make_wav(seconds=0.5, rate=22050, channels=2))
+    assert rate == 22050
+    assert len(pcm) == int(0.5 * 22050) * audio_pipeline.SAMPLE_WIDTH
+
+
+def test_audio_data_wraps_pcm_for_recognizer():
+    pcm, rate = audio_pipeline.decode_audio(make_wav(channels=1))
+    audio = audio_pipeline.to_audio_data(pcm, rate)
+    assert audio.sample_rate == rate
+    assert audio.get_raw_data() == pcm
+
+
+def test_preprocess_resamples_trims_and_normalises():
+    rate = 22050
+    silence = b'\x00\x00' * rate
+    tone, _ = audio_pipeline.decode_audio(make_wav(seconds=1.0, rate=rate, channels=1))
+    pcm, new_rate = audio_pipeline.preprocess(silence + tone + silence, rate)
+
+    assert new_rate == audio_pipeline.TARGET_RATE
+    seconds = len(pcm) / audio_pipeline.SAMPLE_WIDTH / new_rate
+    assert 1.0 <= seconds <= 1.0 + 2 * audio_pipeline.SILENCE_PADDING + 0.05
+
+    samples = struct.unpack(f'<{len(pcm) // 2}h', pcm)
+    rms = math.sqrt(sum(sample * sample for sample in samples) / len(samples)) / 32768
+    assert abs(rms - audio_pipeline.TARGET_RMS) < 0.02
+    assert max(abs(sample) for sample in samples) <= audio_pipeline.PEAK_LIMIT * 32768 + 1
+
+
+def test_resampling_keeps_speech_band_and_removes_aliases():
+    import numpy
+    rate = 22050
+    t = numpy.arange(rate) / rate
+    # 1 kHz is kept; 10 kHz would alias to 6 kHz at 16 kHz and must be filtered out
+    samples = 0.5 * numpy.sin(2 * numpy.pi * 1000 * t) + 0.5 * numpy.sin(2 * numpy.pi * 10000 * t)
+    resampled = audio_pipeline._resample(samples.astype(numpy.float32), rate, 16000)
+    spectrum = numpy.abs(numpy.fft.rfft(resampled))
+    freqs = numpy.fft.rfftfreq(len(resampled), 1 / 16000)
+    kept = spectrum[numpy.argmin(numpy.abs(freqs - 1000))]
+    alias = spectrum[numpy.argmin(numpy.abs(freqs - 6000))]
+    assert alias < kept * 0.05
+
+
+if __name__ == "__main__":
+    for test in (test_decode_downmixes_to_mono_pcm, test_audio_data_wraps_pcm_for_recognizer,
+                 test_preprocess_resamples_trims_and_normalises,
+                 test_resampling_keeps_speech_band_and_removes_aliases):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,55 @@
+"""Tests for the benchmark harness (stand-in page server and report maths).
+
+Driving the solver itself needs Chrome: run python benchmark_solver.py for that.
+"""
+
+import urllib.request
+
+import audio_pipeline
+from benchmark_solver import StandInServer, compare, percentile, summarize
+
+
+def test_stand_in_server_serves_widget_and_audio():
+    server = StandInServer().start()
+    try:
+        url = server.page_url(mode='checkbox', checkbox_delay=0.1)
+        with urllib.request.urlopen(url) as response:
+            page = response.read().decode()
+        assert 'title="reCAPTCHA"' in page
+        assert 'src="/anchor?mode=checkbox&checkbox_delay=0.1' in page
+        assert 'id="g-recaptcha-response"' in page
+
+        with urllib.request.urlopen(server.origin + '/bframe?mode=audio') as response:
+            challenge = response.read().decode()
+        for selector in ('recaptcha-audio-button', 'audio-response', 'recaptcha-verify-button'):
+            assert f'id="{selector}"' in challenge
+
+        pcm, rate = audio_pipeline.decode_audio(audio_pipeline.fetch_audio(server.origin + '/audio.wav'))
+        assert rate == 22050 and len(pcm) > 0
+    finally:
+        server.stop()
+
+
+def test_summary_percentiles_and_throughput():
+    runs = [{'success': i % 10 != 0, 'total_time': i / 10, 'stages': {'verify': i / 100}}
+            for i in range(1, 101)]
+    summary = summarize(runs, wall_time=60.0)
+    assert percentile([3, 1, 2], 50) == 2
+    assert summary['stages']['verify'] == {'p50': 0.5, 'p95': 0.95, 'p99': 0.99}
+    assert summary['successes'] == 90
+    assert summary['solves_per_minute'] == 90.0
+
+
+def test_compare_flags_slower_stages_and_lower_throughput():
+    baseline = {'stages': {'verify': {'p95': 1.0}}, 'solves_per_minute': 30.0}
+    same = {'stages': {'verify': {'p95': 1.1}}, 'solves_per_minute': 29.0}
+    slower = {'stages': {'verify': {'p95': 1.5}}, 'solves_per_minute': 20.0}
+    assert compare(same, baseline, tolerance=0.2) == []
+    assert len(compare(slower, baseline, tolerance=0.2)) == 2
+
+
+if __name__ == "__main__":
+    for test in (test_stand_in_server_serves_widget_and_audio, test_summary_percentiles_and_throughput,
+                 test_compare_flags_slower_stages_and_lower_throughput):
+        test()
+        print(f"✅ {test.__name__}")
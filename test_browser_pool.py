@@ -0,0 +1,354 @@
+"""Tests for the warm browser pool and the shared-browser context pool."""
+
+import threading
+
+from browser_pool import BrowserPool, ContextPool, KeyedBrowserPool
+
+
+class FakeDriver:
+    """Minimal stand-in for ChromiumPage."""
+
+    def __init__(self):
+        self.url = 'https://example.com/form'
+        self.tabs_count = 1
+        self.tab_id = 'tab'
+        self.alive = True
+        self.cdp_calls = []
+        self.contexts = set()
+        self.cookies = []
+        self.cleared_origins = []
+
+    def run_js(self, script, timeout=None):
+        if not self.alive:
+            raise Exception("Browser disconnected")
+        return 1
+
+    def run_cdp(self, cmd, **kwargs):
+        self.cdp_calls.append(cmd)
+        if cmd == 'Network.getAllCookies':
+            return {'cookies': list(self.cookies)}
+        if cmd == 'Network.clearBrowserCookies':
+            self.cookies = []
+        if cmd == 'Network.setCookies':
+            self.cookies.extend(kwargs['cookies'])
+        if cmd == 'Page.getFrameTree':
+            return {'frameTree': {'frame': {'url': self.url},
+                                  'childFrames': [{'frame': {'url': 'https://cdn.example.net/widget'}}]}}
+        if cmd == 'Storage.clearDataForOrigin':
+            self.cleared_origins.append(kwargs['origin'])
+        return {}
+
+    def get(self, url):
+        self.url = url
+
+    def close_tabs(self, tab_id, others=False):
+        self.tabs_count = 1
+
+    def quit(self):
+        self.alive = False
+
+    # Browser-level API used by ContextPool
+    def new_tab(self, new_context=False):
+        tab = FakeTab(self, f"ctx-{len(self.cdp_calls)}")
+        self.contexts.add(tab.context_id)
+        self.cdp_calls.append('Target.createBrowserContext')
+        return tab
+
+
+class FakeBrowser(FakeDriver):
+    """Chromium object of DrissionPage 4.1, whose CDP access is private."""
+
+    run_cdp = None
+
+    def _run_cdp(self, cmd, **kwargs):
+        self.cdp_calls.append(cmd)
+        if cmd == 'Target.disposeBrowserContext':
+            self.contexts.discard(kwargs['browserContextId'])
+        return {}
+
+
+class FakeTab:
+    """Tab living in its own browser context."""
+
+    def __init__(self, browser, context_id):
+        self.browser = browser
+        self.tab_id = context_id
+        self.context_id = context_id
+
+    def run_cdp(self, cmd, **kwargs):
+        assert cmd == 'Target.getTargetInfo' and not kwargs
+        return {'targetInfo': {'targetId': self.tab_id, 'browserContextId': self.context_id}}
+
+
+def make_pool(**kwargs):
+    drivers = []
+
+    def factory():
+        drivers.append(FakeDriver())
+        return drivers[-1]
+
+    pool = BrowserPool(factory, **kwargs)
+    pool.start()
+    return pool, drivers
+
+
+def test_lease_reuses_and_resets_browser():
+    pool, drivers = make_pool(size=1)
+
+    with pool.lease() as driver:
+        driver.tabs_count = 3
+        driver.cookies = [{'name': 'sid', 'value': 'x', 'domain': '.login.example.org', 'secure': True}]
+
+    with pool.lease() as driver:
+        assert driver is drivers[0]
+        assert driver.url == 'about:blank'
+        assert driver.tabs_count == 1
+        assert 'Network.clearBrowserCookies' in driver.cdp_calls
+        assert set(driver.cleared_origins) == {
+            'https://example.com', 'https://cdn.example.net', 'https://login.example.org',
+            'https://www.google.com', 'https://www.recaptcha.net', 'https://recaptcha.net'}
+
+    assert pool.stats()['launched'] == 1
+
+
+def test_browser_recycled_after_max_uses():
+    pool, drivers = make_pool(size=1, max_uses=2)
+
+    for _ in range(2):
+        with pool.lease():
+            pass
+
+    with pool.lease(timeout=5) as driver:
+        assert driver is drivers[1]
+    assert not drivers[0].alive
+    assert pool.stats()['recycled'] == 1
+
+
+def test_unhealthy_browser_is_replaced():
+    pool, drivers = make_pool(size=1)
+    drivers[0].alive = False
+
+    with pool.lease(timeout=5) as driver:
+        assert driver is drivers[1]
+    assert pool.stats()['unhealthy'] == 1
+
+
+def test_lease_times_out_when_exhausted():
+    pool, _ = make_pool(size=1)
+    held = pool.acquire()
+
+    try:
+        pool.acquire(timeout=0.1)
+        assert False, "Expected a timeout"
+    except Exception as e:
+        assert 'Timed out' in str(e)
+
+    pool.release(held)
+    pool.shutdown()
+    assert pool.stats()['alive'] == 0
+
+
+def test_lease_gives_up_when_launches_keep_failing():
+    calls = []
+
+    def factory():
+        calls.append(1)
+        raise Exception("chrome not found")
+
+    pool = BrowserPool(factory, size=1)
+    pool.LAUNCH_RETRY_DELAY = 0.2
+    try:
+        pool.acquire(timeout=0.5)
+        assert False, "Expected a launch failure"
+    except Exception as e:
+        assert 'chrome not found' in str(e)
+    assert len(calls) <= 4
+    assert pool.stats()['alive'] == 0
+
+
+def test_contexts_share_one_browser_and_are_disposed():
+    drivers = []
+    pool = ContextPool(lambda: drivers.append(FakeBrowser()) or drivers[-1], max_contexts=2)
+
+    first = pool.acquire()
+    second = pool.acquire()
+    assert first.browser is second.browser is drivers[0]
+    assert first.context_id != second.context_id
+
+    try:
+        pool.acquire(timeout=0.1)
+        assert False, "Expected a timeout"
+    except Exception as e:
+        assert 'Timed out' in str(e)
+
+    pool.release(first)
+    pool.release(second)
+    assert drivers[0].contexts == set()
+    assert pool.stats()['active_contexts'] == 0
+
+
+def test_shared_browser_relaunched_after_max_uses():
+    drivers = []
+    pool = ContextPool(lambda: drivers.append(FakeBrowser()) or drivers[-1], max_uses=1)
+
+    with pool.lease():
+        pass
+    with pool.lease() as tab:
+        assert tab.browser is drivers[1]
+    assert not drivers[0].alive
+
+
+
+def test_failed_last_context_retires_the_browser():
+    class BrokenBrowser(FakeBrowser):
+        def new_tab(self, new_context=False):
+            raise Exception("Target.createBrowserContext failed")
+
+    drivers = []
+    pool = ContextPool(lambda: drivers.append(BrokenBrowser() if not drivers else FakeBrowser()) or drivers[-1],
+                       max_uses=1)
+    try:
+        pool.acquire(timeout=1)
+        assert False, "Expected the context to fail"
+    except Exception as e:
+        assert 'createBrowserContext' in str(e)
+    assert not drivers[0].alive
+
+    # The next lease gets a fresh browser instead of waiting on the spent one
+    with pool.lease(timeout=1) as tab:
+        assert tab.browser is drivers[1]
+    assert pool.stats()['context_errors'] == 1
+
+def test_shared_browser_launches_outside_the_lock():
+    started, proceed = threading.Event(), threading.Event()
+    drivers = []
+
+    def factory():
+        started.set()
+        proceed.wait(5)
+        drivers.append(FakeBrowser())
+        return drivers[-1]
+
+    pool = ContextPool(factory, max_contexts=2)
+    tabs = []
+    launcher = threading.Thread(target=lambda: tabs.append(pool.acquire()))
+    launcher.start()
+    assert started.wait(5)
+
+    # The pool stays responsive while the browser launches
+    reader = threading.Thread(target=pool.stats)
+    reader.start()
+    reader.join(1)
+    assert not reader.is_alive()
+
+    proceed.set()
+    launcher.join(5)
+    tabs.append(pool.acquire(timeout=1))
+    assert tabs[0].browser is tabs[1].browser is drivers[0]
+    assert pool.stats()['launched'] == 1 and pool.stats()['active_contexts'] == 2
+    for tab in tabs:
+        pool.release(tab)
+
+
+def make_keyed_pool(**kwargs):
+    launched = []
+
+    def factory(key):
+        launched.append((key, FakeDriver()))
+        return launched[-1][1]
+
+    return KeyedBrowserPool(factory, **kwargs), launched
+
+
+def test_keyed_pool_reuses_browser_and_keeps_recaptcha_state():
+    pool, launched = make_keyed_pool(capacity=2)
+    key = ('user:secret@10.0.0.1:8080', 'UA', True)
+
+    browser = pool.acquire(key)
+    browser.driver.cookies = [
+        {'name': '_GRECAPTCHA', 'value': 'trust', 'domain': 'www.google.com', 'path': '/recaptcha',
+         'expires': 2000000000, 'session': False, 'size': 20},
+        {'name': 'session', 'value': 'x', 'domain': 'example.com', 'path': '/', 'session': True}
+    ]
+    pool.release(browser, 'audio')
+
+    again = pool.acquire(key)
+    assert again is browser and len(launched) == 1
+    assert again.driver.cookies == [{'name': '_GRECAPTCHA', 'value': 'trust', 'domain': 'www.google.com',
+                                     'path': '/recaptcha', 'expires': 2000000000}]
+    # The site's storage is wiped, reCAPTCHA's is kept
+    cleared = again.driver.cleared_origins
+    assert 'https://example.com' in cleared
+    assert not any(origin in cleared for origin in ('https://www.google.com', 'https://www.recaptcha.net',
+                                                    'https://recaptcha.net'))
+    pool.release(again, 'checkbox')
+
+    stats = pool.stats()
+    assert stats['hits'] == 1 and stats['hit_rate'] == 0.5
+    [entry] = stats['keys']
+    assert entry['proxy'] == 'user:***@10.0.0.1:8080'
+    assert entry['hit_rate'] == 0.5 and entry['checkbox_rate'] == 0.5
+
+
+def test_keyed_pool_evicts_least_recently_used_key():
+    pool, launched = make_keyed_pool(capacity=2)
+    keys = [('10.0.0.1:8080', None, True), ('10.0.0.2:8080', None, True), ('10.0.0.3:8080', None, True)]
+
+    for key in keys[:2]:
+        pool.release(pool.acquire(key), 'checkbox')
+    pool.release(pool.acquire(keys[0]), 'checkbox')  # keys[1] is now least recently used
+
+    browser = pool.acquire(keys[2])
+    assert browser.key == keys[2]
+    assert not launched[1][1].alive and launched[0][1].alive
+    stats = pool.stats()
+    assert stats['evicted'] == 1 and stats['alive'] == 2
+
+    # Every browser busy: a new key waits instead of evicting
+    held = pool.acquire(keys[0])
+    try:
+        pool.acquire(keys[1], timeout=0.1)
+        assert False, "Expected a timeout"
+    except Exception as e:
+        assert 'Timed out' in str(e)
+    pool.release(held)
+    pool.release(browser)
+
+
+
+def test_keyed_pool_retries_failing_launches_then_gives_up():
+    calls = []
+
+    def factory(key):
+        calls.append(key)
+        if key[0] == 'dead:1' or len(calls) < 2:
+            raise Exception("chrome not found")
+        return FakeDriver()
+
+    pool = KeyedBrowserPool(factory, capacity=2)
+    pool.LAUNCH_RETRY_DELAY = 0.05
+    browser = pool.acquire(('10.0.0.1:8080', None, True), timeout=1)
+    assert len(calls) == 2
+    pool.release(browser)
+
+    try:
+        pool.acquire(('dead:1', None, True), timeout=0.3)
+        assert False, "Expected a launch failure"
+    except Exception as e:
+        assert 'chrome not found' in str(e)
+    assert pool.stats()['alive'] == 1
+
+
+if __name__ == "__main__":
+    for test in (test_lease_reuses_and_resets_browser, test_browser_recycled_after_max_uses,
+                 test_unhealthy_browser_is_replaced, test_lease_times_out_when_exhausted,
+                 test_lease_gives_up_when_launches_keep_failing,
+                 test_contexts_share_one_browser_and_are_disposed,
+                 test_shared_browser_relaunched_after_max_uses,
+                 test_failed_last_context_retires_the_browser,
+                 test_shared_browser_launches_outside_the_lock,
+                 test_keyed_pool_reuses_browser_and_keeps_recaptcha_state,
+                 test_keyed_pool_evicts_least_recently_used_key,
+                 test_keyed_pool_retries_failing_launches_then_gives_up):
+        test()
+        print(f"✅ {test.__name__}")
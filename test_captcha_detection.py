@@ -0,0 +1,62 @@
+"""Tests for single-pass captcha detection, driven by scripted page states."""
+
+import time
+
+from captcha_detection import DETECTION_SCRIPT, detect_captcha
+
+
+class ScriptedPage:
+    """Returns one detection state per poll, repeating the last one."""
+
+    def __init__(self, *states):
+        self.states = list(states)
+        self.polls = 0
+
+    def run_js(self, script):
+        assert script == DETECTION_SCRIPT
+        self.polls += 1
+        return self.states[min(self.polls, len(self.states)) - 1]
+
+
+LOADING = {'type': None, 'sitekey': None, 'pending': False, 'ready': False}
+LOADED = {'type': None, 'sitekey': None, 'pending': False, 'ready': True}
+PENDING = {'type': None, 'sitekey': 'site-key', 'pending': True, 'ready': True}
+ANCHOR = {'type': 'recaptcha_v2', 'sitekey': 'site-key', 'pending': False, 'ready': True}
+
+
+def test_returns_as_soon_as_widget_renders():
+    page = ScriptedPage(LOADING, PENDING, ANCHOR)
+    detection = detect_captcha(page, timeout=5)
+    assert detection == {'found': True, 'type': 'recaptcha_v2', 'sitekey': 'site-key', 'solvable': True}
+    assert page.polls == 3
+
+
+def test_page_without_captcha_returns_after_settling():
+    start = time.time()
+    detection = detect_captcha(ScriptedPage(LOADING, LOADED), timeout=10, settle=0.2)
+    elapsed = time.time() - start
+    assert not detection['found'] and detection['type'] is None
+    assert 0.2 <= elapsed < 0.6
+
+
+def test_pending_widget_is_awaited_until_timeout():
+    start = time.time()
+    detection = detect_captcha(ScriptedPage(PENDING), timeout=0.5, settle=0.05)
+    assert time.time() - start >= 0.5
+    assert not detection['found'] and detection['sitekey'] == 'site-key'
+
+
+def test_unsupported_widgets_are_reported_but_not_solvable():
+    hcaptcha = dict(LOADED, type='hcaptcha')
+    detection = detect_captcha(ScriptedPage(hcaptcha))
+    assert detection['found'] and detection['type'] == 'hcaptcha'
+    assert not detection['solvable']
+
+
+if __name__ == "__main__":
+    for test in (test_returns_as_soon_as_widget_renders,
+                 test_page_without_captcha_returns_after_settling,
+                 test_pending_widget_is_awaited_until_timeout,
+                 test_unsupported_widgets_are_reported_but_not_solvable):
+        test()
+        print(f"✅ {test.__name__}")
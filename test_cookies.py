@@ -0,0 +1,64 @@
+"""Tests for bulk cookie injection and extraction, using a fake CDP driver."""
+
+from api import CaptchaAPI
+from test_fakes import FakeCDP
+
+
+class CookieCDP(FakeCDP):
+    """Rejects cookies named 'bad' like Chromium rejects malformed ones."""
+
+    def respond(self, cmd, args):
+        assert cmd in ('Network.setCookies', 'Network.getCookies'), f"Unexpected command {cmd}"
+        if cmd == 'Network.setCookies' and any(cookie['name'] == 'bad' for cookie in args['cookies']):
+            raise Exception("Invalid cookie fields")
+        return super().respond(cmd, args)
+
+    def get(self, url):
+        raise AssertionError("Cookies must be set without loading a page")
+
+
+def test_cookies_are_set_in_one_call_without_navigation():
+    driver = CookieCDP()
+    CaptchaAPI.set_cookies(driver, [
+        {'name': 'session', 'value': 'abc', 'httpOnly': True, 'sameSite': 'Lax'},
+        {'name': 'prefs', 'value': 'dark', 'domain': '.example.com', 'expires': 1900000000},
+        {'value': 'nameless'}
+    ], 'www.example.com')
+
+    assert [command for command, _ in driver.commands] == ['Network.setCookies']
+    assert driver.jar == [
+        {'name': 'session', 'value': 'abc', 'httpOnly': True, 'sameSite': 'Lax',
+         'domain': 'www.example.com', 'path': '/'},
+        {'name': 'prefs', 'value': 'dark', 'domain': '.example.com', 'expires': 1900000000, 'path': '/'}
+    ]
+
+
+def test_malformed_cookie_does_not_drop_the_batch():
+    driver = CookieCDP()
+    CaptchaAPI.set_cookies(driver, [{'name': 'good', 'value': '1'}, {'name': 'bad', 'value': '2'}],
+                           'example.com')
+    assert [cookie['name'] for cookie in driver.jar] == ['good']
+
+
+def test_get_all_cookies_returns_jar_in_one_call():
+    driver = CookieCDP(jar=[
+        {'name': 'session', 'value': 'abc', 'domain': 'example.com', 'path': '/', 'expires': -1,
+         'size': 10, 'httpOnly': True, 'secure': False, 'session': True, 'priority': 'Medium'},
+        {'name': 'prefs', 'value': 'dark', 'domain': '.example.com', 'path': '/', 'expires': 1900000000,
+         'size': 9, 'httpOnly': False, 'secure': True, 'session': False, 'sameSite': 'None'}
+    ])
+    assert CaptchaAPI.get_all_cookies(driver) == [
+        {'name': 'session', 'value': 'abc', 'domain': 'example.com', 'path': '/', 'httpOnly': True,
+         'secure': False},
+        {'name': 'prefs', 'value': 'dark', 'domain': '.example.com', 'path': '/', 'expires': 1900000000,
+         'httpOnly': False, 'secure': True, 'sameSite': 'None'}
+    ]
+    assert len(driver.commands) == 1
+
+
+if __name__ == "__main__":
+    for test in (test_cookies_are_set_in_one_call_without_navigation,
+                 test_malformed_cookie_does_not_drop_the_batch,
+                 test_get_all_cookies_returns_jar_in_one_call):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,46 @@
+"""Fakes shared by the offline tests."""
+
+
+class FakeClock:
+    """Simulated time for components that take a ``clock``; ``sleep`` advances it."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeCDP:
+    """Page driver that records CDP commands, keeps a cookie jar and lets tests fire CDP events."""
+
+    def __init__(self, jar=None):
+        self.commands = []
+        self.callbacks = {}
+        self.jar = jar or []
+        self.driver = self
+
+    def set_callback(self, event, callback, immediate=False):
+        if callback:
+            self.callbacks[event] = callback
+        else:
+            self.callbacks.pop(event, None)
+
+    def fire(self, event, **params):
+        self.callbacks[event](**params)
+
+    def run_cdp(self, cmd, **args):
+        self.commands.append((cmd, args))
+        return self.respond(cmd, args)
+
+    def respond(self, cmd, args):
+        if cmd == 'Network.setCookies':
+            self.jar.extend(args['cookies'])
+        elif cmd == 'Network.getCookies':
+            return {'cookies': self.jar}
+        return {}
@@ -0,0 +1,84 @@
+"""Tests for the asynchronous job API worker pool."""
+
+import threading
+import time
+
+from api import app
+from jobs import JobManager, QueueFullError
+
+
+def wait_for(manager, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.get(job_id)
+        if job['status'] not in (JobManager.QUEUED, JobManager.RUNNING):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def test_job_returns_result():
+    manager = JobManager(lambda url: {'success': True, 'url': url}, workers=1)
+
+    job = manager.submit({'url': 'https://example.com'})
+    assert job['status'] == JobManager.QUEUED
+
+    job = wait_for(manager, job['job_id'])
+    assert job['status'] == JobManager.DONE
+    assert job['result'] == {'success': True, 'url': 'https://example.com'}
+
+
+def test_failed_job_reports_error():
+    def handler():
+        raise RuntimeError("browser crashed")
+
+    manager = JobManager(handler, workers=1)
+    job = wait_for(manager, manager.submit({})['job_id'])
+    assert job['status'] == JobManager.FAILED
+    assert 'browser crashed' in job['error']
+
+
+def test_queue_is_bounded():
+    started, release = threading.Event(), threading.Event()
+
+    def handler():
+        started.set()
+        release.wait()
+
+    manager = JobManager(handler, workers=1, max_queue=1)
+    manager.submit({})
+    assert started.wait(5)  # the worker holds the first job
+    manager.submit({})
+    try:
+        manager.submit({})
+        assert False, "Expected the queue to be full"
+    except QueueFullError:
+        pass
+
+    assert manager.stats()['queue_depth'] == 1
+    release.set()
+
+
+def test_job_times_out():
+    release = threading.Event()
+    manager = JobManager(lambda: release.wait(), workers=1)
+
+    job = manager.submit({}, timeout=0.05)
+    time.sleep(0.1)
+    assert manager.get(job['job_id'])['status'] == JobManager.TIMEOUT
+    release.set()
+
+
+def test_invalid_job_timeout_is_rejected():
+    client = app.test_client()
+    for timeout in ('30', -5, 0, True, [10]):
+        response = client.post('/solve-captcha/jobs', json={'url': 'https://example.com', 'timeout': timeout})
+        assert response.status_code == 400
+        assert response.get_json()['error'] == 'Timeout must be a positive number of seconds'
+
+
+if __name__ == "__main__":
+    for test in (test_job_returns_result, test_failed_job_reports_error,
+                 test_queue_is_bounded, test_job_times_out, test_invalid_job_timeout_is_rejected):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,45 @@
+"""Tests for the stage timings and the Prometheus metrics endpoint."""
+
+import metrics
+from api import app
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram('demo_seconds', 'Demo', ['stage'], buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage='click')
+    histogram.observe(0.5, stage='click')
+    histogram.observe(5.0, stage='click')
+    lines = histogram.render()
+    assert '# TYPE demo_seconds histogram' in lines
+    assert 'demo_seconds_bucket{stage="click",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{stage="click",le="1"} 2' in lines
+    assert 'demo_seconds_bucket{stage="click",le="+Inf"} 3' in lines
+    assert 'demo_seconds_count{stage="click"} 3' in lines
+    assert 'demo_seconds_sum{stage="click"} 5.55' in lines
+
+
+def test_timed_records_stage_seconds():
+    timings = {}
+    with metrics.timed(timings, 'navigation'):
+        pass
+    assert list(timings) == ['navigation'] and timings['navigation'] >= 0
+
+
+def test_metrics_endpoint_exports_stages_and_outcomes():
+    before = metrics.SOLVE_OUTCOMES.value(outcome='checkbox')
+    metrics.record_solve('checkbox', 3.2, {'browser_launch': 0.4, 'checkbox_result': 0.9})
+
+    response = app.test_client().get('/metrics')
+    body = response.get_data(as_text=True)
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    assert f'recaptcha_solve_outcomes_total{{outcome="checkbox"}} {before + 1:g}' in body
+    assert 'recaptcha_stage_seconds_bucket{stage="checkbox_result",le="1"}' in body
+    assert 'recaptcha_solve_seconds_count{outcome="checkbox"}' in body
+
+
+if __name__ == "__main__":
+    for test in (test_histogram_renders_cumulative_buckets, test_timed_records_stage_seconds,
+                 test_metrics_endpoint_exports_stages_and_outcomes):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,122 @@
+"""Tests for the demand-forecasting prefetch scheduler.
+
+A simulated arrival trace drives a TokenPool with a fake solver on a virtual
+clock, so no browser or network is involved.
+"""
+
+import heapq
+import random
+
+from prefetch_scheduler import PrefetchScheduler
+from test_fakes import FakeClock
+from token_pool import TokenPool
+
+URL = 'https://example.com/form'
+
+
+class SimulatedExecutor:
+    """Runs submitted solves once their simulated latency has elapsed."""
+
+    def __init__(self, clock, latency):
+        self.clock = clock
+        self.latency = latency
+        self.pending = []
+
+    def submit(self, fn, *args):
+        heapq.heappush(self.pending, (self.clock() + self.latency, id(args), fn, args))
+
+    def run_due(self):
+        while self.pending and self.pending[0][0] <= self.clock():
+            _, _, fn, args = heapq.heappop(self.pending)
+            fn(*args)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.pending = []
+
+
+def simulate(arrivals, scheduler=None, depth=20, latency=20.0, duration=1800):
+    """Replay an arrival trace against a pool and return its counters."""
+    clock = FakeClock(now=0.0)
+    if scheduler is not None:
+        scheduler.clock = clock
+    pool = TokenPool(solver=lambda url: {'success': True, 'token': 'token'},
+                     scheduler=scheduler, clock=clock)
+    pool.register(URL, depth=depth)
+    pool._executor = SimulatedExecutor(clock, latency)
+
+    arrivals = sorted(arrivals)
+    index = 0
+    for second in range(duration):
+        clock.now = float(second)
+        pool._executor.run_due()
+        while index < len(arrivals) and arrivals[index] < second + 1:
+            clock.now = arrivals[index]
+            pool.take(URL)
+            index += 1
+        clock.now = float(second)
+        pool.fill()
+
+    stats = pool.stats()['targets'][URL]
+    stats['solves'] = stats['minted'] + stats['in_flight']
+    return stats
+
+
+def poisson_trace(rate, start, end, seed):
+    rng = random.Random(seed)
+    arrivals, t = [], start
+    while True:
+        t += rng.expovariate(rate)
+        if t >= end:
+            return arrivals
+        arrivals.append(t)
+
+
+def test_rate_estimate_tracks_arrivals():
+    clock = FakeClock(now=0.0)
+    scheduler = PrefetchScheduler(half_life=30, clock=clock)
+    for t in poisson_trace(0.5, 0, 600, seed=1):
+        clock.now = t
+        scheduler.record_request(URL)
+    clock.now = 600
+    assert 0.35 < scheduler.rate(URL) < 0.65
+
+    clock.now = 900  # ten half-lives of silence
+    assert scheduler.rate(URL) < 0.001
+    assert scheduler.target_depth(URL) == 0
+
+
+def test_depth_follows_latency_and_success_rate():
+    clock = FakeClock(now=0.0)
+    scheduler = PrefetchScheduler(half_life=30, burst_z=0, clock=clock)
+    for second in range(0, 300, 10):
+        clock.now = second
+        scheduler.record_request(URL)  # one request every ten seconds
+    baseline = scheduler.target_depth(URL)
+
+    for _ in range(30):
+        scheduler.record_solve(URL, latency=40, success=True)
+    slower = scheduler.target_depth(URL)
+    for _ in range(30):
+        scheduler.record_solve(URL, latency=40, success=False)
+
+    assert baseline < slower < scheduler.target_depth(URL)
+
+
+def test_adaptive_depth_beats_fixed_depths_on_bursty_trace():
+    # Quiet period, a burst, then quiet again
+    trace = (poisson_trace(0.02, 0, 600, seed=2) + poisson_trace(0.5, 600, 1200, seed=3)
+             + poisson_trace(0.02, 1200, 1800, seed=4))
+
+    adaptive = simulate(trace, scheduler=PrefetchScheduler(half_life=30))
+    shallow = simulate(trace, depth=1)
+    deep = simulate(trace, depth=12)
+
+    assert adaptive['hit_rate'] > shallow['hit_rate'] + 0.2
+    assert adaptive['expired'] < deep['expired'] / 2
+
+
+if __name__ == "__main__":
+    for test in (test_rate_estimate_tracks_arrivals, test_depth_follows_latency_and_success_rate,
+                 test_adaptive_depth_beats_fixed_depths_on_bursty_trace):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,94 @@
+"""Tests for the per-proxy circuit breaker, on a simulated clock."""
+
+from api import CaptchaAPI
+from proxy_health import CircuitOpenError, ProxyHealth
+from test_fakes import FakeClock
+
+
+def expect_open(health, proxy):
+    try:
+        health.acquire(proxy)
+    except CircuitOpenError as e:
+        return e.retry_after
+    assert False, "Expected an open circuit"
+
+
+def test_circuit_opens_and_cools_down_exponentially():
+    clock = FakeClock()
+    health = ProxyHealth(failure_threshold=2, base_cooldown=60, clock=clock)
+    proxy = 'user:pass@10.0.0.1:8080'
+
+    for _ in range(2):
+        assert health.acquire(proxy) == proxy
+        health.record(proxy, 'bot_detected')
+    assert expect_open(health, proxy) == 60
+    # The exit address is shared by other proxies on the same host
+    assert expect_open(health, 'other:creds@10.0.0.1:9090') == 60
+
+    # Half-open: one trial, whose failure doubles the cool-down
+    clock.now += 61
+    assert health.acquire(proxy) == proxy
+    expect_open(health, proxy)
+    health.record(proxy, 'failed')
+    assert expect_open(health, proxy) == 120
+
+    # A successful trial closes the circuit
+    clock.now += 121
+    health.acquire(proxy)
+    health.record(proxy, 'audio')
+    assert health.acquire(proxy) == proxy
+    stats = health.stats()['circuits']['user:***@10.0.0.1:8080']
+    assert stats['state'] == 'closed' and stats['failures'] == 3 and stats['rejected'] == 3
+
+
+def test_unpinned_requests_are_routed_to_healthiest_proxy():
+    clock = FakeClock()
+    health = ProxyHealth(proxies=['10.0.0.1:8080', '10.0.0.2:8080'], failure_threshold=1, clock=clock)
+
+    health.record('10.0.0.2:8080', 'checkbox')
+    assert health.acquire() == '10.0.0.2:8080'
+    health.record('10.0.0.2:8080', 'bot_detected')
+    assert health.acquire() == '10.0.0.1:8080'
+    health.record('10.0.0.1:8080', 'bot_detected')
+    assert expect_open(health, None) == 60
+    circuits = health.stats()['circuits']
+    assert circuits['10.0.0.1:8080']['rejected'] == circuits['ip:10.0.0.2']['rejected'] == 1
+
+
+def test_routing_ranks_proxies_by_their_exit_address_too():
+    health = ProxyHealth(proxies=['a:x@10.0.0.1:8080', 'b:x@10.0.0.1:9090', '10.0.0.2:8080'],
+                         failure_threshold=3, clock=FakeClock())
+    for _ in range(2):
+        health.record('a:x@10.0.0.1:8080', 'bot_detected')
+    health.record('10.0.0.2:8080', 'failed')
+
+    # b has no failures of its own, but shares the failing exit address of a
+    assert health.routable() == ['10.0.0.2:8080', 'a:x@10.0.0.1:8080', 'b:x@10.0.0.1:9090']
+    assert health.acquire() == '10.0.0.2:8080'
+
+
+def refuse_launch(**kwargs):
+    raise AssertionError("A browser was launched for an open circuit")
+
+
+def test_open_circuit_rejects_solve_without_a_browser():
+    health = CaptchaAPI.enable_proxy_health(failure_threshold=1)
+    health.record('10.9.9.9:8080', 'bot_detected')
+    original = CaptchaAPI.create_driver
+    CaptchaAPI.create_driver = staticmethod(refuse_launch)
+    try:
+        result = CaptchaAPI.solve_captcha_on_page('https://example.com', proxy='10.9.9.9:8080')
+    finally:
+        CaptchaAPI.create_driver = original
+        CaptchaAPI.proxy_health = None
+    assert result['outcome'] == 'circuit_open' and not result['success']
+    assert 59 <= result['retry_after'] <= 60
+
+
+if __name__ == "__main__":
+    for test in (test_circuit_opens_and_cools_down_exponentially,
+                 test_unpinned_requests_are_routed_to_healthiest_proxy,
+                 test_routing_ranks_proxies_by_their_exit_address_too,
+                 test_open_circuit_rejects_solve_without_a_browser):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,104 @@
+"""Tests for the per-domain/per-proxy token-bucket scheduler, on a simulated clock."""
+
+from api import CaptchaAPI
+from proxy_health import CircuitOpenError, ProxyHealth
+from rate_scheduler import RateLimitedError, RateScheduler
+from test_fakes import FakeClock
+
+
+def make_scheduler(**kwargs):
+    clock = FakeClock()
+    return RateScheduler(clock=clock, sleep=clock.sleep, **kwargs), clock
+
+
+def test_domain_burst_then_paced():
+    scheduler, clock = make_scheduler(domain_rate=6, domain_burst=2, proxy_rate=600, proxy_burst=10,
+                                      domain_limits={'slow.example': (1, 1)})
+    waits = [scheduler.acquire('https://example.com/form')[1] for _ in range(4)]
+    assert waits == [0, 0, 10, 10]
+
+    # Other domains have their own budget; overrides apply per domain
+    assert scheduler.acquire('https://other.example/')[1] == 0
+    assert [scheduler.acquire('https://slow.example/')[1] for _ in range(2)] == [0, 60]
+
+    clock.now += 60
+    assert scheduler.acquire('https://example.com/form')[1] == 0
+    stats = scheduler.stats()['domains']['example.com']
+    assert stats['started'] == 5 and stats['delayed'] == 2 and stats['queued'] == 0
+
+
+def test_unpinned_solves_are_spread_across_proxies():
+    scheduler, _ = make_scheduler(domain_rate=600, domain_burst=10, proxy_rate=4, proxy_burst=1)
+    proxies = ['10.0.0.1:8080', '10.0.0.2:8080']
+    chosen = [scheduler.acquire('https://example.com', candidates=proxies)[:2] for _ in range(4)]
+    assert chosen == [('10.0.0.1:8080', 0), ('10.0.0.2:8080', 0), ('10.0.0.1:8080', 15), ('10.0.0.2:8080', 0)]
+    # A pinned proxy waits for its own bucket
+    assert scheduler.acquire('https://example.com', proxy='10.0.0.1:8080')[:2] == ('10.0.0.1:8080', 15)
+
+
+def test_solves_beyond_max_wait_are_refused():
+    scheduler, clock = make_scheduler(domain_rate=6, domain_burst=1, proxy_rate=600, proxy_burst=10, max_wait=5)
+    scheduler.acquire('https://example.com')
+    try:
+        scheduler.acquire('https://example.com')
+        assert False, "Expected RateLimitedError"
+    except RateLimitedError as e:
+        assert e.retry_after == 10
+    assert clock.sleeps == []
+
+
+def test_admission_routes_around_open_circuits():
+    scheduler, clock = make_scheduler(domain_rate=600, domain_burst=10, proxy_rate=4, proxy_burst=1)
+    health = ProxyHealth(proxies=['10.0.0.1:8080', '10.0.0.2:8080'], failure_threshold=1, clock=clock)
+    health.record('10.0.0.1:8080', 'bot_detected')
+    CaptchaAPI.proxy_health, CaptchaAPI.rate_scheduler = health, scheduler
+    try:
+        stages = {}
+        assert CaptchaAPI.admit_request('https://example.com', None, stages) == '10.0.0.2:8080'
+        assert CaptchaAPI.admit_request('https://example.com', None, stages) == '10.0.0.2:8080'
+        assert clock.sleeps == [15] and 'rate_limit' in stages
+    finally:
+        CaptchaAPI.proxy_health = CaptchaAPI.rate_scheduler = None
+
+
+
+def test_refused_admission_returns_its_tokens():
+    scheduler, clock = make_scheduler(domain_rate=6, domain_burst=1, proxy_rate=4, proxy_burst=1)
+    health = ProxyHealth(proxies=['10.0.0.1:8080'], failure_threshold=1, clock=clock)
+    # The proxy looked healthy when routed, but its circuit opens before the start
+    health.routable = lambda: ['10.0.0.1:8080']
+    health.record('10.0.0.1:8080', 'bot_detected')
+    CaptchaAPI.proxy_health, CaptchaAPI.rate_scheduler = health, scheduler
+    try:
+        try:
+            CaptchaAPI.admit_request('https://example.com', None, {})
+            assert False, "Expected CircuitOpenError"
+        except CircuitOpenError:
+            pass
+        stats = scheduler.stats()
+        for bucket in (stats['domains']['example.com'], stats['proxies']['10.0.0.1:8080']):
+            assert bucket['started'] == 0 and bucket['next_start_in'] == 0
+    finally:
+        CaptchaAPI.proxy_health = CaptchaAPI.rate_scheduler = None
+
+
+
+def test_refund_leaves_a_recreated_bucket_alone():
+    scheduler, clock = make_scheduler(domain_rate=6, domain_burst=1, proxy_rate=600, proxy_burst=10)
+    scheduler.MAX_BUCKETS = 1
+    _, _, spent = scheduler.acquire('https://a.example')
+    clock.now += 60
+    scheduler.acquire('https://b.example')  # Sweeps the idle bucket of a.example
+    scheduler.acquire('https://a.example')  # Spends the first token of a new bucket
+    scheduler.refund(spent)
+    bucket = scheduler.stats()['domains']['a.example']
+    assert bucket['started'] == 1 and bucket['next_start_in'] == 10
+
+if __name__ == "__main__":
+    for test in (test_domain_burst_then_paced,
+                 test_unpinned_solves_are_spread_across_proxies,
+                 test_solves_beyond_max_wait_are_refused,
+                 test_admission_routes_around_open_circuits,
+                 test_refused_admission_returns_its_tokens, test_refund_leaves_a_recreated_bucket_alone):
+        test()
+        print(f"✅ {test.__name__}")
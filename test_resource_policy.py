@@ -0,0 +1,63 @@
+"""Tests for resource blocking through CDP Fetch interception, using a fake CDP driver."""
+
+from api import parse_solve_request
+from resource_policy import ResourceBlocker, ResourcePolicy
+from test_fakes import FakeCDP
+
+
+def pause(cdp, request_id, url, resource_type):
+    cdp.fire('Fetch.requestPaused', requestId=request_id, request={'url': url},
+             resourceType=resource_type, frameId='main')
+
+
+def test_default_policy_never_blocks_recaptcha():
+    policy = ResourcePolicy.from_request(None)
+    assert policy.blocks('https://example.com/hero.jpg', 'Image')
+    assert policy.blocks('https://www.google-analytics.com/analytics.js', 'Script')
+    assert not policy.blocks('https://example.com/app.js', 'Script')
+    assert not policy.blocks('https://www.google.com/recaptcha/api2/payload?p=1', 'Media')
+    assert not policy.blocks('https://www.gstatic.com/recaptcha/releases/x/recaptcha__en.js', 'Script')
+    assert ResourcePolicy.from_request(False) is None
+
+
+def test_request_policy_is_validated():
+    params, error = parse_solve_request({'url': 'https://example.com',
+                                         'resource_policy': {'block_types': ['Stylesheet']}})
+    assert error is None and params['resource_policy'] == {'block_types': ['Stylesheet']}
+    for bad in ({'block_types': ['Pictures']}, {'block_types': ['Document']}, {'block': []}, 'images'):
+        params, error = parse_solve_request({'url': 'https://example.com', 'resource_policy': bad})
+        assert params is None and error
+
+
+def test_blocker_fails_blocked_requests_and_reports_savings():
+    cdp = FakeCDP()
+    blocker = ResourceBlocker(cdp, ResourcePolicy(block_types=['Image', 'Font'], block_patterns=['*ads.example/*']))
+    blocker.start()
+    command, args = cdp.commands[0]
+    assert command == 'Fetch.enable'
+    assert {'urlPattern': '*ads.example/*', 'requestStage': 'Request'} in args['patterns']
+
+    pause(cdp, '1', 'https://example.com/a.png', 'Image')
+    pause(cdp, '2', 'https://example.com/b.woff2', 'Font')
+    pause(cdp, '3', 'https://ads.example/tag.js', 'Script')
+    pause(cdp, '4', 'https://www.gstatic.com/recaptcha/api2/logo_48.png', 'Image')
+    resolved = {args['requestId']: command for command, args in cdp.commands[1:]}
+    assert resolved == {'1': 'Fetch.failRequest', '2': 'Fetch.failRequest', '3': 'Fetch.failRequest',
+                        '4': 'Fetch.continueRequest'}
+
+    stats = blocker.stats({'bytes': 200000, 'seconds': 2.0})
+    assert stats['blocked'] == 3
+    assert stats['blocked_by_type'] == {'Image': 1, 'Font': 1, 'Script': 1}
+    assert stats['heuristic_bytes_saved'] == 75000
+    assert stats['heuristic_seconds_saved'] == 0.75
+
+    blocker.stop()
+    assert cdp.commands[-1][0] == 'Fetch.disable'
+    assert 'Fetch.requestPaused' not in cdp.callbacks
+
+
+if __name__ == "__main__":
+    for test in (test_default_policy_never_blocks_recaptcha, test_request_policy_is_validated,
+                 test_blocker_fails_blocked_requests_and_reports_savings):
+        test()
+        print(f"✅ {test.__name__}")
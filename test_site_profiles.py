@@ -0,0 +1,138 @@
+"""Tests for the learned site profiles."""
+
+import os
+import tempfile
+
+import api
+from RecaptchaSolver import RecaptchaSolver
+from api import CaptchaAPI
+from captcha_detection import SOLVABLE_TYPES
+from site_profiles import SiteProfiles, profile_key
+from test_fakes import FakeCDP
+
+URL = 'https://www.bps.gub.uy/blanqueo/?id=1'
+STAGES = {'detection': 1.0, 'anchor_iframe': 0.2, 'checkbox_click': 0.1, 'checkbox_result': 0.5}
+
+
+def learn(profiles, url=URL, captcha_type='recaptcha_v2', sitekey='key', outcomes=('audio',)):
+    for outcome in outcomes:
+        profiles.record(url, captcha_type, sitekey, STAGES, outcome)
+
+
+def test_profile_skips_detection_and_sizes_waits():
+    profiles = SiteProfiles(min_samples=3)
+    learn(profiles, outcomes=('audio', 'checkbox'))
+    assert profiles.plan(URL, SOLVABLE_TYPES) is None
+
+    learn(profiles, url='https://www.bps.gub.uy/blanqueo?id=2')
+    assert profile_key(URL) == 'www.bps.gub.uy/blanqueo'
+    plan = profiles.plan(URL, SOLVABLE_TYPES)
+    assert plan['captcha_type'] == 'recaptcha_v2' and plan['sitekey'] == 'key'
+    # p95 times the margin for the widget, the floor for the fast checkbox verdict
+    assert plan['timeouts'] == {'anchor_iframe': 2.4, 'checkbox_result': 2.0}
+    assert plan['detection_timeout'] == 2.4
+    assert plan['checkbox_rate'] == 0.333
+
+    solver = RecaptchaSolver(None, timeouts=plan['timeouts'])
+    assert solver._timeout('anchor_iframe') == 2.4
+    assert solver._timeout('verify') == RecaptchaSolver.TIMEOUT_STANDARD
+
+
+def test_changed_or_unsolvable_widget_runs_detection():
+    profiles = SiteProfiles(min_samples=2)
+    learn(profiles, outcomes=('audio', 'audio'))
+    assert profiles.plan(URL, SOLVABLE_TYPES)['captcha_type'] == 'recaptcha_v2'
+
+    profiles.mismatch(URL)
+    assert profiles.plan(URL, SOLVABLE_TYPES)['captcha_type'] is None
+    learn(profiles, sitekey='other', outcomes=('audio',))
+    assert profiles.plan(URL, SOLVABLE_TYPES)['captcha_type'] is None
+    learn(profiles, sitekey='other', outcomes=('audio',))
+    assert profiles.plan(URL, SOLVABLE_TYPES)['sitekey'] == 'other'
+
+    learn(profiles, url='https://example.com/form', captcha_type='hcaptcha', outcomes=('unsupported',) * 3)
+    assert profiles.plan('https://example.com/form', SOLVABLE_TYPES)['captcha_type'] is None
+    stats = profiles.stats()
+    assert stats['mismatches'] == 1 and stats['sites'][profile_key(URL)]['mismatches'] == 1
+
+
+def test_disk_tier_survives_restart():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'profiles.db')
+        profiles = SiteProfiles(path=path, min_samples=2)
+        learn(profiles, outcomes=('checkbox', 'checkbox'))
+        profiles.close()
+
+        reopened = SiteProfiles(path=path, min_samples=2)
+        plan = reopened.plan(URL, SOLVABLE_TYPES)
+        assert plan['captcha_type'] == 'recaptcha_v2' and plan['checkbox_rate'] == 1.0
+        reopened.close()
+
+
+
+class StaleDriver(FakeCDP):
+    """Page whose profiled widget moved: it only shows up once detection runs again."""
+
+    class wait:
+        @staticmethod
+        def doc_loaded(timeout=None):
+            return True
+
+    def get(self, url):
+        pass
+
+    def close(self):
+        pass
+
+
+class StaleSolver:
+    """Solver that misses the widget on its first run and passes the checkbox on the next."""
+    runs = 0
+
+    def __init__(self, driver, **kwargs):
+        StaleSolver.runs += 1
+        self.first = StaleSolver.runs == 1
+        self.timings, self.expired = {}, []
+        self.outcome, self.transcript_cached, self.attempts = None, False, 0
+
+    def solveCaptcha(self):
+        self.timings['anchor_iframe'] = 2.4 if self.first else 0.3
+        if self.first:
+            self.expired.append('anchor_iframe')
+            self.outcome = 'no_widget'
+            raise Exception("reCAPTCHA widget not found")
+        self.timings['checkbox_result'] = 0.5
+        self.outcome = 'checkbox'
+
+    def get_token(self):
+        return 'token'
+
+    def is_solved(self):
+        return True
+
+
+def test_stale_profile_reports_both_attempts():
+    profiles = SiteProfiles(min_samples=1)
+    learn(profiles)
+    originals = CaptchaAPI.create_driver, api.RecaptchaSolver, api.detect_captcha
+    CaptchaAPI.site_profiles = profiles
+    CaptchaAPI.create_driver = staticmethod(lambda **kwargs: StaleDriver())
+    api.RecaptchaSolver = StaleSolver
+    api.detect_captcha = lambda driver, timeout=None: {'found': True, 'type': 'recaptcha_v2',
+                                                      'sitekey': 'key', 'solvable': True}
+    try:
+        result = CaptchaAPI.solve_captcha_on_page(URL, resource_policy=False)
+    finally:
+        CaptchaAPI.create_driver, api.RecaptchaSolver, api.detect_captcha = originals
+        CaptchaAPI.site_profiles = None
+    assert result['outcome'] == 'checkbox' and result['profiled']
+    stages = result['stage_timings']
+    assert stages['profiled_anchor_iframe'] == 2.4 and stages['anchor_iframe'] == 0.3
+    assert 'profiled_checkbox_result' not in stages and stages['checkbox_result'] == 0.5
+
+
+if __name__ == "__main__":
+    for test in (test_profile_skips_detection_and_sizes_waits, test_changed_or_unsolvable_widget_runs_detection,
+                 test_disk_tier_survives_restart, test_stale_profile_reports_both_attempts):
+        test()
+        print(f"✅ {test.__name__}")
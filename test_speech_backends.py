@@ -0,0 +1,161 @@
+"""Tests for the pluggable speech-recognition backends."""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import speech_recognition
+
+from speech_backends import HedgedBackend, ProcessPoolBackend, RecognitionBackend, RecognitionError, Transcript
+
+
+class DelayedBackend(RecognitionBackend):
+    """Stub engine answering after a controllable delay."""
+
+    def __init__(self, name, delay, text='hello world', confidence=0.9, fail=False):
+        self.name = name
+        self.delay = delay
+        self.text = text
+        self.confidence = confidence
+        self.fail = fail
+        self.calls = 0
+
+    def transcribe(self, audio):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RecognitionError(f"{self.name} failed")
+        return Transcript(self.text, self.confidence, self.name)
+
+
+def load_fake_model(label):
+    return {'label': label, 'pid': os.getpid()}
+
+
+def fake_transcribe(model, pcm, sample_rate):
+    if not pcm:
+        raise RecognitionError("no speech")
+    return Transcript(f"{model['label']} {len(pcm)} {sample_rate} {model['pid']}", 0.9, 'fake')
+
+
+def make_audio(samples=160, rate=16000):
+    return speech_recognition.AudioData(b'\x01\x00' * samples, rate, 2)
+
+
+def test_workers_load_model_once_and_transcribe():
+    backend = ProcessPoolBackend(load_fake_model, fake_transcribe, loader_args=('model',), workers=2)
+    try:
+        transcripts = [backend.transcribe(make_audio()) for _ in range(6)]
+    finally:
+        backend.close()
+    pids = set()
+    for transcript in transcripts:
+        label, size, rate, pid = transcript.text.split()
+        assert (label, size, rate) == ('model', '320', '16000')
+        assert transcript.confidence == 0.9
+        assert transcript.backend == 'offline'
+        pids.add(pid)
+    assert str(os.getpid()) not in pids
+    assert len(pids) <= 2
+
+
+def test_recognition_errors_are_raised_in_caller():
+    backend = ProcessPoolBackend(load_fake_model, fake_transcribe, loader_args=('model',), workers=1)
+    try:
+        backend.transcribe(make_audio(samples=0))
+        raised = False
+    except RecognitionError:
+        raised = True
+    finally:
+        backend.close()
+    assert raised
+
+
+def timed_transcribe(backend):
+    start = time.time()
+    transcript = backend.transcribe(make_audio())
+    return transcript, time.time() - start
+
+
+def test_first_confident_result_wins():
+    slow, fast = DelayedBackend('slow', 1.0), DelayedBackend('fast', 0.05)
+    hedged = HedgedBackend([slow, fast])
+    try:
+        transcript, elapsed = timed_transcribe(hedged)
+    finally:
+        hedged.close()
+    assert transcript.backend == 'fast'
+    assert elapsed < 0.5
+    assert hedged.stats()['wins'] == {'slow': 0, 'fast': 1}
+
+
+def test_agreeing_low_confidence_results_are_accepted():
+    backends = [DelayedBackend('a', 0.05, 'Hello, world', 0.3),
+                DelayedBackend('b', 0.1, 'hello world', 0.4),
+                DelayedBackend('c', 1.0, 'hollow word', 0.5)]
+    hedged = HedgedBackend(backends, min_confidence=0.8, agreement=2)
+    try:
+        transcript, elapsed = timed_transcribe(hedged)
+    finally:
+        hedged.close()
+    assert transcript.backend == 'b'
+    assert elapsed < 0.5
+
+
+def test_secondary_starts_only_past_primary_latency_percentile():
+    primary, secondary = DelayedBackend('primary', 0.01), DelayedBackend('secondary', 0.01)
+    hedged = HedgedBackend([primary, secondary], hedge_percentile=95, hedge_delay=0.2)
+    try:
+        for _ in range(HedgedBackend.MIN_LATENCY_SAMPLES):
+            assert timed_transcribe(hedged)[0].backend == 'primary'
+        assert secondary.calls == 0
+
+        primary.delay = 1.0
+        transcript, elapsed = timed_transcribe(hedged)
+    finally:
+        hedged.close()
+    assert transcript.backend == 'secondary'
+    assert elapsed < 0.5
+    assert hedged.stats()['hedges'] == 1
+
+
+def test_failed_primary_hedges_immediately_and_total_failure_raises():
+    failing, backup = DelayedBackend('failing', 0.01, fail=True), DelayedBackend('backup', 0.01)
+    hedged = HedgedBackend([failing, backup], hedge_percentile=95, hedge_delay=5.0)
+    try:
+        transcript, elapsed = timed_transcribe(hedged)
+        assert transcript.backend == 'backup'
+        assert elapsed < 1.0
+
+        backup.fail = True
+        try:
+            hedged.transcribe(make_audio())
+            raised = False
+        except RecognitionError:
+            raised = True
+        assert raised
+    finally:
+        hedged.close()
+
+
+
+def test_timeout_starts_when_a_queued_clip_begins_running():
+    # One thread for three concurrent clips: the last waits 0.6 s for it
+    hedged = HedgedBackend([DelayedBackend('only', 0.3)], timeout=0.45, concurrency=1)
+    try:
+        with ThreadPoolExecutor(max_workers=3) as solves:
+            transcripts = list(solves.map(lambda _: hedged.transcribe(make_audio()), range(3)))
+    finally:
+        hedged.close()
+    assert [transcript.backend for transcript in transcripts] == ['only'] * 3
+    assert hedged.stats()['failed'] == 0
+
+
+if __name__ == "__main__":
+    for test in (test_workers_load_model_once_and_transcribe, test_recognition_errors_are_raised_in_caller,
+                 test_first_confident_result_wins, test_agreeing_low_confidence_results_are_accepted,
+                 test_secondary_starts_only_past_primary_latency_percentile,
+                 test_failed_primary_hedges_immediately_and_total_failure_raises,
+                 test_timeout_starts_when_a_queued_clip_begins_running):
+        test()
+        print(f"✅ {test.__name__}")
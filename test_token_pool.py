@@ -0,0 +1,118 @@
+"""Tests for the pre-solved token pool."""
+
+import threading
+import time
+
+from test_fakes import FakeClock
+from token_pool import TokenPool
+
+URL = 'https://example.com/form'
+
+
+def test_take_returns_freshest_token():
+    clock = FakeClock()
+    pool = TokenPool(solver=None, clock=clock)
+    key = pool.register(URL)
+
+    pool.add(key, {'success': True, 'token': 'old'})
+    clock.now += 30
+    pool.add(key, {'success': True, 'token': 'new'})
+
+    assert pool.take(URL)['token'] == 'new'
+    assert pool.take(URL)['token'] == 'old'
+    assert pool.take(URL) is None
+
+    stats = pool.stats()['targets'][URL]
+    assert (stats['hits'], stats['misses']) == (2, 1)
+
+
+def test_tokens_evicted_before_expiry():
+    clock = FakeClock()
+    pool = TokenPool(solver=None, token_ttl=120, safety_margin=15, clock=clock)
+    key = pool.register(URL)
+
+    pool.add(key, {'success': True, 'token': 'stale'})
+    clock.now += 106
+
+    assert pool.take(URL) is None
+    assert pool.stats()['expired'] == 1
+
+
+def test_unregistered_target_is_not_counted():
+    pool = TokenPool(solver=None)
+    assert pool.take(URL) is None
+    assert pool.stats()['misses'] == 0
+
+
+def test_background_fill_reaches_depth():
+    calls = []
+
+    def solver(url):
+        calls.append(url)
+        return {'success': True, 'token': f"token-{len(calls)}", 'url': url}
+
+    pool = TokenPool(solver=solver)
+    pool.register(URL, depth=3)
+    pool.start()
+    try:
+        assert pool.fill() == 3
+        deadline = time.time() + 5
+        while pool.stats()['targets'][URL]['available'] < 3 and time.time() < deadline:
+            time.sleep(0.01)
+        assert pool.stats()['targets'][URL]['available'] == 3
+        assert pool.fill() == 0
+    finally:
+        pool.stop()
+
+
+def test_failed_solves_are_not_stocked():
+    pool = TokenPool(solver=lambda url: {'success': False, 'token': None})
+    pool.register(URL, depth=1)
+    pool.start()
+    try:
+        pool.fill()
+        deadline = time.time() + 5
+        while pool.stats()['targets'][URL]['failed'] < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        assert pool.stats()['targets'][URL]['available'] == 0
+    finally:
+        pool.stop()
+
+
+
+def test_reregistered_target_ignores_a_stale_mint():
+    release = threading.Event()
+    calls = []
+
+    def solver(url):
+        calls.append(url)
+        if len(calls) == 1:
+            release.wait(5)
+        return {'success': True, 'token': f"token-{len(calls)}", 'url': url}
+
+    # One fill worker: the second solve runs after the stale one has finished
+    pool = TokenPool(solver=solver, fill_workers=1)
+    pool.FILL_INTERVAL = 60  # only the explicit fills below
+    pool.register(URL, depth=1)
+    pool.start()
+    try:
+        assert pool.fill() == 1
+        pool.unregister(URL)
+        pool.register(URL, depth=1)
+        assert pool.fill() == 1
+        release.set()
+        deadline = time.time() + 5
+        while pool.stats()['targets'][URL]['available'] < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        stats = pool.stats()['targets'][URL]
+        assert stats['in_flight'] == 0 and stats['minted'] == 1
+        assert pool.take(URL)['token'] == 'token-2'
+    finally:
+        pool.stop()
+
+if __name__ == "__main__":
+    for test in (test_take_returns_freshest_token, test_tokens_evicted_before_expiry,
+                 test_unregistered_target_is_not_counted, test_background_fill_reaches_depth,
+                 test_failed_solves_are_not_stocked, test_reregistered_target_ignores_a_stale_mint):
+        test()
+        print(f"✅ {test.__name__}")
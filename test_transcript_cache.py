@@ -0,0 +1,114 @@
+"""Tests for the transcript cache."""
+
+import math
+import os
+import struct
+import tempfile
+
+import audio_pipeline
+from RecaptchaSolver import RecaptchaSolver
+from speech_backends import RecognitionBackend, Transcript
+from test_audio_pipeline import make_wav
+from transcript_cache import TranscriptCache, audio_fingerprint, content_key
+
+
+class CountingBackend(RecognitionBackend):
+    name = 'counting'
+
+    def __init__(self):
+        self.calls = 0
+
+    def transcribe(self, audio):
+        self.calls += 1
+        return Transcript(f"clip {self.calls}", 1.0, self.name)
+
+
+def make_pcm(volume, rate=16000):
+    silence = b'\x00\x00' * (rate // 4)
+    tone = b''.join(struct.pack('<h', int(volume * math.sin(2 * math.pi * 440 * i / rate)))
+                    for i in range(rate // 2))
+    return silence + tone + silence
+
+
+def test_lru_bound_and_failed_transcripts_are_not_reused():
+    cache = TranscriptCache(max_entries=2)
+    cache.put(['a'], 'one')
+    cache.put(['b'], 'two')
+    assert cache.get('a') == 'one'
+    cache.put(['c'], 'three')
+    assert cache.get('b') is None
+    assert cache.get('a') == 'one'
+
+    cache.mark(['a'], False)
+    assert cache.get('a') is None
+    assert cache.stats()['rejected'] == 1
+
+
+def test_disk_tier_survives_restart():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'transcripts.db')
+        cache = TranscriptCache(path=path)
+        cache.put(['good'], 'hello')
+        cache.put(['bad'], 'world')
+        cache.mark(['bad'], False)
+        cache.close()
+
+        reopened = TranscriptCache(path=path)
+        assert reopened.get('good') == 'hello'
+        assert reopened.get('bad') is None
+        reopened.close()
+
+
+def test_alias_keeps_the_verdict():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = TranscriptCache(path=os.path.join(directory, 'transcripts.db'))
+        cache.put(['sha:old', 'envelope:clip'], 'hello')
+        cache.mark(['sha:old'], True)
+
+        # Same clip re-encoded: found by fingerprint, stored under its new bytes
+        cache.alias('sha:new', 'envelope:clip')
+        assert cache.get('sha:new') == 'hello'
+        assert cache._entries['sha:new']['verified'] is True
+
+        cache.mark(['sha:new'], False)
+        assert cache.get('envelope:clip') is None and cache.get('sha:old') is None
+        cache.close()
+
+
+def test_fingerprint_ignores_volume_and_padding():
+    quiet = audio_fingerprint(make_pcm(4000), 16000)
+    loud = audio_fingerprint(b'\x00\x00' * 800 + make_pcm(16000), 16000)
+    assert quiet is not None and quiet == loud
+    assert audio_fingerprint(b'\x00\x00' * 16000, 16000) is None
+
+
+def test_solver_skips_recognition_on_cache_hit():
+    clip = make_wav(channels=1)
+    original_fetch = audio_pipeline.fetch_audio
+    audio_pipeline.fetch_audio = lambda url, timeout=audio_pipeline.DOWNLOAD_TIMEOUT: clip
+    try:
+        backend = CountingBackend()
+        cache = TranscriptCache()
+        first = RecaptchaSolver(None, backend=backend, cache=cache)
+        assert first._process_audio_challenge('http://audio') == 'clip 1'
+        assert not first.transcript_cached
+
+        second = RecaptchaSolver(None, backend=backend, cache=cache)
+        assert second._process_audio_challenge('http://audio') == 'clip 1'
+        assert second.transcript_cached
+        assert backend.calls == 1
+
+        cache.mark(second._audio_keys, False)
+        third = RecaptchaSolver(None, backend=backend, cache=cache)
+        assert third._process_audio_challenge('http://audio') == 'clip 2'
+        assert content_key(clip) in third._audio_keys
+    finally:
+        audio_pipeline.fetch_audio = original_fetch
+
+
+if __name__ == "__main__":
+    for test in (test_lru_bound_and_failed_transcripts_are_not_reused, test_disk_tier_survives_restart,
+                 test_alias_keeps_the_verdict,
+                 test_fingerprint_ignores_volume_and_padding, test_solver_skips_recognition_on_cache_hit):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,250 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional
+
+from prefetch_scheduler import PrefetchScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class TokenPool:
+    """Reservoir of pre-solved reCAPTCHA tokens per target page.
+
+    reCAPTCHA tokens are only valid for about two minutes, so every token is
+    stored with its mint time and evicted ``safety_margin`` seconds before it
+    would expire. A background loop keeps each registered target filled to
+    its depth; ``take`` hands out the freshest valid token. Hit, miss and
+    expiry-waste counters are kept per target so the pool can be sized.
+
+    With a ``PrefetchScheduler`` attached, a target's depth follows the
+    forecast demand instead, and the registered depth becomes its ceiling.
+    """
+
+    # Defaults
+    TOKEN_TTL = 120
+    SAFETY_MARGIN = 15
+    DEFAULT_DEPTH = 2
+    DEFAULT_FILL_WORKERS = 2
+    FILL_INTERVAL = 1.0
+
+    def __init__(self, solver: Callable[..., Dict[str, Any]],
+                 fill_workers: int = DEFAULT_FILL_WORKERS,
+                 token_ttl: float = TOKEN_TTL, safety_margin: float = SAFETY_MARGIN,
+                 scheduler: Optional[PrefetchScheduler] = None,
+                 clock: Callable[[], float] = time.time) -> None:
+        """Configure the pool. Call ``start`` to begin background filling.
+
+        Args:
+            solver: Callable performing one solve (CaptchaAPI.solve_captcha_on_page);
+                receives the target's solve parameters as kwargs
+            fill_workers: Maximum number of background solves running at once
+            token_ttl: Seconds a token stays valid after it is minted
+            safety_margin: Seconds before expiry at which a token is evicted
+            scheduler: Optional demand forecaster driving each target's depth
+            clock: Time source, overridable for tests
+        """
+        self.solver = solver
+        self.fill_workers = fill_workers
+        self.max_age = token_ttl - safety_margin
+        self.scheduler = scheduler
+        self.clock = clock
+
+        self._targets: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def make_key(url: str, sitekey: Optional[str] = None) -> str:
+        """Build the pool key for a page URL and optional sitekey."""
+        return f"{sitekey}|{url}" if sitekey else url
+
+    def register(self, url: str, depth: int = DEFAULT_DEPTH, sitekey: Optional[str] = None,
+                 **solve_params: Any) -> str:
+        """Keep a target page stocked with ``depth`` valid tokens.
+
+        Args:
+            url: Page containing the reCAPTCHA widget
+            depth: Number of valid tokens to keep in stock
+            sitekey: Optional sitekey, to separate widgets sharing a page URL
+            **solve_params: Extra keyword arguments for the solver
+
+        Returns:
+            str: The pool key of the target
+        """
+        key = self.make_key(url, sitekey)
+        with self._lock:
+            target = self._targets.get(key)
+            if target is None:
+                target = self._targets[key] = {
+                    'tokens': deque(),
+                    'in_flight': 0,
+                    'hits': 0,
+                    'misses': 0,
+                    'expired': 0,
+                    'minted': 0,
+                    'failed': 0
+                }
+            target['depth'] = depth
+            target['params'] = {'url': url, **solve_params}
+        return key
+
+    def unregister(self, url: str, sitekey: Optional[str] = None) -> None:
+        """Stop stocking a target and drop its tokens."""
+        with self._lock:
+            self._targets.pop(self.make_key(url, sitekey), None)
+
+    def take(self, url: str, sitekey: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Hand out the freshest valid token for a target.
+
+        Args:
+            url: Page containing the reCAPTCHA widget
+            sitekey: Optional sitekey the target was registered with
+
+        Returns:
+            The solve result the token was minted with, plus ``token_age``,
+            or None on a miss (unregistered target or empty stock)
+        """
+        with self._lock:
+            target = self._targets.get(self.make_key(url, sitekey))
+            if target is None:
+                return None
+            if self.scheduler is not None:
+                self.scheduler.record_request(self.make_key(url, sitekey))
+            self._evict(target)
+            if not target['tokens']:
+                target['misses'] += 1
+                return None
+            minted_at, result = target['tokens'].pop()
+            target['hits'] += 1
+
+        return {**result, 'token_age': round(self.clock() - minted_at, 2)}
+
+    def add(self, key: str, result: Dict[str, Any], minted_at: Optional[float] = None) -> None:
+        """Store a successful solve result under a registered target."""
+        with self._lock:
+            target = self._targets.get(key)
+            if target is None:
+                return
+            target['tokens'].append((self.clock() if minted_at is None else minted_at, result))
+            target['minted'] += 1
+
+    def fill(self) -> int:
+        """Start background solves for every target below its depth.
+
+        Returns:
+            int: Number of solves started
+        """
+        started = 0
+        with self._lock:
+            for key, target in self._targets.items():
+                self._evict(target)
+                missing = self.target_depth(key) - len(target['tokens']) - target['in_flight']
+                for _ in range(max(0, missing)):
+                    if self._executor is None:
+                        break
+                    target['in_flight'] += 1
+                    self._executor.submit(self._mint, key, target, dict(target['params']), self.clock())
+                    started += 1
+        return started
+
+    def target_depth(self, key: str) -> int:
+        """Return how many tokens a target should have in stock or in flight."""
+        target = self._targets.get(key)
+        if target is None:
+            return 0
+        if self.scheduler is not None:
+            return min(target['depth'], self.scheduler.target_depth(key))
+        return target['depth']
+
+    def start(self) -> None:
+        """Start the background fill loop."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.fill_workers,
+                                            thread_name_prefix='token-fill')
+        self._thread = threading.Thread(target=self._run, name='token-pool', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the fill loop; solves already running are left to finish."""
+        self._stop.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return per-target stock levels and hit/miss/expiry counters."""
+        with self._lock:
+            targets = {}
+            for key, target in self._targets.items():
+                self._evict(target)
+                lookups = target['hits'] + target['misses']
+                targets[key] = {
+                    'depth': self.target_depth(key),
+                    'available': len(target['tokens']),
+                    'in_flight': target['in_flight'],
+                    'hits': target['hits'],
+                    'misses': target['misses'],
+                    'hit_rate': round(target['hits'] / lookups, 3) if lookups else None,
+                    'minted': target['minted'],
+                    'expired': target['expired'],
+                    'failed': target['failed']
+                }
+        if self.scheduler is not None:
+            forecasts = self.scheduler.stats()
+            for key, target in targets.items():
+                target['forecast'] = forecasts.get(key)
+        return {
+            'targets': targets,
+            'hits': sum(target['hits'] for target in targets.values()),
+            'misses': sum(target['misses'] for target in targets.values()),
+            'expired': sum(target['expired'] for target in targets.values())
+        }
+
+    def _evict(self, target: Dict[str, Any]) -> None:
+        """Drop tokens too close to expiry. Caller holds the lock."""
+        cutoff = self.clock() - self.max_age
+        tokens: Deque = target['tokens']
+        while tokens and tokens[0][0] < cutoff:
+            tokens.popleft()
+            target['expired'] += 1
+
+    def _mint(self, key: str, target: Dict[str, Any], params: Dict[str, Any], started_at: float) -> None:
+        """Run one background solve and stock its token in ``target``.
+
+        A target unregistered (or registered anew) meanwhile gets nothing back.
+        """
+        try:
+            result = self.solver(**params)
+        except Exception as e:
+            logger.warning(f"Token pool solve for {key} failed: {str(e)}")
+            result = None
+
+        success = bool(result and result.get('success') and result.get('token'))
+        if self.scheduler is not None:
+            self.scheduler.record_solve(key, self.clock() - started_at, success)
+
+        with self._lock:
+            if self._targets.get(key) is not target:
+                return
+            target['in_flight'] -= 1
+            if not success:
+                target['failed'] += 1
+                return
+            target['tokens'].append((self.clock(), result))
+            target['minted'] += 1
+
+    def _run(self) -> None:
+        """Fill loop, ticking every FILL_INTERVAL seconds."""
+        while not self._stop.wait(self.FILL_INTERVAL):
+            try:
+                self.fill()
+            except Exception as e:
+                logger.error(f"Token pool fill failed: {str(e)}")
@@ -0,0 +1,236 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+# Needed only for the optional fingerprint key
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_FRAME = 0.05  # seconds of audio per energy frame
+FINGERPRINT_LEVELS = 16
+SILENCE_RATIO = 0.05
+
+
+def content_key(data: bytes) -> str:
+    """Cache key for the exact bytes of an encoded clip."""
+    return 'sha256:' + hashlib.sha256(data).hexdigest()
+
+
+def audio_fingerprint(pcm: bytes, sample_rate: int) -> Optional[str]:
+    """Cache key for what a clip sounds like, stable across re-encodings.
+
+    The decoded clip is reduced to its loudness envelope: RMS energy per
+    FINGERPRINT_FRAME seconds, with leading and trailing silence trimmed,
+    scaled to the loudest frame and quantised to FINGERPRINT_LEVELS levels.
+    The same challenge served as a different file (bitrate, container,
+    volume) therefore maps to the same key.
+
+    Args:
+        pcm: Mono 16-bit little-endian PCM
+        sample_rate: Sample rate of ``pcm``
+
+    Returns:
+        str: Fingerprint key, or None if numpy is missing or the clip is silent
+    """
+    if numpy is None:
+        return None
+    samples = numpy.frombuffer(pcm, dtype='<i2').astype(numpy.float32)
+    frame = max(1, int(sample_rate * FINGERPRINT_FRAME))
+    count = len(samples) // frame
+    if count == 0:
+        return None
+    energy = numpy.sqrt((samples[:count * frame].reshape(count, frame) ** 2).mean(axis=1))
+    peak = energy.max()
+    if peak <= 0:
+        return None
+    voiced = numpy.flatnonzero(energy >= peak * SILENCE_RATIO)
+    envelope = energy[voiced[0]:voiced[-1] + 1] / peak
+    levels = numpy.minimum((envelope * FINGERPRINT_LEVELS).astype(numpy.uint8), FINGERPRINT_LEVELS - 1)
+    return 'envelope:' + hashlib.sha256(levels.tobytes()).hexdigest()
+
+
+class TranscriptCache:
+    """Content-addressed cache of challenge transcripts.
+
+    reCAPTCHA serves the same audio clips over and over, so a transcript is
+    stored under the hash of the clip it came from, together with whether
+    it passed verification. A hit skips recognition entirely; a transcript
+    that failed verification is kept but never handed out again.
+
+    Entries live in an in-memory LRU bounded by ``max_entries``. With a
+    ``path`` they are also written to a SQLite file, which survives restarts
+    and is consulted on a memory miss.
+    """
+
+    # Defaults
+    DEFAULT_MAX_ENTRIES = 2048
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, path: Optional[str] = None) -> None:
+        """Create the cache.
+
+        Args:
+            max_entries: Entries kept in memory before the least recently used is dropped
+            path: Optional SQLite file for the persistent tier
+        """
+        self.max_entries = max_entries
+        self.path = path
+
+        self._entries: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'rejected': 0, 'stored': 0}
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS transcripts "
+                "(key TEXT PRIMARY KEY, text TEXT NOT NULL, verified INTEGER, aliases TEXT, updated_at REAL)"
+            )
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the transcript stored for a key, unless it failed verification.
+
+        Args:
+            key: content_key() or audio_fingerprint() of a clip
+
+        Returns:
+            str: The transcript, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            elif self._db is not None:
+                entry = self._load(key)
+                if entry is not None:
+                    self._remember(key, entry)
+
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            if entry['verified'] is False:
+                self._stats['rejected'] += 1
+                return None
+            self._stats['hits'] += 1
+            return entry['text']
+
+    def put(self, keys: Iterable[str], text: str) -> None:
+        """Store a freshly recognised transcript under every key of its clip."""
+        keys = list(keys)
+        with self._lock:
+            for key in keys:
+                entry = {'text': text, 'verified': None, 'aliases': keys}
+                self._remember(key, entry)
+                self._save(key, entry)
+                self._stats['stored'] += 1
+
+    def alias(self, key: str, source: str) -> None:
+        """Store the transcript already cached under ``source`` under one more key.
+
+        Used when a clip is found by its fingerprint but arrived as new bytes:
+        its content key joins the entry with the verdict the transcript
+        already earned, instead of resetting it as ``put`` would.
+
+        Args:
+            key: New key of the clip, typically its content_key()
+            source: Key the transcript is currently stored under
+        """
+        with self._lock:
+            entry = self._entries.get(source)
+            if entry is None and self._db is not None:
+                entry = self._load(source)
+            if entry is None:
+                return
+            aliases = [alias for alias in entry['aliases'] if alias != key] + [key]
+            if source not in aliases:
+                aliases.insert(0, source)
+            for alias_key in (source, key):
+                updated = {**entry, 'aliases': aliases}
+                self._remember(alias_key, updated)
+                self._save(alias_key, updated)
+            self._stats['stored'] += 1
+
+    def mark(self, keys: Iterable[str], verified: bool) -> None:
+        """Record whether the transcript stored under these keys passed verification.
+
+        The verdict also applies to every other key the clip was stored under,
+        so a clip found by its bytes cannot still be served by its fingerprint.
+        """
+        with self._lock:
+            pending, seen = list(keys), set()
+            while pending:
+                key = pending.pop()
+                if key in seen:
+                    continue
+                seen.add(key)
+                entry = self._entries.get(key)
+                if entry is None and self._db is not None:
+                    entry = self._load(key)
+                if entry is None:
+                    continue
+                pending.extend(entry['aliases'])
+                entry = {**entry, 'verified': verified}
+                self._remember(key, entry)
+                self._save(key, entry)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return entry count and hit/miss counters."""
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses'] + self._stats['rejected']
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'persistent': self._db is not None,
+                **self._stats,
+                'hit_rate': round(self._stats['hits'] / lookups, 3) if lookups else None
+            }
+
+    def close(self) -> None:
+        """Close the persistent tier."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _remember(self, key: str, entry: Dict[str, Any]) -> None:
+        """Insert into the memory tier, evicting the least recently used. Caller holds the lock."""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        """Read an entry from the persistent tier. Caller holds the lock."""
+        row = self._db.execute(
+            "SELECT text, verified, aliases FROM transcripts WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            'text': row[0],
+            'verified': None if row[1] is None else bool(row[1]),
+            'aliases': row[2].split() if row[2] else []
+        }
+
+    def _save(self, key: str, entry: Dict[str, Any]) -> None:
+        """Write an entry to the persistent tier, if any. Caller holds the lock."""
+        if self._db is None:
+            return
+        verified = None if entry['verified'] is None else int(entry['verified'])
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO transcripts (key, text, verified, aliases, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, entry['text'], verified, ' '.join(entry['aliases']), time.time())
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not persist transcript: {str(e)}")